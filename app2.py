@@ -1,13 +1,14 @@
 import streamlit as st
-import pandas as pd
 from pathlib import Path
-import tempfile, os, sys, io, re, base64
-from html import unescape
-from PIL import Image  # para imagens -> PDF
+import tempfile, os, sys, io, time, weakref
+from typing import Optional
+# pandas só é importado quando há tabela para mostrar: a página inicial não precisa dele
+
+_script_t0 = time.perf_counter()
 
 st.set_page_config(page_title="Converter para PDF", page_icon="🧾", layout="centered")
 st.title("🧾 Converter HTML/XLS(X)/DOCX/Imagens ➜ PDF")
-st.caption("Envie .html, .htm, .xls, .xlsx, .docx, imagens (jpg/png/gif/bmp/tiff/webp/svg) e/ou PDFs (.pdf). "
+st.caption("Envie .html, .htm, .zip (HTML + recursos), .xls, .xlsx, .docx, imagens (jpg/png/gif/bmp/tiff/webp/svg) e/ou PDFs (.pdf). "
            "Você pode enviar vários arquivos e gerar um único PDF unificado.")
 
 # -----------------------
@@ -16,6 +17,7 @@ st.caption("Envie .html, .htm, .xls, .xlsx, .docx, imagens (jpg/png/gif/bmp/tiff
 import importlib.util as _iu
 import importlib.metadata
 import platform
+from collections import deque
 
 def _has_module(mod: str) -> bool:
     return _iu.find_spec(mod) is not None
@@ -31,9 +33,7 @@ def _test_weasyprint() -> tuple[bool, str]:
         if not _has_module("weasyprint"):
             return False, "WeasyPrint não instalado"
         from weasyprint import HTML
-        html = HTML(string="<html><body><p>ok</p></body></html>")
-        with tempfile.NamedTemporaryFile(delete=True, suffix=".pdf") as tmp:
-            html.write_pdf(tmp.name)
+        HTML(string="<html><body><p>ok</p></body></html>").write_pdf()
         return True, "WeasyPrint ok"
     except Exception as e:
         return False, f"Falha ao usar WeasyPrint: {e}"
@@ -44,39 +44,66 @@ def _test_xhtml2pdf() -> tuple[bool, str]:
             return False, "xhtml2pdf não instalado"
         from xhtml2pdf import pisa
         src = "<html><body><p>ok</p></body></html>"
-        with tempfile.NamedTemporaryFile(delete=True, suffix=".pdf") as tmp:
-            with open(tmp.name, "wb") as out:
-                result = pisa.CreatePDF(src, dest=out)
-            if result.err:
-                return False, f"xhtml2pdf falhou na renderização: {result.err}"
+        result = pisa.CreatePDF(src, dest=io.BytesIO())
+        if result.err:
+            return False, f"xhtml2pdf falhou na renderização: {result.err}"
         return True, "xhtml2pdf ok"
     except Exception as e:
         return False, f"Falha ao importar/usar xhtml2pdf: {e}"
 
-def pick_pdf_backend() -> tuple[str, str]:
+def _timed(timings: dict, label: str, fn):
+    t0 = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        timings[label] = time.perf_counter() - t0
+
+def pick_pdf_backend(timings: Optional[dict] = None) -> tuple[str, str]:
+    timings = {} if timings is None else timings
+    test_weasy = lambda: _timed(timings, "weasyprint", _test_weasyprint)
+    test_xhtml = lambda: _timed(timings, "xhtml2pdf", _test_xhtml2pdf)
     if platform.system() == "Windows":
         if _has_module("weasyprint"):
-            ok, msg = _test_weasyprint()
+            ok, msg = test_weasy()
             if ok:
                 return "weasyprint", msg
-            ok2, msg2 = _test_xhtml2pdf()
+            ok2, msg2 = test_xhtml()
             if ok2:
                 return "xhtml2pdf", f"WeasyPrint indisponível ({msg}); usando xhtml2pdf ({msg2})"
             return "none", f"Sem backends funcionais: WeasyPrint=({msg}); xhtml2pdf=({msg2})"
         else:
-            ok2, msg2 = _test_xhtml2pdf()
+            ok2, msg2 = test_xhtml()
             if ok2:
                 return "xhtml2pdf", msg2
             return "none", f"xhtml2pdf=({msg2})"
-    ok, msg = _test_weasyprint()
+    ok, msg = test_weasy()
     if ok:
         return "weasyprint", msg
-    ok2, msg2 = _test_xhtml2pdf()
+    ok2, msg2 = test_xhtml()
     if ok2:
         return "xhtml2pdf", f"WeasyPrint indisponível ({msg}); usando xhtml2pdf ({msg2})"
     return "none", f"Sem backends funcionais: WeasyPrint=({msg}); xhtml2pdf=({msg2})"
 
-PDF_BACKEND, PDF_BACKEND_MSG = pick_pdf_backend()
+@st.cache_resource(show_spinner="Detectando backends de PDF...")
+def probe_pdf_backends() -> dict:
+    # Sondagem única por processo: o Streamlit reexecuta o script a cada interação,
+    # mas o resultado fica guardado até alguém pedir "Refazer detecção".
+    timings = {}
+    t0 = time.perf_counter()
+    backend, msg = pick_pdf_backend(timings)
+    versions = {dist: _timed(timings, f"versão {dist}", lambda d=dist: _mod_ver(d))
+                for dist in ("weasyprint", "xhtml2pdf")}
+    timings["total"] = time.perf_counter() - t0
+    return {
+        "backend": backend,
+        "message": msg,
+        "versions": versions,
+        "timings": timings,
+        "probed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+_backend_probe = probe_pdf_backends()
+PDF_BACKEND, PDF_BACKEND_MSG = _backend_probe["backend"], _backend_probe["message"]
 
 # -----------------------
 # Configurações (Sidebar) + Diagnóstico
@@ -86,14 +113,23 @@ with st.sidebar:
     st.write(f"**Python:** {sys.executable}")
     st.write(f"**SO:** {platform.system()} {platform.release()}")
     st.write(f"**Backend detectado:** `{PDF_BACKEND}`")
-    st.write(f"**WeasyPrint:** {_mod_ver('weasyprint')}")
-    st.write(f"**xhtml2pdf:** {_mod_ver('xhtml2pdf')}")
+    st.write(f"**WeasyPrint:** {_backend_probe['versions']['weasyprint']}")
+    st.write(f"**xhtml2pdf:** {_backend_probe['versions']['xhtml2pdf']}")
     st.caption(PDF_BACKEND_MSG)
     if platform.system() == "Windows" and PDF_BACKEND != "weasyprint":
         st.info(
             "WeasyPrint requer GTK3/Pango (Cairo) no Windows. Mesmo com o pacote Python instalado, "
             "faltam DLLs do runtime. O app está usando **xhtml2pdf** como fallback."
         )
+    st.caption("Sondagem em " + _backend_probe["probed_at"] + ": " +
+               ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in _backend_probe["timings"].items()))
+    if st.button("🔄 Refazer detecção de backends"):
+        from htmlpdf.engines import clear_weasy_contexts
+        from htmlpdf.pool import reset_pool
+        probe_pdf_backends.clear()
+        clear_weasy_contexts()  # fontes/CSS do WeasyPrint são redescobertos
+        reset_pool()            # os workers também guardam seus contextos
+        st.rerun()
 
 _default_index = 0 if PDF_BACKEND == "weasyprint" else 1
 if PDF_BACKEND == "none":
@@ -105,585 +141,443 @@ page_size = st.sidebar.selectbox("Tamanho da página (se NÃO preservar layout)"
 orientation = st.sidebar.selectbox("Orientação (se NÃO preservar layout)", ["portrait", "landscape"], index=0)
 margin_mm = st.sidebar.slider("Margem lateral (mm) – esquerda = direita", 5, 25, 10)
 paginate_sheets = st.sidebar.checkbox("Quebrar página entre planilhas (Excel)", True)
+stream_excel = st.sidebar.checkbox("Excel .xlsx em blocos (memória limitada)", True,
+                                   help="Lê as linhas em streaming e renderiza em blocos; ideal para planilhas grandes.")
+excel_chunk_rows = st.sidebar.number_input("Linhas por bloco (Excel)", min_value=100, max_value=50_000,
+                                           value=2000, step=100, disabled=not stream_excel)
 
 combine_all = st.sidebar.checkbox("Unir todos os arquivos em um único PDF", True)
+stream_merge = st.sidebar.checkbox("Unir em disco (streaming)", True,
+                                   help="Grava o PDF unificado página por página em arquivo temporário; "
+                                        "a memória não cresce com a soma dos PDFs.")
+with st.sidebar.expander("Otimização do PDF unificado"):
+    merge_dedupe = st.checkbox("Gravar fontes/imagens repetidas uma vez só", True, disabled=not stream_merge)
+    merge_recompress = st.checkbox("Recomprimir streams (mais lento)", False, disabled=not stream_merge)
+    merge_max_dpi = st.number_input("Reduzir imagens acima de (DPI, 0 = não reduzir)", min_value=0,
+                                    max_value=1200, value=0, step=50, disabled=not stream_merge)
 sanitize = st.sidebar.checkbox("Sanitizar CSS (apenas xhtml2pdf)", True)
-
-uploaded_files = st.file_uploader(
-    "Envie um ou mais arquivos .html, .htm, .xls, .xlsx, .docx, imagem (jpg/png/gif/bmp/tiff/webp/svg) **ou .pdf**",
-    type=["html", "htm", "xls", "xlsx", "docx", "jpg", "jpeg", "png", "gif", "bmp", "tif", "tiff", "webp", "svg", "pdf"],
-    accept_multiple_files=True
+native_images = st.sidebar.checkbox("Imagens direto para PDF (sem HTML)", True,
+                                    help="JPEG é embutido sem recodificar; TIFF/GIF com vários quadros viram várias páginas.")
+docx_max_image_px = st.sidebar.number_input(
+    "DOCX: reduzir imagens maiores que (px, 0 = não reduzir)", min_value=0, max_value=10000, value=0, step=200,
+    help="Cada imagem distinta do Word é gravada uma vez; com um limite, as grandes são reduzidas antes do layout."
+)
+with st.sidebar.expander("Recursos remotos (WeasyPrint)"):
+    asset_dir = st.text_input("Pasta do cache/espelho de CSS, fontes e imagens",
+                              value=os.environ.get("HTMLPDF_ASSET_DIR", ""),
+                              help="URLs http(s) são servidas desta pasta (mirror/<host>/<caminho> ou "
+                                   "cópias já baixadas). Vazio = fetcher padrão do WeasyPrint.")
+    offline = st.checkbox("Sem rede (offline)", os.environ.get("HTMLPDF_OFFLINE", "") not in ("", "0"),
+                          help="URLs sem cópia local são puladas na hora, sem esperar timeout.")
+_cpus = os.cpu_count() or 1
+workers = st.sidebar.number_input(
+    "Processos em paralelo (conversão)", min_value=1, max_value=_cpus,
+    value=min(_cpus, int(os.environ.get("HTMLPDF_WORKERS", min(4, _cpus)))), step=1,
+    help="1 = converte um arquivo por vez, no próprio processo do app."
+)
+split_render = st.sidebar.checkbox(
+    "HTML muito longo: renderizar em blocos paralelos (WeasyPrint)", False,
+    disabled=not engine.startswith("WeasyPrint") or workers <= 1,
+    help="Corta o documento entre seções/planilhas/grupos de linhas e renderiza os blocos em paralelo. "
+         "Cada bloco começa em página nova; documentos com numeração de páginas são renderizados inteiros."
+)
+with st.sidebar.expander("Limites por arquivo (0 = sem limite)"):
+    max_seconds = st.number_input(
+        "Tempo máximo (s)", min_value=0, max_value=24 * 3600, step=30,
+        value=int(float(os.environ.get("HTMLPDF_MAX_SECONDS") or 0)),
+        help="Com algum limite, cada arquivo é convertido num processo vigiado; ao passar do limite o "
+             "processo é encerrado, o arquivo aparece nas falhas com o motivo e os demais seguem.")
+    max_cpu_seconds = st.number_input(
+        "Tempo de CPU máximo (s)", min_value=0, max_value=24 * 3600, step=30,
+        value=int(float(os.environ.get("HTMLPDF_MAX_CPU_SECONDS") or 0)))
+    max_memory_mb = st.number_input(
+        "Memória máxima do processo (MB)", min_value=0, max_value=256 * 1024, step=256,
+        value=int(os.environ.get("HTMLPDF_MAX_MEMORY_MB") or 0),
+        help="RSS do processo de conversão (inclui o motor carregado, ~100–300 MB).")
+warm_engine = st.sidebar.checkbox(
+    "Pré-aquecer o motor ao abrir o app", os.environ.get("HTMLPDF_WARMUP", "") not in ("", "0"),
+    help="Em segundo plano, importa o motor escolhido, carrega as fontes e gera um PDF mínimo (também em "
+         "cada processo do pool), para o primeiro arquivo não pagar esse custo."
+)
+background_jobs = st.sidebar.checkbox(
+    "Converter em segundo plano (fila de tarefas)", False,
+    help="Os arquivos viram uma tarefa com id: a conversão continua mesmo com reruns ou com a aba fechada, "
+         "e os PDFs ficam em disco até serem baixados (HTMLPDF_JOBS_DIR)."
 )
 
 # -----------------------
-# Sanitização (para xhtml2pdf)
+# Cache de conversões (memória + disco opcional)
 # -----------------------
-UNSUPPORTED_AT_RULES = ("@media", "@supports", "@keyframes", "@-webkit-", "@-moz-", "@-ms-")
-
-def strip_unsupported_at_rules(css: str) -> str:
-    out, i = [], 0
-    while i < len(css):
-        if css[i] == "@" and any(css.startswith(x, i) for x in UNSUPPORTED_AT_RULES):
-            depth, j = 0, i
-            while j < len(css):
-                if j < len(css) and css[j] == "{":
-                    depth += 1
-                elif j < len(css) and css[j] == "}":
-                    depth -= 1
-                    if depth <= 0:
-                        j += 1
-                        break
-                j += 1
-            i = j
-            continue
-        out.append(css[i]); i += 1
-    return "".join(out)
-
-def sanitize_selectors(css: str) -> str:
-    css = re.sub(r"::[a-zA-Z0-9_-]+", "", css)
-    css = re.sub(r":[a-zA-Z-]+\([^)]*\)", "", css)
-    css = re.sub(r":[a-zA-Z-]+", "", css)
-    css = css.replace("~", " ").replace(">", " ").replace("+", " ")
-    return css
-
-def normalize_display_props(css: str) -> str:
-    patterns = [
-        r"display\s*:\s*inline-flex[^;]*;", r"display\s*:\s*inline-grid[^;]*;",
-        r"display\s*:\s*flex[^;]*;", r"display\s*:\s*grid[^;]*;", r"display\s*:\s*contents[^;]*;",
-    ]
-    for p in patterns:
-        css = re.sub(p, "display:block;", css, flags=re.IGNORECASE)
-    return css
-
-def neutralize_css_functions(css: str) -> str:
-    css = re.sub(r"var\(\s*--[^)]+\)", "", css, flags=re.IGNORECASE)
-    css = re.sub(r"calc\([^)]+\)", "1", css, flags=re.IGNORECASE)
-    return css
-
-def strip_unsupported_props(css: str) -> str:
-    props = [
-        r"position\s*:\s*fixed[^;]*;", r"position\s*:\s*absolute[^;]*;",
-        r"backdrop-filter\s*:[^;]*;", r"filter\s*:[^;]*;", r"box-shadow\s*:[^;]*;",
-        r"transform\s*:[^;]*;", r"transition\s*:[^;]*;", r"animation\s*:[^;]*;", r"@font-face\s*{[^}]*}",
-    ]
-    for p in props:
-        css = re.sub(p, "", css, flags=re.IGNORECASE)
-    return css
-
-def sanitize_css(css: str) -> str:
-    css = unescape(css)
-    css = strip_unsupported_at_rules(css)
-    css = sanitize_selectors(css)
-    css = normalize_display_props(css)
-    css = strip_unsupported_props(css)
-    css = neutralize_css_functions(css)
-    return css
-
-def sanitize_html_for_xhtml2pdf(html: str, page_css: str) -> str:
-    html = unescape(html)
-    page_block = f"<style>{page_css}</style>"
-    lower = html.lower()
-    if "</head>" in lower:
-        idx = lower.rfind("</head>")
-        html = html[:idx] + page_block + html[idx:]
-    else:
-        html = f"<html><head><meta charset='utf-8'>{page_block}</head><body>{html}</body></html>"
-
-    def _clean_style_block(m):
-        raw = m.group(1)
-        return "<style>" + sanitize_css(raw) + "</style>"
-    html = re.sub(r"<style[^>]*>(.*?)</style>", _clean_style_block, html, flags=re.IGNORECASE|re.DOTALL)
-
-    def _clean_inline_style(m):
-        raw = neutralize_css_functions(m.group(1))
-        allowed = []
-        for decl in raw.split(";"):
-            d = decl.strip()
-            if not d:
-                continue
-            if any(d.lower().startswith(x) for x in [
-                "color:", "background-color:", "font-size:", "font-family:",
-                "border", "padding", "margin", "text-align:", "width:", "height:"
-            ]):
-                d = neutralize_css_functions(d)
-                allowed.append(d)
-        return ' style="' + "; ".join(allowed) + ('"' if allowed else '"')
-    html = re.sub(r'\sstyle="(.*?)"', _clean_inline_style, html, flags=re.IGNORECASE|re.DOTALL)
-    return html
-
-def _inject_page_css(html_str: str, page_css: str) -> str:
-    lower = html_str.lower()
-    block = f"<style>{page_css}</style>"
-    if "</head>" in lower:
-        idx = lower.rfind("</head>")
-        return html_str[:idx] + block + html_str[idx:]
-    return f"<html><head><meta charset='utf-8'>{block}</head><body>{html_str}</body></html>"
+from htmlpdf.buffers import file_buffer
+from htmlpdf.cache import ConversionCache, content_digest, conversion_key
+from htmlpdf.errors import MissingDependencyError
+from htmlpdf.fetch import get_asset_cache
+from htmlpdf.jobs import FINISHED, get_job_queue
+from htmlpdf.merge import PreparedPdfCache, assemble_pdf, merge_pdfs, merge_pdfs_to_file
+from htmlpdf.metrics import FileMetrics, stage_rows, to_jsonl
+from htmlpdf.options import ConvertOptions, MergeOptions
+from htmlpdf.pool import iter_convert
+from htmlpdf.workspace import WorkspaceSession, get_workspace
+
+@st.cache_resource(show_spinner=False)
+def _get_conversion_cache(disk_dir: str, max_disk_mb: int) -> ConversionCache:
+    # Um cache por processo (compartilhado entre sessões e reruns)
+    return ConversionCache(disk_dir=disk_dir or None, max_disk_bytes=int(max_disk_mb) * 1024 * 1024)
+
+_default_cache_dir = os.environ.get("HTMLPDF_CACHE_DIR", "")
+with st.sidebar.expander("Cache de conversões"):
+    use_disk_cache = st.checkbox("Guardar também em disco", bool(_default_cache_dir))
+    cache_dir = st.text_input("Pasta do cache em disco",
+                              value=_default_cache_dir or os.path.join(tempfile.gettempdir(), "htmlpdf_cache"))
+    cache_cap_mb = st.number_input("Limite do cache em disco (MB)", min_value=50, max_value=100_000,
+                                   value=1024, step=50)
+    conv_cache = _get_conversion_cache(cache_dir if use_disk_cache else "", int(cache_cap_mb))
+    if st.button("🧹 Limpar cache"):
+        conv_cache.clear()
+    st.json(conv_cache.stats(), expanded=False)
+    asset_cache = get_asset_cache(asset_dir.strip(), offline)
+    if asset_cache is not None:
+        st.caption("Recursos remotos (WeasyPrint) neste processo; conversões nos processos paralelos "
+                   "aparecem por arquivo (linha recursos_remotos) em ⏱️ Desempenho por arquivo e etapa.")
+        st.json(asset_cache.stats(), expanded=False)
+    if st.button("🧽 Faxina da área temporária"):
+        st.json(get_workspace().sweep(), expanded=False)
+
+# Pastas temporárias usadas por esta sessão (apagadas quando a sessão termina)
+if "_workspace_session" not in st.session_state:
+    st.session_state["_workspace_session"] = WorkspaceSession(get_workspace())
+workspace_session = st.session_state["_workspace_session"]
 
-# -----------------------
-# Monkey-patch xhtml2pdf.parser.lower() para evitar crash
-# -----------------------
-def _patch_xhtml2pdf_lower():
-    try:
-        import xhtml2pdf.parser as _p
-    except Exception:
-        return
-    def _safe_lower(seq):
-        if isinstance(seq, (list, tuple)) and seq:
-            seq = seq[0]
-        if seq is None or seq is NotImplemented:
-            return ""
-        try:
-            return str(seq).lower()
-        except Exception:
-            return ""
-    _p.lower = _safe_lower
+uploaded_files = st.file_uploader(
+    "Envie um ou mais arquivos .html, .htm, .zip (HTML + recursos), .xls, .xlsx, .docx, "
+    "imagem (jpg/png/gif/bmp/tiff/webp/svg) **ou .pdf**",
+    type=["html", "htm", "zip", "xls", "xlsx", "docx", "jpg", "jpeg", "png", "gif", "bmp", "tif", "tiff", "webp", "svg", "pdf"],
+    accept_multiple_files=True
+)
 
 # -----------------------
-# Diagnóstico fino das dependências do xhtml2pdf
+# Conversão (pacote htmlpdf, sem dependência do Streamlit)
 # -----------------------
-def _probe_xhtml2pdf_deps():
-    checks = {
-        "reportlab": "reportlab",
-        "Pillow (PIL)": "PIL",
-        "html5lib": "html5lib",
-        "pypdf": "pypdf",
-        "svglib": "svglib",
-        "cssselect2": "cssselect2",
-        "tinycss2": "tinycss2",
-        "lxml": "lxml",
-        "python-bidi": "bidi",
-        "arabic-reshaper": "arabic_reshaper",
-    }
-    missing = []
-    present = []
-    for label, mod in checks.items():
-        try:
-            __import__(mod)
-            present.append(label)
-        except Exception:
-            missing.append(label)
-
-    has_pypdf2 = False
+options = ConvertOptions(
+    engine="weasyprint" if engine.startswith("WeasyPrint") else "xhtml2pdf",
+    preserve_layout=preserve_layout,
+    page_size=page_size,
+    orientation=orientation,
+    margin_mm=int(margin_mm),
+    paginate_sheets=paginate_sheets,
+    sanitize=sanitize,
+    native_images=native_images,
+    stream_excel=stream_excel,
+    excel_chunk_rows=int(excel_chunk_rows),
+    docx_max_image_px=int(docx_max_image_px),
+    asset_dir=asset_dir.strip(),
+    offline=offline,
+    split_render=split_render,
+    split_workers=int(workers),
+    max_seconds=float(max_seconds),
+    max_cpu_seconds=float(max_cpu_seconds),
+    max_memory_mb=int(max_memory_mb),
+)
+if options.has_limits:
+    from htmlpdf.watchdog import describe_limits
+    st.sidebar.caption("⏱️ Limites por arquivo: " + describe_limits(options))
+
+@st.cache_resource(show_spinner=False)
+def _start_warmup(engine: str, workers: int, _options: ConvertOptions) -> dict:
+    # Uma vez por processo, motor e nº de workers (_options fica fora da chave:
+    # margem, nome do arquivo etc. não pedem outro aquecimento)
+    from htmlpdf.warmup import start_warmup
+    return start_warmup(_options, workers)
+
+@st.cache_resource(show_spinner=False)
+def _startup_profile() -> dict:
+    # Tempos de inicialização deste processo: primeira página e primeira conversão
+    return {}
+
+if warm_engine:
+    from htmlpdf.warmup import summary as _warmup_summary
+    st.sidebar.caption("🔥 " + _warmup_summary(_start_warmup(options.engine, int(workers), options)))
+
+def _upload_digest(file) -> str:
+    # Hash memorizado por upload (file_id) para não reler arquivos grandes a cada rerun
+    memo = st.session_state.setdefault("_upload_digests", {})
+    memo_key = (getattr(file, "file_id", None) or file.name, file.size)
+    if memo_key not in memo:
+        # file_buffer: os bytes do próprio upload (getbuffer() faria uma cópia inteira)
+        memo[memo_key] = content_digest(file_buffer(file))
+    return memo[memo_key]
+
+def _cache_key(file) -> Optional[str]:
+    ext = Path(file.name).suffix.lower()
+    if ext == ".pdf":
+        return None
+    return conversion_key(_upload_digest(file), options.cache_settings(ext))
+
+def _show_error_details(e: BaseException):
+    if getattr(e, "log", None):
+        st.code(e.log)
+    if getattr(e, "hint", None):
+        st.code(e.hint, language="bash")
+    if getattr(e, "debug_html", None):
+        st.download_button("⬇️ Baixar HTML sanitizado (para depurar)",
+                           data=e.debug_html.encode("utf-8", errors="ignore"),
+                           file_name="html_sanitizado_para_debug.html", mime="text/html",
+                           key=f"dl_debug_{id(e)}")
+
+def _prepared_pdfs() -> PreparedPdfCache:
+    # Documentos já preparados para a união (por sessão, limitado em disco)
+    if "_prepared_pdfs" not in st.session_state:
+        st.session_state["_prepared_pdfs"] = PreparedPdfCache(
+            max_bytes=int(float(os.environ.get("HTMLPDF_MERGE_CACHE_MB", 512)) * 1024 * 1024))
+    return st.session_state["_prepared_pdfs"]
+
+def _metrics_log():
+    # Medições dos últimos arquivos convertidos/unidos nesta sessão
+    if "_metrics" not in st.session_state:
+        st.session_state["_metrics"] = deque(maxlen=500)
+    return st.session_state["_metrics"]
+
+def _show_metrics_panel():
+    records = list(_metrics_log())
+    if not records:
+        return
+    with st.sidebar.expander("⏱️ Desempenho por arquivo e etapa"):
+        st.caption("Tempo de relógio e de CPU (s) e pico de memória (MB) de cada etapa, "
+                   "incluindo tentativas de fallback. Arquivos vindos do cache não aparecem. "
+                   "CPU: só a thread da conversão (processos filhos não entram). Pico com escopo "
+                   "\"processo\": conversão no processo do app, é o pico do processo inteiro "
+                   "(todas as sessões) até o fim da etapa.")
+        import pandas as pd
+        st.dataframe(pd.DataFrame(stage_rows(records)), hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Exportar (JSON lines)", data=to_jsonl(records).encode("utf-8"),
+                           file_name="htmlpdf_medicoes.jsonl", mime="application/x-ndjson", key="dl_metrics")
+        if st.button("Limpar medições"):
+            _metrics_log().clear()
+            st.rerun()
+
+def _remove_quietly(path: str) -> None:
     try:
-        __import__("PyPDF2")
-        has_pypdf2 = True
-    except Exception:
+        os.remove(path)
+    except OSError:
         pass
 
-    return missing, present, has_pypdf2
-
-# -----------------------
-# Helpers extras para fallback forte (xhtml2pdf)
-# -----------------------
-def _strip_external_fonts(html: str) -> str:
-    html = re.sub(r"@font-face\s*{[^}]*}", "", html, flags=re.IGNORECASE|re.DOTALL)
-    html = re.sub(r'<link[^>]+href="[^"]*fonts[^"]*"[^>]*>', "", html, flags=re.IGNORECASE)
-    html = re.sub(r'url\([^)]+\.woff2?\)', "", html, flags=re.IGNORECASE)
-    return html
-
-def _very_simple_html(html: str) -> str:
-    body = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.IGNORECASE|re.DOTALL)
-    body = re.sub(r'\sstyle="[^"]*"', "", body, flags=re.IGNORECASE)
-    return f"""<html><head><meta charset="utf-8">
-    <style>
-      body {{ font-family: Arial, sans-serif; font-size: 12pt; margin: 10mm; }}
-      img {{ max-width: 100%; height: auto; display: block; margin: 6px 0; }}
-      table {{ width:100%; border-collapse: collapse; table-layout: fixed; }}
-      th, td {{ border: 1px solid #999; padding: 6px; word-wrap: break-word; }}
-      h1,h2,h3 {{ margin: 8px 0; }}
-      pre,code {{ white-space: pre-wrap; word-break: break-word; }}
-    </style>
-    </head><body>{body}</body></html>"""
-
-# -----------------------
-# Leitura do HTML + base_url (para preservar caminhos relativos)
-# -----------------------
-def read_html_and_base(uploaded_file):
-    uploaded_file.seek(0)
-    raw = uploaded_file.read()
-    try:
-        html_str = raw.decode("utf-8")
-    except UnicodeDecodeError:
-        html_str = raw.decode("latin-1", errors="ignore")
-
-    tmpdir = tempfile.mkdtemp(prefix="html2pdf_")
-    fname = Path(uploaded_file.name).name
-    fpath = os.path.join(tmpdir, fname)
-    with open(fpath, "wb") as f:
-        f.write(raw)
-    base_url = tmpdir
-    return html_str, base_url
-
-# -----------------------
-# Helpers (DOCX/Imagens)
-# -----------------------
-def _img_to_data_uri(image):
-    with image.open() as img_bytes:
-        encoded = base64.b64encode(img_bytes.read()).decode("ascii")
-    return {"src": f"data:{image.content_type};base64,{encoded}"}
-
-def docx_to_html(uploaded_file) -> str:
-    try:
-        import mammoth
-    except Exception:
-        st.error("Pacote 'mammoth' não está instalado. Adicione 'mammoth' ao requirements.txt.")
-        st.stop()
-
-    uploaded_file.seek(0)
-    raw = uploaded_file.read()
-    with io.BytesIO(raw) as f:
-        result = mammoth.convert_to_html(
-            f,
-            convert_image=mammoth.images.img_element(_img_to_data_uri)
-        )
-    html = result.value
-    return f"<html><head><meta charset='utf-8'></head><body>{html}</body></html>"
-
-def image_file_to_html(uploaded_file) -> str:
-    uploaded_file.seek(0)
-    raw = uploaded_file.read()
-    try:
-        im = Image.open(io.BytesIO(raw))
-        if im.mode in ("P", "LA", "RGBA", "CMYK"):
-            im = im.convert("RGB")
-        buf = io.BytesIO()
-        im.save(buf, format="PNG")
-        raw = buf.getvalue()
-        mime = "image/png"
-    except Exception:
-        ext = Path(uploaded_file.name).suffix.lower().lstrip(".")
-        mime = f"image/{'jpeg' if ext in ['jpg','jpeg'] else ext}"
-    b64 = base64.b64encode(raw).decode("ascii")
-    data_uri = f"data:{mime};base64,{b64}"
-    html = f"""
-    <html><head><meta charset="utf-8">
-      <style>
-        html,body{{margin:0;padding:0}}
-        .wrap{{padding:0; margin:0 auto;}}
-        img{{display:block; max-width:100%; height:auto; margin:0 auto;}}
-      </style>
-    </head>
-    <body><div class="wrap"><img src="{data_uri}"/></div></body></html>
-    """
-    return html
-
-# -----------------------
-# Builders (PDF)
-# -----------------------
-def build_pdf_weasy(html_str: str, base_url: str) -> bytes:
-    try:
-        from weasyprint import HTML, CSS
-        try:
-            from weasyprint.fonts import FontConfiguration  # >=60
-        except Exception:
-            from weasyprint.text.fonts import FontConfiguration  # 53.x
-    except Exception:
-        st.error("WeasyPrint não está instalado.\nTente: pip install weasyprint (ou conda-forge).")
-        st.stop()
-
-    if "<meta charset" not in html_str.lower():
-        if "<head>" in html_str.lower():
-            html_str = html_str.replace("<head>", "<head><meta charset='utf-8'>", 1)
-        else:
-            html_str = f"<html><head><meta charset='utf-8'></head><body>{html_str}</body></html>"
-
-    font_config = FontConfiguration()
-
-    if preserve_layout:
-        page_css = CSS(string=f"""
-            @page {{
-                margin-left: {margin_mm}mm;
-                margin-right: {margin_mm}mm;
-            }}
-        """, font_config=font_config)
-    else:
-        page_css = CSS(string=f"""
-            @page {{
-                size: {page_size} {orientation};
-                margin-left: {margin_mm}mm;
-                margin-right: {margin_mm}mm;
-            }}
-        """, font_config=font_config)
-
-    safety_css = CSS(string="""
-        html, body { overflow: visible !important; }
-        * { box-sizing: border-box; min-width: 0 !important; }
-        img, svg, canvas, video { max-width: 100% !important; height: auto !important; }
-        table { width: 100% !important; table-layout: fixed !important; border-collapse: collapse; }
-        td, th { word-break: break-word; }
-        pre, code { white-space: pre-wrap; word-break: break-word; }
-    """, font_config=font_config)
-
-    styles = [page_css, safety_css]
-
+class _SessionFile:
+    # Arquivo temporário da sessão: apagado quando é trocado ou quando a sessão
+    # termina (o objeto sai do session_state e é coletado; no fim do processo também)
+    def __init__(self, prefix: str, suffix: str):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_quietly, self.path)
+
+    def close(self) -> None:
+        self._finalizer()
+
+def _merged_output_path() -> str:
+    # Um arquivo por sessão; o anterior é apagado a cada nova união
+    old = st.session_state.pop("_merged_file", None)
+    if old is not None:
+        old.close()
+    merged = st.session_state["_merged_file"] = _SessionFile("htmlpdf_merge_", ".pdf")
+    return merged.path
+
+def _deferred_downloads() -> bool:
+    # Streamlit recente aceita data= função: o arquivo só é lido no clique (numa
+    # thread à parte), e não a cada execução do script
     try:
-        pdf_bytes = HTML(string=html_str, base_url=base_url or ".").write_pdf(
-            stylesheets=styles, font_config=font_config
-        )
-        if pdf_bytes is None:
-            raise RuntimeError("WeasyPrint não retornou bytes do PDF.")
-        return pdf_bytes
-    except Exception:
-        def _strip_emojis(text: str) -> str:
-            ranges = [(0x1F600,0x1F64F),(0x1F300,0x1F5FF),(0x1F680,0x1F6FF),(0x2600,0x26FF),
-                      (0x2700,0x27BF),(0xFE00,0xFE0F),(0x1F900,0x1F9FF),(0x1FA70,0x1FAFF),(0x1F1E6,0x1F1FF)]
-            out=[]
-            for ch in text:
-                cp=ord(ch)
-                if any(a<=cp<=b for a,b in ranges): continue
-                out.append(ch)
-            return "".join(out)
-
-        from weasyprint import CSS
-        fallback_font_css = CSS(string="""
-            html, body, * { font-family: "DejaVu Sans", "Liberation Sans", Arial, sans-serif !important; font-variant-ligatures: none; }
-        """, font_config=font_config)
-        safe_html = _strip_emojis(html_str)
-        pdf_bytes = HTML(string=safe_html, base_url=base_url or ".").write_pdf(
-            stylesheets=[page_css, safety_css, fallback_font_css], font_config=font_config
-        )
-        if pdf_bytes is None:
-            raise RuntimeError("WeasyPrint não retornou bytes do PDF (fallback).")
-        return pdf_bytes
-
-def build_pdf_xhtml2pdf(html_str: str) -> bytes:
-    import importlib.util as _ius
-    spec = _ius.find_spec("xhtml2pdf")
-    if spec is None:
-        st.error("xhtml2pdf não está instalado neste Python. Rode:  python -m pip install xhtml2pdf")
-        st.stop()
-
-    try:
-        from xhtml2pdf import pisa
+        from streamlit.elements.widgets.button import DownloadButtonDataType
     except ImportError:
-        st.error("xhtml2pdf não está instalado neste Python. Rode:  python -m pip install xhtml2pdf")
-        st.stop()
-    except Exception as e:
-        st.error(f"Falha ao importar xhtml2pdf: {e.__class__.__name__}: {e}")
-        missing, present, has_pypdf2 = _probe_xhtml2pdf_deps()
-        with st.expander("🧩 Diagnóstico de dependências do xhtml2pdf"):
-            if present: st.write("**Pacotes encontrados:** " + ", ".join(present))
-            if missing: st.write("**Pacotes ausentes:** " + ", ".join(missing))
-            if has_pypdf2:
-                st.warning("Conflito: **PyPDF2** instalado. Prefira **pypdf**.")
-                st.code("python -m pip uninstall -y PyPDF2", language="bash")
-            st.code("python -m pip install --upgrade reportlab 'Pillow<12' pypdf svglib html5lib cssselect2 tinycss2 lxml python-bidi arabic-reshaper", language="bash")
-        st.stop()
-
-    _patch_xhtml2pdf_lower()
-
-    page_css = f"@page {{ margin-left: {margin_mm}mm; margin-right: {margin_mm}mm; }}"
-    if sanitize or preserve_layout:
-        candidate1 = sanitize_html_for_xhtml2pdf(html_str, page_css)
+        return False
+    return "Callable" in str(DownloadButtonDataType)
+
+def _download_file(container, label: str, path, file_name: str, key: str) -> None:
+    # Download de um PDF em disco. O Streamlit entrega o conteúdo a partir da
+    # memória: no clique (data= função) ou, nas versões antigas, a cada execução
+    if _deferred_downloads():
+        def read() -> bytes:
+            with open(path, "rb") as f:
+                return f.read()
+        container.download_button(label, data=read, file_name=file_name, mime="application/pdf", key=key)
     else:
-        candidate1 = _inject_page_css(html_str, page_css)
-
-    if "<meta charset" not in candidate1.lower():
-        if "<head>" in candidate1.lower():
-            candidate1 = candidate1.replace("<head>", "<head><meta charset='utf-8'>", 1)
-        else:
-            candidate1 = f"<html><head><meta charset='utf-8'></head><body>{candidate1}</body></html>"
-
-    attempts = []
-    attempts.append(("HTML atual", candidate1))
-    cand2 = sanitize_html_for_xhtml2pdf(_strip_external_fonts(candidate1), page_css)
-    attempts.append(("HTML sanitizado (forte)", cand2))
-    cand3 = _very_simple_html(candidate1)
-    attempts.append(("Modo simples (HTML básico)", cand3))
-
-    last_error = None
-    last_log = None
-
-    for label, html_try in attempts:
-        out = io.BytesIO()
-        pisa_log = io.StringIO()
-        try:
-            res = pisa.CreatePDF(src=html_try, dest=out, encoding="utf-8", log=pisa_log)
-            if res.err:
-                last_error = RuntimeError(f"xhtml2pdf retornou erro (tentativa: {label})")
-                last_log = pisa_log.getvalue()
-            else:
-                return out.getvalue()
-        except Exception as e:
-            last_error = e
-            last_log = pisa_log.getvalue()
-
-    with st.expander("📄 Log detalhado do xhtml2pdf (pisa)"):
-        if last_log:
-            st.code(last_log)
-        else:
-            st.write("Sem log do pisa. Veja o traceback abaixo.")
-    with st.expander("⚠️ Traceback da última tentativa"):
-        if last_error:
-            st.exception(last_error)
-
-    try:
-        html_bytes = attempts[1][1].encode("utf-8", errors="ignore")
-        st.download_button("⬇️ Baixar HTML sanitizado (para depurar)",
-                           data=html_bytes, file_name="html_sanitizado_para_debug.html", mime="text/html")
-    except Exception:
-        pass
-
-    st.error("xhtml2pdf encontrou um erro ao gerar o PDF. Revise o **Log do pisa** acima.")
-    st.stop()
+        with open(path, "rb") as f:
+            container.download_button(label, data=f, file_name=file_name, mime="application/pdf", key=key)
 
 # -----------------------
-# Fallback automático
+# Tarefas em segundo plano
 # -----------------------
-def convert_html_to_pdf(html_str: str, base_url: str = ".") -> bytes:
-    if engine.startswith("WeasyPrint"):
-        try:
-            return build_pdf_weasy(html_str, base_url)
-        except Exception as e:
-            if _iu.find_spec("xhtml2pdf"):
-                st.warning("WeasyPrint indisponível. Usando xhtml2pdf como fallback.")
-                return build_pdf_xhtml2pdf(html_str)
-            st.error("WeasyPrint falhou e xhtml2pdf não está instalado.")
-            raise e
+@st.cache_resource(show_spinner=False)
+def _jobs_http_server(port: int):
+    # Endpoint HTTP opcional (HTMLPDF_JOBS_HTTP_PORT): mesma fila e mesmo pool das sessões
+    from htmlpdf.jobs_http import serve_in_background
+    return serve_in_background(get_job_queue(), host=os.environ.get("HTMLPDF_JOBS_HTTP_HOST", "127.0.0.1"),
+                               port=port)
+
+if os.environ.get("HTMLPDF_JOBS_HTTP_PORT"):
+    _jobs_http_server(int(os.environ["HTMLPDF_JOBS_HTTP_PORT"]))
+
+def _session_jobs() -> list:
+    return st.session_state.setdefault("_job_ids", [])
+
+def _show_job(job_queue, job: dict):
+    job_id = job["id"]
+    done, total = job["feitos"], max(1, job["total"])
+    label = f"Tarefa {job_id} — {job['situacao']} ({job['feitos']}/{job['total']})"
+    if job.get("posicao_na_fila"):
+        label += f" · posição na fila: {job['posicao_na_fila']}"
+    st.progress(done / total, text=label)
+    for f in job["arquivos"]:
+        for w in f["avisos"]:
+            st.warning(f"{f['nome']}: {w}")
+        if f["erro"]:
+            with st.expander(f"⚠️ Falha ao converter: {f['nome']}"):
+                st.code(f["erro"])
+                if f.get("dica"):
+                    st.code(f["dica"], language="bash")
+
+    outputs = job_queue.outputs(job_id)
+    cols = st.columns(3)
+    if job["situacao"] not in FINISHED:
+        if cols[0].button("⏹️ Cancelar", key=f"job_cancel_{job_id}"):
+            job_queue.cancel(job_id)
+            st.rerun()
     else:
-        return build_pdf_xhtml2pdf(html_str)
-
-# -----------------------
-# Excel -> HTML
-# -----------------------
-def excel_to_html(uploaded_file, break_between=True) -> str:
-    name = uploaded_file.name.lower()
-    uploaded_file.seek(0)
-    data = uploaded_file.read()
-    bio = io.BytesIO(data)
-
-    xls_engine = None
-    if name.endswith(".xlsx"):
-        xls_engine = "openpyxl"
-        try:
-            import openpyxl  # noqa
-        except Exception:
-            st.error("Falta 'openpyxl' para ler .xlsx.")
-            st.stop()
-    elif name.endswith(".xls"):
-        xls_engine = "xlrd"
-        try:
-            import xlrd  # noqa
-        except Exception:
-            st.error("Falta 'xlrd' (>=2.0) para ler .xls.")
-            st.stop()
-
-    try:
-        xls = pd.ExcelFile(bio, engine=xls_engine) if xls_engine else pd.ExcelFile(bio)
-    except Exception as e:
-        st.exception(e); st.stop()
-
-    parts = []
-    for i, sheet in enumerate(xls.sheet_names):
-        df = xls.parse(sheet)
-        styled = (df.style
-                  .set_table_attributes('border="1" cellspacing="0" cellpadding="6"')
-                  .set_properties(**{"font-family": "Arial", "font-size": "12px"}))
-        br = 'style="page-break-before: always;"' if (break_between and i > 0) else ""
-        parts.append(f'<h2 {br}>Planilha: {sheet}</h2>' + styled.to_html())
-
-    return f"""
-    <html><head><meta charset="utf-8">
-    <style>
-      body {{ margin:24px; }}
-      h2 {{ font-family: Arial, sans-serif; }}
-      table {{ border-collapse: collapse; width: 100%; table-layout: fixed; }}
-      th, td {{ border: 1px solid {"#"}999; padding: 6px; word-wrap: break-word; }}
-      pre, code {{ white-space: pre-wrap; word-wrap: break-word; }}
-    </style></head>
-    <body>{''.join(parts)}</body></html>
-    """
-
-def html_file_to_str(uploaded_file) -> str:
-    uploaded_file.seek(0)
-    raw = uploaded_file.read()
-    try:
-        return raw.decode("utf-8")
-    except UnicodeDecodeError:
-        return raw.decode("latin-1", errors="ignore")
-
-# -----------------------
-# Merge de múltiplos PDFs
-# -----------------------
-def merge_pdfs(pdf_bytes_list: list[bytes]) -> bytes:
-    writer = None
-    try:
-        from pypdf import PdfReader, PdfWriter
-        writer = PdfWriter()
-    except Exception:
-        try:
-            from PyPDF2 import PdfReader, PdfWriter
-            writer = PdfWriter()
-        except Exception:
-            st.error("Para unir PDFs, instale 'pypdf' ou 'PyPDF2' no requirements.txt.")
-            st.stop()
-
-    for pdf_bytes in pdf_bytes_list:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        for page in reader.pages:
-            writer.add_page(page)
-
-    out = io.BytesIO()
-    writer.write(out)
-    out.seek(0)
-    return out.getvalue()
-
-# -----------------------
-# Processamento por arquivo
-# -----------------------
-def convert_uploaded_file_to_pdf_bytes(file) -> bytes:
-    ext = Path(file.name).suffix.lower()
-
-    if ext == ".pdf":
-        file.seek(0)
-        return file.read()
-
-    if ext in [".html", ".htm"]:
-        html_str, base_url = read_html_and_base(file)
-        return convert_html_to_pdf(html_str, base_url)
-
-    elif ext in [".xls", ".xlsx"]:
-        html_doc = excel_to_html(file, break_between=paginate_sheets)
-        return convert_html_to_pdf(html_doc, base_url=".")
-
-    elif ext == ".docx":
-        html_doc = docx_to_html(file)
-        return convert_html_to_pdf(html_doc, base_url=".")
-
-    elif ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".svg"]:
-        html_doc = image_file_to_html(file)
-        return convert_html_to_pdf(html_doc, base_url=".")
-
-    else:
-        raise ValueError(f"Formato não suportado: {ext}")
+        if len(outputs) > 1:
+            merged_path = job_queue.root / job_id / "unificado.pdf"
+            if not merged_path.exists() and cols[0].button("🔗 Unir PDFs", key=f"job_merge_{job_id}"):
+                with st.spinner("Unindo..."):
+                    merge_pdfs_to_file([p for _, p in outputs], str(merged_path),
+                                       MergeOptions(dedupe=merge_dedupe, recompress=merge_recompress,
+                                                    max_image_dpi=int(merge_max_dpi)))
+            if merged_path.exists():
+                _download_file(cols[0], "⬇️ PDF unificado", merged_path, f"{job_id}.pdf", f"job_dl_merged_{job_id}")
+        if cols[2].button("🗑️ Remover", key=f"job_remove_{job_id}"):
+            job_queue.remove(job_id)
+            _session_jobs().remove(job_id)
+            st.rerun()
+    metrics_path = job_queue.metrics_path(job_id)
+    if metrics_path.exists():
+        cols[1].download_button("⏱️ Medições", data=metrics_path.read_bytes(), file_name=f"{job_id}_medicoes.jsonl",
+                                mime="application/x-ndjson", key=f"job_metrics_{job_id}")
+    if outputs:
+        with st.expander(f"Downloads individuais ({len(outputs)})"):
+            for idx, (name, path) in enumerate(outputs, start=1):
+                _download_file(st, f"⬇️ Baixar {idx}: {name}.pdf", path, f"{Path(name).stem}.pdf",
+                               f"job_dl_{job_id}_{idx}")
+
+def _auto_refresh(fn):
+    # st.fragment (Streamlit >= 1.37) atualiza só o painel a cada poucos segundos;
+    # nas versões antigas o painel atualiza a cada interação
+    return st.fragment(run_every=3)(fn) if hasattr(st, "fragment") else fn
+
+@_auto_refresh
+def _show_jobs_panel():
+    job_queue = get_job_queue()
+    st.subheader("Tarefas em segundo plano")
+    for job_id in list(reversed(_session_jobs())):
+        job = job_queue.status(job_id)
+        if job is None:
+            _session_jobs().remove(job_id)
+            continue
+        with st.container(border=True):
+            _show_job(job_queue, job)
+    if not _session_jobs():
+        st.caption("Nenhuma tarefa nesta sessão.")
+
+def _jobs_flow():
+    job_queue = get_job_queue()
+    if uploaded_files and st.button(f"📥 Enfileirar {len(uploaded_files)} arquivo(s)"):
+        items = [(f.name, file_buffer(f)) for f in uploaded_files]
+        job_id = job_queue.submit(items, options, int(workers))
+        _session_jobs().append(job_id)
+        st.success(f"Tarefa {job_id} enfileirada. Você pode continuar usando o app e voltar depois.")
+    with st.expander("Acompanhar uma tarefa pelo id"):
+        other = st.text_input("Id da tarefa (de outra sessão ou do endpoint HTTP)").strip()
+        if other and st.button("Acompanhar"):
+            if job_queue.status(other) is None:
+                st.error("Tarefa não encontrada.")
+            elif other not in _session_jobs():
+                _session_jobs().append(other)
+    _show_jobs_panel()
 
 # -----------------------
 # Fluxo principal
 # -----------------------
+_startup = _startup_profile()
+_startup.setdefault("primeira_pagina", f"{(time.perf_counter() - _script_t0) * 1000:.0f} ms")
+st.sidebar.caption("🚀 Inicialização deste processo: primeira página em " + _startup["primeira_pagina"]
+                   + " (inclui a sondagem dos motores)"
+                   + (f"; primeira conversão: {_startup['primeira_conversao']}" if "primeira_conversao" in _startup else ""))
+if background_jobs:
+    _jobs_flow()
+    _show_metrics_panel()
+    st.stop()
+
 if uploaded_files:
     pdfs = []
     errors = []
-
-    for f in uploaded_files:
-        try:
-            pdf_bytes = convert_uploaded_file_to_pdf_bytes(f)
+    results = [None] * len(uploaded_files)  # (pdf, erro, avisos) por arquivo, na ordem do upload
+    pending = []
+    from_cache = 0
+    doc_keys = {}  # nome -> chave do conteúdo (para reaproveitar a preparação da união)
+
+    for i, f in enumerate(uploaded_files):
+        if Path(f.name).suffix.lower() in (".html", ".htm", ".zip", ".docx"):
+            workspace_session.track(_upload_digest(f))
+        if Path(f.name).suffix.lower() == ".pdf":
+            results[i] = (f, None, [])  # o próprio upload (sem copiar os bytes)
+            doc_keys[f.name] = _upload_digest(f)
+            continue
+        key = doc_keys[f.name] = _cache_key(f)
+        cached = conv_cache.get(key)
+        if cached is not None:
+            results[i] = (cached, None, [])
+            from_cache += 1
+        else:
+            pending.append((i, key))
+
+    if pending:
+        progress = st.progress(0.0, text=f"Convertendo {len(pending)} arquivo(s)...")
+        items = [(uploaded_files[i].name, file_buffer(uploaded_files[i])) for i, _ in pending]
+        run_metrics = []
+        for done, (j, pdf_bytes, err, warns) in enumerate(iter_convert(items, options, workers, run_metrics),
+                                                          start=1):
+            i, key = pending[j]
+            if err is None:
+                conv_cache.put(key, pdf_bytes)
+            results[i] = (pdf_bytes, err, warns)
+            progress.progress(done / len(pending), text=f"Convertido {done}/{len(pending)}: {items[j][0]}")
+        progress.empty()
+        _metrics_log().extend(run_metrics)
+        if run_metrics and "primeira_conversao" not in _startup:
+            first = run_metrics[0]
+            _startup["primeira_conversao"] = f"{first['parede_s'] * 1000:.0f} ms ({first['arquivo']})"
+
+    for f, (pdf_bytes, err, warns) in zip(uploaded_files, results):
+        for w in warns:
+            st.warning(f"{f.name}: {w}")
+        if err is None:
             pdfs.append((f.name, pdf_bytes))
-        except Exception as e:
-            errors.append((f.name, e))
+        else:
+            errors.append((f.name, err))
+
+    if from_cache:
+        st.caption(f"♻️ {from_cache} de {len(uploaded_files)} arquivo(s) reaproveitado(s) do cache de conversões.")
 
     if errors:
         for name, e in errors:
             with st.expander(f"⚠️ Falha ao converter: {name}"):
                 st.exception(e)
+                _show_error_details(e)
 
     if not pdfs:
         st.warning("Nenhum arquivo pôde ser convertido.")
+        _show_metrics_panel()
         st.stop()
 
     # =======================
     # NOVO: Seleção & Ordem
     # =======================
     st.subheader("Seleção e ordem dos documentos para unificação")
+    import pandas as pd
     df_sel = pd.DataFrame({
         "Incluir": [True] * len(pdfs),
         "Nome": [name for name, _ in pdfs],
@@ -748,10 +642,35 @@ if uploaded_files:
                                    file_name=Path(nomes_na_ordem[0]).with_suffix(".pdf").name,
                                    mime="application/pdf", key="dl_single_selected")
             else:
-                merged_bytes = merge_pdfs(bytes_na_ordem)
+                merge_metrics = FileMetrics(f"(PDF unificado: {len(bytes_na_ordem)} documentos)")
+                try:
+                    with merge_metrics:
+                        if stream_merge:
+                            merged_path = _merged_output_path()
+                            merge_opts = MergeOptions(dedupe=merge_dedupe, recompress=merge_recompress,
+                                                      max_image_dpi=int(merge_max_dpi))
+                            # Só os documentos novos são lidos; reordenar/alternar apenas remonta
+                            prepared = _prepared_pdfs()
+                            with merge_metrics.stage("preparar", documentos=len(bytes_na_ordem)):
+                                docs = [prepared.get(doc_keys.get(n), mapa[n], merge_opts)
+                                        for n in nomes_na_ordem if n in mapa]
+                            with merge_metrics.stage("montar"):
+                                assemble_pdf(docs, merged_path)
+                        else:
+                            with merge_metrics.stage("merge_pdfs"):
+                                merged_bytes = merge_pdfs([b if isinstance(b, bytes) else b.getvalue()
+                                                           for b in bytes_na_ordem])
+                except MissingDependencyError as e:
+                    st.error(str(e))
+                    st.stop()
+                finally:
+                    _metrics_log().append(merge_metrics.to_dict())
                 st.success(f"Unificados {len(bytes_na_ordem)} documentos na ordem definida.")
-                st.download_button("⬇️ Baixar PDF unificado", data=merged_bytes,
-                                   file_name=out_name, mime="application/pdf", key="dl_merged_custom")
+                if stream_merge:
+                    _download_file(st, "⬇️ Baixar PDF unificado", merged_path, out_name, "dl_merged_custom")
+                else:
+                    st.download_button("⬇️ Baixar PDF unificado", data=merged_bytes,
+                                       file_name=out_name, mime="application/pdf", key="dl_merged_custom")
 
     # Também oferece os downloads individuais abaixo
     st.divider()
@@ -760,5 +679,7 @@ if uploaded_files:
         st.download_button(f"⬇️ Baixar {idx}: {name}.pdf", data=b,
                            file_name=f"{Path(name).stem}.pdf", mime="application/pdf", key=f"dl_{idx}")
 
+    _show_metrics_panel()
+
 else:
     st.info("Envie um ou mais arquivos para iniciar a conversão.")
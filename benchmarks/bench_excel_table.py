@@ -0,0 +1,98 @@
+"""Benchmark: tabela do excel_to_html (emissor por colunas) x pandas Styler (anterior).
+
+Gera DataFrames sintéticos (sem rede) com colunas de texto, inteiros, floats
+com NaN e datas, e mede, por formato:
+  - Styler:  df.style.set_table_attributes(...).set_properties(...).to_html()
+  - emissor: dataframe_table_html (formatação por coluna, sem CSS por célula)
+Com --render, também o tempo do xhtml2pdf para cada HTML (custo de parse/cascata).
+
+Uso:
+    python benchmarks/bench_excel_table.py [--shapes 2000x10 500x60 20000x8] [--repeat 3] [--render]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from htmlpdf.excel import _html_doc, dataframe_table_html  # noqa: E402
+
+
+def make_frame(rows: int, cols: int, seed: int = 1):
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    data = {}
+    for j in range(cols):
+        kind = j % 4
+        if kind == 0:
+            data[f"texto_{j}"] = [f"item <{i % 97}> & cia" for i in range(rows)]
+        elif kind == 1:
+            data[f"inteiro_{j}"] = rng.integers(0, 10**6, rows)
+        elif kind == 2:
+            values = rng.normal(1000, 250, rows)
+            values[rng.random(rows) < 0.05] = np.nan
+            data[f"valor_{j}"] = values
+        else:
+            data[f"data_{j}"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 3650, rows), unit="D")
+    return pd.DataFrame(data)
+
+
+def styler_table_html(df) -> str:
+    # Como o excel_to_html fazia antes
+    styled = (df.style
+              .set_table_attributes('border="1" cellspacing="0" cellpadding="6"')
+              .set_properties(**{"font-family": "Arial", "font-size": "12px"}))
+    return styled.to_html()
+
+
+def _best(fn, arg, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _render_s(html: str) -> float:
+    from htmlpdf.engines import build_pdf_xhtml2pdf
+    from htmlpdf.options import ConvertOptions
+    t0 = time.perf_counter()
+    build_pdf_xhtml2pdf(_html_doc(html), ConvertOptions(engine="xhtml2pdf"))
+    return time.perf_counter() - t0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--shapes", nargs="+", default=["2000x10", "500x60", "20000x8"],
+                    help="linhas x colunas de cada DataFrame")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--render", action="store_true", help="mede também o xhtml2pdf sobre cada HTML")
+    args = ap.parse_args(argv)
+
+    import logging
+    logging.getLogger("xhtml2pdf").setLevel(logging.ERROR)
+    warnings.simplefilter("ignore")
+
+    head = f"{'formato':>10} {'Styler ms':>10} {'emissor ms':>11} {'ganho':>7} {'Styler KB':>10} {'emissor KB':>11}"
+    if args.render:
+        head += f" {'pisa Styler s':>14} {'pisa emissor s':>15}"
+    print(head)
+    for shape in args.shapes:
+        rows, cols = (int(x) for x in shape.lower().split("x"))
+        df = make_frame(rows, cols)
+        old_s, old_html = _best(styler_table_html, df, args.repeat)
+        new_s, new_html = _best(dataframe_table_html, df, args.repeat)
+        line = (f"{shape:>10} {old_s * 1e3:>10.1f} {new_s * 1e3:>11.1f} {old_s / new_s:>6.1f}x "
+                f"{len(old_html) / 1024:>10.0f} {len(new_html) / 1024:>11.0f}")
+        if args.render:
+            line += f" {_render_s(old_html):>14.2f} {_render_s(new_html):>15.2f}"
+        print(line, flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
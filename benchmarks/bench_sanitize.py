@@ -0,0 +1,72 @@
+"""Benchmark: sanitizador de CSS em uma passada x cadeia de regex antiga.
+
+Gera folhas de estilo sintéticas (sem rede) e mede, por tamanho:
+  - legado:   sanitize_css_legacy (5 passadas de regex + laço de caracteres)
+  - 1 passada: sanitizador por tokens sem cache
+  - cache:    sanitize_css repetido (mesma folha, ex.: mesmo modelo em vários arquivos)
+
+Uso:
+    python benchmarks/bench_sanitize.py [--rules 200 2000 20000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from htmlpdf import sanitize as S  # noqa: E402
+
+_DECLS = [
+    "color:#333", "background-color: #fafafa", "display:flex", "display: grid", "margin: 0 auto",
+    "padding: 4px 8px", "box-shadow: 0 1px 2px rgba(0,0,0,.2)", "transform: translateX(10px)",
+    "text-transform: uppercase", "width: calc(100% - (2 * var(--gap)))", "font-size: var(--fs, 12px)",
+    "position: absolute", "position: relative", "transition: all .2s", "border: 1px solid #ccc",
+]
+_SELECTORS = ["a:hover", ".card > .title", "ul li:nth-child(2n+1)", "p::before", "h1 + p", ".x ~ .y", "td", "#main .c"]
+
+
+def make_css(n_rules: int, seed: int = 1) -> str:
+    rnd = random.Random(seed)
+    parts = ["@import url(base.css);", "@font-face { font-family: X; src: url(x.woff2); }"]
+    for i in range(n_rules):
+        decls = "; ".join(rnd.sample(_DECLS, 5))
+        rule = f"{rnd.choice(_SELECTORS)}, .r{i} {{ {decls} }}"
+        if i % 25 == 0:
+            rule = f"@media (max-width: {600 + i}px) {{ {rule} }}"
+        elif i % 40 == 0:
+            rule = f"/* bloco {i} */ @supports (display:grid) {{ {rule} }}"
+        parts.append(rule)
+    return "\n".join(parts)
+
+
+def _best(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rules", type=int, nargs="+", default=[200, 2000, 20000])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    print(f"{'regras':>8} {'KB':>8} {'legado ms':>10} {'1 passada ms':>13} {'cache ms':>9} {'ganho':>7}")
+    for n in args.rules:
+        css = make_css(n)
+        legacy = _best(S.sanitize_css_legacy, css, args.repeat)
+        single = _best(lambda c: S._sanitize_css_uncached(S.unescape(c)), css, args.repeat)
+        S.sanitize_css(css)  # aquece o cache
+        cached = _best(S.sanitize_css, css, args.repeat)
+        print(f"{n:>8} {len(css) / 1024:>8.0f} {legacy * 1e3:>10.1f} {single * 1e3:>13.1f} "
+              f"{cached * 1e3:>9.2f} {legacy / single:>6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
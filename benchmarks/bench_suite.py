@@ -0,0 +1,352 @@
+"""Benchmark de todos os caminhos de conversão, com dados gerados (sem rede).
+
+Gera, com semente fixa, um HTML grande com CSS pesado, planilhas larga e
+comprida, um DOCX cheio de imagens, digitalizações JPEG/TIFF grandes e um lote
+de PDFs para unir. Mede, por caso:
+  - latência p50/p90/p99 (ms) de `--repeat` execuções, depois de uma de aquecimento
+    (caches de processo como o contexto do WeasyPrint e a área de trabalho valem,
+    como no app);
+  - vazão (MB de entrada por segundo e execuções por segundo);
+  - pico de memória (RSS) e quanto ele subiu em relação ao RSS do começo do caso
+    (no Linux o pico é zerado antes de cada caso).
+
+Para comparar execuções (ex.: antes/depois de atualizar uma biblioteca):
+    python benchmarks/bench_suite.py --json antes.json
+    python benchmarks/bench_suite.py --json depois.json --compare antes.json
+
+Uso:
+    python benchmarks/bench_suite.py [--scale 1] [--repeat 5] [--engine auto] [--only xlsx merge]
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_sanitize import make_css  # noqa: E402
+from htmlpdf.convert import NamedBytesIO, convert_uploaded_file_to_pdf_bytes  # noqa: E402
+from htmlpdf.errors import ConversionWarning  # noqa: E402
+from htmlpdf.metrics import _reset_peak, peak_rss_mb  # noqa: E402
+from htmlpdf.options import ConvertOptions, MergeOptions  # noqa: E402
+
+SEED = 1234
+
+
+# -----------------------
+# Dados gerados
+# -----------------------
+def make_html(n_rows: int, n_rules: int) -> str:
+    rnd = random.Random(SEED)
+    rows = "".join(
+        f"<tr class='r{i % 7}'><td>{i}</td><td>Item {rnd.randint(1, 10**6)}</td>"
+        f"<td style='color:#{rnd.randrange(0x1000000):06x}; display:flex'>{rnd.random() * 1000:.2f}</td></tr>"
+        for i in range(n_rows))
+    paras = "".join(f"<p class='card r{i % 7}'>Parágrafo {i}: " + "texto de exemplo " * 12 + "</p>"
+                    for i in range(n_rows // 4))
+    return (f"<html><head><meta charset='utf-8'><style>{make_css(n_rules, SEED)}</style></head><body>"
+            f"<h1>Relatório</h1>{paras}<table><thead><tr><th>#</th><th>Item</th><th>Valor</th></tr></thead>"
+            f"<tbody>{rows}</tbody></table></body></html>")
+
+
+def make_xlsx(n_rows: int, n_cols: int) -> bytes:
+    from openpyxl import Workbook
+    rnd = random.Random(SEED)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Dados")
+    ws.append([f"Coluna {c}" for c in range(n_cols)])
+    for r in range(n_rows):
+        ws.append([r if c == 0 else (rnd.random() * 1000 if c % 3 else f"txt {rnd.randint(0, 999)}")
+                   for c in range(n_cols)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _noise_image(size: tuple[int, int], seed: int):
+    # Ruído + degradê + cor de fundo, tudo a partir da semente (mesmos bytes a cada execução)
+    from PIL import Image
+    rnd = random.Random(seed)
+    noise = Image.frombytes("L", size, rnd.randbytes(size[0] * size[1]))
+    ramp = Image.linear_gradient("L").resize(size)
+    base = Image.merge("RGB", (noise, ramp, ramp.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    tint = Image.new("RGB", size, (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    return Image.blend(base, tint, 0.6)
+
+
+def make_docx(n_images: int, repeats: int, image_px: int) -> bytes:
+    # .docx mínimo (sem python-docx): n imagens distintas, cada uma repetida `repeats` vezes
+    ns = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+          'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+          'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+          'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+          'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"')
+    body, rels, media = [], [], {}
+    for i in range(n_images):
+        buf = io.BytesIO()
+        _noise_image((image_px, image_px * 2 // 3), SEED + i).save(buf, "JPEG", quality=90)
+        media[f"word/media/image{i}.jpeg"] = buf.getvalue()
+        rels.append(f'<Relationship Id="rImg{i}" Type="http://schemas.openxmlformats.org/officeDocument/'
+                    f'2006/relationships/image" Target="media/image{i}.jpeg"/>')
+    n = 0
+    for _ in range(repeats):
+        for i in range(n_images):
+            n += 1
+            body.append(
+                f'<w:p><w:r><w:drawing><wp:inline><wp:extent cx="5000000" cy="3300000"/>'
+                f'<wp:docPr id="{n}" name="img{n}" descr="imagem {i}"/><a:graphic><a:graphicData '
+                f'uri="http://schemas.openxmlformats.org/drawingml/2006/picture"><pic:pic><pic:blipFill>'
+                f'<a:blip r:embed="rImg{i}"/></pic:blipFill></pic:pic></a:graphicData></a:graphic>'
+                f'</wp:inline></w:drawing></w:r></w:p><w:p><w:r><w:t>Legenda {n}</w:t></w:r></w:p>')
+    rel_ns = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml",
+                   '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="jpeg" ContentType="image/jpeg"/><Override PartName="/word/document.xml" '
+                   'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                   '</Types>')
+        z.writestr("_rels/.rels", f'<?xml version="1.0"?><Relationships {rel_ns}><Relationship Id="rId1" '
+                                  'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+                                  'officeDocument" Target="word/document.xml"/></Relationships>')
+        z.writestr("word/_rels/document.xml.rels",
+                   f'<?xml version="1.0"?><Relationships {rel_ns}>{"".join(rels)}</Relationships>')
+        z.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8"?><w:document {ns}><w:body>'
+                                        f'{"".join(body)}</w:body></w:document>')
+        for name, data in media.items():
+            z.writestr(name, data)
+    return buf.getvalue()
+
+
+def make_scan_jpeg(scale: float) -> bytes:
+    # Página A4 a 300 dpi (2480x3508) na escala 1
+    w, h = int(2480 * scale), int(3508 * scale)
+    buf = io.BytesIO()
+    _noise_image((w, h), SEED).save(buf, "JPEG", quality=85, dpi=(300, 300))
+    return buf.getvalue()
+
+
+def make_scan_tiff(pages: int, scale: float) -> bytes:
+    w, h = int(2480 * scale), int(3508 * scale)
+    frames = [_noise_image((w, h), SEED + p).convert("L") for p in range(pages)]
+    buf = io.BytesIO()
+    frames[0].save(buf, "TIFF", save_all=True, append_images=frames[1:], compression="tiff_deflate")
+    return buf.getvalue()
+
+
+def make_pdfs(n_docs: int, pages: int) -> list[bytes]:
+    # PDFs de imagem pelo Pillow; o mesmo "logo" em todos (exercita a deduplicação)
+    logo = _noise_image((600, 200), SEED)
+    docs = []
+    for d in range(n_docs):
+        frames = []
+        for p in range(pages):
+            page = _noise_image((827, 1169), SEED + d * 100 + p)
+            page.paste(logo, (100, 50))
+            frames.append(page)
+        buf = io.BytesIO()
+        frames[0].save(buf, "PDF", save_all=True, append_images=frames[1:], resolution=100)
+        docs.append(buf.getvalue())
+    return docs
+
+
+# -----------------------
+# Casos
+# -----------------------
+def _pick_engine(choice: str) -> str:
+    if choice != "auto":
+        return choice
+    try:
+        from htmlpdf.engines import _import_weasy
+        _import_weasy()
+        return "weasyprint"
+    except Exception:
+        return "xhtml2pdf"
+
+
+def build_cases(scale: float, engine: str) -> list[tuple[str, str, float, object]]:
+    # -> (grupo, nome, MB de entrada, função(rep) a medir)
+    from htmlpdf.engines import build_pdf_weasy, build_pdf_xhtml2pdf
+    from htmlpdf.merge import merge_pdfs, merge_pdfs_to_file
+    from htmlpdf.sanitize import sanitize_css
+    from htmlpdf.sources import excel_to_html
+
+    s = max(scale, 0.05)
+    options = ConvertOptions(engine=engine)
+    mb = lambda data: len(data) / (1024 * 1024)  # noqa: E731
+    cases = []
+
+    css = make_css(int(5000 * s), SEED)
+    # Um comentário por repetição: sem acerto no cache do sanitizador
+    cases.append(("css", "sanitize_css", mb(css.encode()), lambda rep: sanitize_css(f"/* {rep} */" + css)))
+
+    html = make_html(int(800 * s), int(1000 * s))
+    html_bytes = html.encode("utf-8")
+    cases.append(("html", "build_pdf_xhtml2pdf", mb(html_bytes),
+                  lambda rep: build_pdf_xhtml2pdf(html, ConvertOptions(engine="xhtml2pdf"))))
+    if engine == "weasyprint":
+        cases.append(("html", "build_pdf_weasy", mb(html_bytes),
+                      lambda rep: build_pdf_weasy(html, ".", options)))
+    cases.append(("html", f"convert .html ({engine})", mb(html_bytes),
+                  lambda rep: convert_uploaded_file_to_pdf_bytes(NamedBytesIO(html_bytes, "grande.html"), options)))
+
+    wide = make_xlsx(int(300 * s), 40)
+    tall = make_xlsx(int(3000 * s), 12)
+    for label, data in (("larga", wide), ("comprida", tall)):
+        cases.append(("xlsx", f"excel_to_html ({label})", mb(data),
+                      lambda rep, d=data: excel_to_html(NamedBytesIO(d, "p.xlsx"))))
+        cases.append(("xlsx", f"convert .xlsx ({label}, {engine})", mb(data),
+                      lambda rep, d=data: convert_uploaded_file_to_pdf_bytes(NamedBytesIO(d, "p.xlsx"), options)))
+
+    docx = make_docx(n_images=max(1, int(6 * s)), repeats=8, image_px=int(2000 * s) or 200)
+    cases.append(("docx", f"convert .docx ({engine})", mb(docx),
+                  lambda rep: convert_uploaded_file_to_pdf_bytes(NamedBytesIO(docx, "fotos.docx"), options)))
+
+    jpeg = make_scan_jpeg(s)
+    tiff = make_scan_tiff(max(1, int(4 * s)), s)
+    cases.append(("imagem", "convert .jpg (nativo)", mb(jpeg),
+                  lambda rep: convert_uploaded_file_to_pdf_bytes(NamedBytesIO(jpeg, "scan.jpg"), options)))
+    cases.append(("imagem", "convert .tiff (nativo)", mb(tiff),
+                  lambda rep: convert_uploaded_file_to_pdf_bytes(NamedBytesIO(tiff, "scan.tiff"), options)))
+    cases.append(("imagem", f"convert .jpg (via HTML, {engine})", mb(jpeg),
+                  lambda rep: convert_uploaded_file_to_pdf_bytes(
+                      NamedBytesIO(jpeg, "scan.jpg"), ConvertOptions(engine=engine, native_images=False))))
+
+    pdfs = make_pdfs(max(2, int(20 * s)), 3)
+    total = sum(len(p) for p in pdfs) / (1024 * 1024)
+    cases.append(("merge", "merge_pdfs (memória)", total, lambda rep: merge_pdfs(pdfs)))
+
+    def _stream(rep, opts=MergeOptions()):
+        with tempfile.TemporaryFile() as out:
+            merge_pdfs_to_file(pdfs, out, opts)
+    cases.append(("merge", "merge_pdfs_to_file", total, _stream))
+    cases.append(("merge", "merge_pdfs_to_file (150 dpi)", total,
+                  lambda rep: _stream(rep, MergeOptions(max_image_dpi=150))))
+    return cases
+
+
+# -----------------------
+# Medição
+# -----------------------
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def run_case(fn, repeat: int, warmup: bool) -> dict:
+    gc.collect()
+    base = _rss_mb()
+    _reset_peak()
+    if warmup:
+        fn(-1)
+    times = []
+    for rep in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(rep)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    peak = peak_rss_mb()
+    return {"n": repeat, "p50_ms": _percentile(times, 50) * 1e3, "p90_ms": _percentile(times, 90) * 1e3,
+            "p99_ms": _percentile(times, 99) * 1e3, "media_ms": sum(times) / len(times) * 1e3,
+            "pico_rss_mb": peak, "acrescimo_mb": peak - base if peak is not None and base is not None else None}
+
+
+def environment(engine: str, scale: float) -> dict:
+    import importlib.metadata as md
+    versions = {}
+    for pkg in ("weasyprint", "xhtml2pdf", "reportlab", "pypdf", "pillow", "openpyxl", "pandas", "mammoth"):
+        try:
+            versions[pkg] = md.version(pkg)
+        except md.PackageNotFoundError:
+            versions[pkg] = None
+    return {"python": platform.python_version(), "sistema": f"{platform.system()} {platform.release()}",
+            "maquina": platform.machine(), "cpus": os.cpu_count(), "motor": engine, "escala": scale,
+            "semente": SEED, "versoes": versions}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scale", type=float, default=1.0, help="multiplica o tamanho dos dados gerados")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-warmup", dest="warmup", action="store_false")
+    ap.add_argument("--engine", choices=["auto", "weasyprint", "xhtml2pdf"], default="auto")
+    ap.add_argument("--only", nargs="+", metavar="GRUPO",
+                    help="só estes grupos: css html xlsx docx imagem merge")
+    ap.add_argument("--json", metavar="ARQUIVO", help="grava os resultados (e o ambiente) em JSON")
+    ap.add_argument("--compare", metavar="ARQUIVO", help="JSON de uma execução anterior para comparar o p50")
+    args = ap.parse_args(argv)
+
+    logging.getLogger("xhtml2pdf").setLevel(logging.ERROR)
+    warnings.simplefilter("ignore", ConversionWarning)
+    # Área de trabalho própria: resultados não dependem do que já está no /tmp
+    workdir = tempfile.TemporaryDirectory(prefix="htmlpdf_bench_")
+    os.environ["HTMLPDF_WORKSPACE_DIR"] = workdir.name
+
+    engine = _pick_engine(args.engine)
+    print(f"motor: {engine} | escala: {args.scale} | repetições: {args.repeat}\n")
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f).get("casos", {})
+
+    t_gen = time.perf_counter()
+    cases = [c for c in build_cases(args.scale, engine) if not args.only or c[0] in args.only]
+    print(f"dados gerados em {time.perf_counter() - t_gen:.1f}s\n")
+
+    header = (f"{'caso':<40} {'MB':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'MB/s':>8} "
+              f"{'exec/s':>7} {'pico MB':>8} {'+MB':>6}")
+    print(header + (f" {'vs ant.':>8}" if previous else ""))
+    results = {}
+    for group, name, size_mb, fn in cases:
+        try:
+            r = run_case(fn, max(1, args.repeat), args.warmup)
+        except Exception as e:
+            print(f"{name:<40} falhou: {e.__class__.__name__}: {e}")
+            results[name] = {"grupo": group, "erro": f"{e.__class__.__name__}: {e}"}
+            continue
+        r.update(grupo=group, entrada_mb=size_mb, mb_s=size_mb / (r["p50_ms"] / 1e3),
+                 exec_s=1e3 / r["p50_ms"])
+        results[name] = r
+        line = (f"{name:<40} {size_mb:>7.2f} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                f"{r['mb_s']:>8.2f} {r['exec_s']:>7.2f} {r['pico_rss_mb'] or 0:>8.0f} {r['acrescimo_mb'] or 0:>6.0f}")
+        old = previous.get(name, {}).get("p50_ms")
+        if old:
+            line += f" {r['p50_ms'] / old:>7.2f}x"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"ambiente": environment(engine, args.scale), "repeticoes": args.repeat,
+                       "casos": results}, f, ensure_ascii=False, indent=2)
+    workdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Benchmark: memória da leitura de um upload grande (antes do motor de layout).
+
+Cada caso roda num processo novo: gera o arquivo, embrulha num BytesIO (como o
+UploadedFile do Streamlit), zera o pico de RSS e faz o caminho do app: hash do
+upload (chave do cache) e `convert()` sobre o buffer. O motor (WeasyPrint/
+xhtml2pdf) é trocado por uma função vazia: o que se mede são as cópias do
+conteúdo na leitura, não o layout. Resultado: quanto o pico subiu, em múltiplos
+do tamanho do arquivo (o arquivo em si já está na memória antes da medição).
+
+Casos: html (decodifica o texto), zip (pacote HTML extraído), pool (o mesmo HTML
+entregue por iter_convert a 2 workers; mede só o processo principal).
+
+Uso:
+    python benchmarks/bench_upload_memory.py [--mb 200] [--only html zip pool]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CASE = r"""
+import gc, importlib, io, json, sys, zipfile
+sys.path.insert(0, sys.argv[3])
+conv = importlib.import_module("htmlpdf.convert")  # htmlpdf.convert é a função exportada
+from htmlpdf.buffers import file_buffer
+from htmlpdf.cache import content_digest
+from htmlpdf.metrics import _reset_peak, peak_rss_mb
+from htmlpdf.options import ConvertOptions
+
+case, size = sys.argv[1], int(float(sys.argv[2]) * 1024 * 1024)
+para = "<p>Parágrafo de exemplo com acentuação: ação, coração, informação.</p>\n".encode("utf-8")
+html = b"<html><head><meta charset='utf-8'></head><body>" + para * (size // len(para)) + b"</body></html>"
+if case == "zip":
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("index.html", html)
+    data, name = buf.getvalue(), "pacote.zip"
+else:
+    data, name = html, "grande.html"
+del html
+upload = io.BytesIO(data)
+conv.convert_html_to_pdf = lambda *a, **k: b"%PDF-1.4 vazio"
+gc.collect()
+_reset_peak()
+base = peak_rss_mb()  # logo depois de zerar, o pico é o RSS atual
+content_digest(file_buffer(upload))
+if case == "pool":
+    from htmlpdf.pool import get_pool, iter_convert
+    get_pool(2)
+    gc.collect()
+    _reset_peak()
+    base = peak_rss_mb()  # logo depois de zerar, o pico é o RSS atual
+    # extensão sem conversor: o worker falha logo depois de abrir o conteúdo, e o
+    # que sobra é o custo de entregar o arquivo ao pool
+    items = [("grande.bin", file_buffer(upload)), ("b.bin", b"x")]
+    for _ in iter_convert(items, ConvertOptions(engine="xhtml2pdf"), 2):
+        pass
+else:
+    conv.convert(file_buffer(upload), ConvertOptions(engine="xhtml2pdf"), name=name)
+print(json.dumps({"mb": len(data) / 1048576, "subida_mb": peak_rss_mb() - base}))
+"""
+
+
+def run_case(case: str, mb: float) -> dict:
+    proc = subprocess.run([sys.executable, "-c", _CASE, case, str(mb), ROOT], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"erro": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falhou"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mb", type=float, default=200, help="tamanho do HTML gerado")
+    ap.add_argument("--only", nargs="+", default=["html", "zip", "pool"], choices=["html", "zip", "pool"])
+    args = ap.parse_args(argv)
+
+    print(f"{'caso':>6} {'arquivo MB':>11} {'subida MB':>10} {'x arquivo':>10}")
+    for case in args.only:
+        res = run_case(case, args.mb)
+        if "erro" in res:
+            print(f"{case:>6}  falhou: {res['erro']}")
+            continue
+        print(f"{case:>6} {res['mb']:>11.0f} {res['subida_mb']:>10.0f} {res['subida_mb'] / res['mb']:>9.2f}x",
+              flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
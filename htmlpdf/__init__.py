@@ -0,0 +1,21 @@
+"""Núcleo de conversão do app HTML/XLS(X)/DOCX/Imagens ➜ PDF (sem Streamlit).
+
+Uso como biblioteca:
+    from htmlpdf import ConvertOptions, convert
+    pdf = convert("relatorio.html", ConvertOptions(engine="xhtml2pdf"))
+"""
+from .cache import ConversionCache, content_digest, conversion_key
+from .convert import SUPPORTED_EXTS, convert, convert_uploaded_file_to_pdf_bytes
+from .errors import ConversionError, ConversionWarning, MissingDependencyError, ResourceLimitError
+from .jobs import JobQueue, get_job_queue
+from .merge import PreparedPdfCache, assemble_pdf, merge_pdfs, merge_pdfs_to_file, prepare_pdf
+from .options import ConvertOptions, MergeOptions
+from .pool import convert_many, iter_convert
+
+__all__ = [
+    "ConversionCache", "content_digest", "conversion_key",
+    "SUPPORTED_EXTS", "convert", "convert_uploaded_file_to_pdf_bytes",
+    "ConversionError", "ConversionWarning", "MissingDependencyError", "ResourceLimitError",
+    "merge_pdfs", "merge_pdfs_to_file", "prepare_pdf", "assemble_pdf", "PreparedPdfCache", "ConvertOptions", "MergeOptions", "convert_many", "iter_convert",
+    "JobQueue", "get_job_queue",
+]
@@ -0,0 +1,127 @@
+"""Conteúdo dos arquivos sem cópias: memoryview do upload ou do arquivo mapeado.
+
+Cada etapa da conversão fazia `read()` (uma cópia) e depois `BytesIO(dados)`
+(outra) antes de entregar o conteúdo ao leitor. Aqui o arquivo vira um
+`memoryview` do buffer que já existe:
+
+  - upload do Streamlit / BytesIO: os próprios bytes do upload (`getvalue()`
+    não copia enquanto ninguém escreveu no BytesIO; `getbuffer()` copiaria);
+  - bytes/memoryview: o mesmo objeto;
+  - arquivo em disco: mapeado com mmap (as páginas vêm do cache do sistema e
+    não contam como memória própria do processo).
+
+`BufferFile` dá a interface de arquivo (read/seek/tell) sobre esse buffer para
+as bibliotecas que pedem um arquivo (openpyxl, zipfile, mammoth, Pillow).
+"""
+import io
+import mmap
+import os
+from typing import Optional
+
+
+class BufferFile(io.BufferedIOBase):
+    # Arquivo somente leitura sobre um buffer (bytes, memoryview, mmap), com .name
+    # como o UploadedFile. read(n) copia só os n bytes pedidos.
+    def __init__(self, buffer, name: str = "", owner=None):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+        self._owner = owner  # ex.: o mmap, fechado junto com o arquivo
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def getbuffer(self) -> memoryview:
+        self._checkClosed()
+        return self._view
+
+    def getvalue(self) -> bytes:
+        return self.getbuffer().tobytes()
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        self._checkClosed()
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes() if end > self._pos else b""
+        self._pos = max(self._pos, end)
+        return data
+
+    read1 = read
+
+    def readinto(self, b) -> int:
+        self._checkClosed()
+        out = memoryview(b).cast("B")
+        n = max(0, min(len(out), len(self._view) - self._pos))
+        out[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    readinto1 = readinto
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        if base + offset < 0:
+            raise ValueError(f"posição negativa: {base + offset}")
+        self._pos = base + offset
+        return self._pos
+
+    def tell(self) -> int:
+        self._checkClosed()
+        return self._pos
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self._view.release()
+            if self._owner is not None:
+                self._owner.close()
+        except BufferError:
+            pass  # ainda há uma fatia em uso (ex.: imagem do Pillow): o GC libera depois
+        super().close()
+
+
+def open_mapped(path, name: Optional[str] = None) -> BufferFile:
+    # Arquivo em disco -> BufferFile sobre um mmap somente leitura (vazio: b"")
+    name = name or os.path.basename(os.fspath(path))
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return BufferFile(b"", name)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BufferFile(mapped, name, owner=mapped)
+
+
+def file_buffer(file) -> memoryview:
+    # Conteúdo inteiro do arquivo/upload como memoryview, sem copiar quando possível
+    if isinstance(file, BufferFile):
+        return file.getbuffer()
+    if isinstance(file, (bytes, bytearray, memoryview, mmap.mmap)):
+        return memoryview(file)
+    if isinstance(file, io.BytesIO):
+        return memoryview(file.getvalue())
+    file.seek(0)
+    return memoryview(file.read())
+
+
+def as_file(file) -> BufferFile:
+    # Arquivo posicionado no início para quem precisa de read/seek; BufferFile é
+    # reaproveitado, o resto ganha um BufferFile sobre o mesmo buffer
+    if isinstance(file, BufferFile):
+        file.seek(0)
+        return file
+    return BufferFile(file_buffer(file), getattr(file, "name", ""))
+
+
+def decode_text(data) -> str:
+    # UTF-8 (latin-1 se não for) direto do buffer, sem um bytes intermediário
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError:
+        return str(data, "latin-1", errors="ignore")
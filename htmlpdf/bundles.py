@@ -0,0 +1,149 @@
+"""Pacotes .zip com uma página HTML e seus recursos (CSS, imagens, fontes).
+
+O .zip é extraído uma vez para a área de trabalho (pasta por hash do pacote) e
+reaproveitado enquanto existir. Durante a renderização, os motores só enxergam
+arquivos dentro dessa pasta: nada de rede, nada de timeout por recurso.
+"""
+import mimetypes
+import os
+import threading
+import zipfile
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from .buffers import BufferFile, decode_text, file_buffer, open_mapped
+from .cache import content_digest
+from .errors import ConversionError
+from .workspace import Workspace, get_workspace
+
+MAX_MEMBERS = 5000
+MAX_UNCOMPRESSED = 512 * 1024 * 1024
+HTML_SUFFIXES = (".html", ".htm")
+INDEX_NAMES = ("index.html", "index.htm")
+
+_entries: dict = {}  # hash do pacote -> caminho relativo do HTML principal
+_entries_lock = threading.Lock()
+
+
+def _pick_html(names: list[str]) -> Optional[str]:
+    # O .html mais raso; no mesmo nível, index.html primeiro (depois ordem alfabética)
+    pages = [n for n in names if n.lower().endswith(HTML_SUFFIXES) and not n.startswith("__MACOSX/")]
+    if not pages:
+        return None
+    pages.sort(key=lambda n: (n.count("/"), Path(n).name.lower() not in INDEX_NAMES, n.lower()))
+    return pages[0]
+
+
+def _safe_members(zf: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    infos = [i for i in zf.infolist() if not i.is_dir()]
+    if len(infos) > MAX_MEMBERS:
+        raise ConversionError(f"O .zip tem arquivos demais ({len(infos)}; limite {MAX_MEMBERS}).")
+    if sum(i.file_size for i in infos) > MAX_UNCOMPRESSED:
+        raise ConversionError("O .zip descompactado passa do limite de "
+                              f"{MAX_UNCOMPRESSED // (1024 * 1024)} MB.")
+    safe = []
+    for info in infos:
+        parts = Path(info.filename.replace("\\", "/")).parts
+        if info.filename.startswith(("/", "\\")) or ".." in parts or (parts and ":" in parts[0]):
+            continue  # caminho fora do pacote (zip slip)
+        if (info.external_attr >> 16) & 0o170000 == 0o120000:
+            continue  # link simbólico
+        safe.append(info)
+    return safe
+
+
+def _extract(data, target: Path) -> None:
+    with zipfile.ZipFile(BufferFile(data)) as zf:
+        for info in _safe_members(zf):
+            zf.extract(info, target)
+
+
+def read_html_bundle(uploaded_file, workspace: Optional[Workspace] = None) -> tuple[str, str, str]:
+    # -> (html, base_url = pasta do HTML, raiz do pacote)
+    data = file_buffer(uploaded_file)
+    workspace = workspace or get_workspace()
+    digest = content_digest(data)
+
+    root = workspace.root / digest
+    with _entries_lock:
+        html_rel = _entries.get(digest)
+    if html_rel is None or not (root / html_rel).is_file():
+        try:
+            root = workspace.entry(digest, extract=lambda tmp: _extract(data, tmp))
+        except zipfile.BadZipFile as e:
+            raise ConversionError(f"Arquivo .zip inválido: {e}") from e
+        html_rel = _pick_html(sorted(
+            str(p.relative_to(root)).replace(os.sep, "/") for p in root.rglob("*") if p.is_file()))
+        if html_rel is None:
+            raise ConversionError("O .zip não tem nenhuma página .html/.htm.")
+        with _entries_lock:
+            _entries[digest] = html_rel
+
+    # Página extraída lida pelo mmap (páginas do cache do sistema, sem um bytes a mais)
+    with open_mapped(root / html_rel) as page:
+        html_str = decode_text(page.getbuffer())
+    return html_str, str((root / html_rel).parent), str(root)
+
+# -----------------------
+# Acesso restrito ao pacote
+# -----------------------
+def _local_path(url: str, root: str, base_dir: str) -> Optional[str]:
+    # Resolve a URL para um arquivo dentro de `root`; None se estiver fora ou for remota
+    parsed = urlparse(url)
+    if parsed.scheme in ("http", "https", "ftp"):
+        return None
+    if parsed.scheme == "file":
+        path = unquote(parsed.path)
+        if os.name == "nt" and path.startswith("/") and len(path) > 2 and path[2] == ":":
+            path = path[1:]
+    elif parsed.scheme == "":
+        path = os.path.join(base_dir, unquote(parsed.path))
+    elif len(parsed.scheme) == 1 and os.name == "nt":
+        path = url  # C:\... no Windows
+    else:
+        return None
+    if "\0" in path:
+        return None  # %00 na URL: realpath/open levantariam ValueError
+    real = os.path.realpath(path)
+    root_real = os.path.realpath(root)
+    if os.path.commonpath([real, root_real]) != root_real or not os.path.isfile(real):
+        return None
+    return real
+
+
+def bundle_resolver(root: str, base_dir: Optional[str] = None):
+    # (url) -> (arquivo, mime, URL) dentro do pacote; data: fica com o fetcher
+    # padrão (None); o resto é recusado na hora
+    base_dir = base_dir or root
+
+    def resolve(url):
+        if url.startswith("data:"):
+            return None
+        path = _local_path(url, root, base_dir)
+        if path is None:
+            raise ValueError(f"Recurso fora do pacote (não buscado): {url}")
+        return path, mimetypes.guess_type(path)[0] or "application/octet-stream", Path(path).as_uri()
+
+    return resolve
+
+
+def bundle_url_fetcher(root: str, base_dir: Optional[str] = None):
+    # url_fetcher do WeasyPrint: data: e arquivos do pacote; o resto falha na hora
+    from .engines import make_weasy_fetcher
+    return make_weasy_fetcher(bundle_resolver(root, base_dir))
+
+
+def bundle_link_callback(root: str, base_dir: Optional[str] = None):
+    # link_callback do xhtml2pdf: caminho local dentro do pacote. O pisa usa a URI
+    # original quando o callback devolve vazio, então recursos de fora apontam para
+    # um arquivo inexistente dentro do pacote (falha imediata, sem rede).
+    base_dir = base_dir or root
+    blocked = os.path.join(root, ".fora-do-pacote")
+
+    def link_callback(uri, rel=None):
+        if uri.startswith("data:"):
+            return uri
+        return _local_path(uri, root, base_dir) or blocked
+
+    return link_callback
@@ -0,0 +1,168 @@
+"""Cache de conversões endereçado por conteúdo.
+
+A chave é o hash do arquivo enviado + as configurações que de fato afetam a
+renderização. Há um nível em memória (LRU limitado por bytes/itens) e um nível
+opcional em disco, com limite de tamanho e remoção dos arquivos menos usados.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def content_digest(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def conversion_key(digest: str, settings: dict) -> str:
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{payload}".encode("utf-8")).hexdigest()
+
+
+class ConversionCache:
+    def __init__(self, max_memory_bytes: int = 256 * 1024 * 1024, max_memory_items: int = 256,
+                 disk_dir: Optional[str] = None, max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_bytes = 0
+        self._disk_bytes = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    # -----------------------
+    # API pública
+    # -----------------------
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits_memory += 1
+                return data
+
+        data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+            self._mem_put(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._mem_put(key, data)
+        self._disk_put(key, data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            if self.disk_dir is not None:
+                for path, _, _ in self._disk_entries():
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "itens_memoria": len(self._mem),
+                "bytes_memoria": self._mem_bytes,
+                "bytes_disco": self._disk_bytes,
+                "acertos_memoria": self.hits_memory,
+                "acertos_disco": self.hits_disk,
+                "faltas": self.misses,
+            }
+
+    # -----------------------
+    # Nível em memória (LRU)
+    # -----------------------
+    def _mem_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = data
+        self._mem_bytes += len(data)
+        while self._mem and (self._mem_bytes > self.max_memory_bytes or len(self._mem) > self.max_memory_items):
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+
+    # -----------------------
+    # Nível em disco (LRU por mtime)
+    # -----------------------
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.pdf"
+
+    def _disk_entries(self):
+        out = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                st_ = entry.stat()
+                out.append((Path(entry.path), st_.st_size, st_.st_mtime))
+        return out
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # marca como usado recentemente
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        if self.disk_dir is None or len(data) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        if path.exists():
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        # Reescaneia: outros processos podem compartilhar a mesma pasta.
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
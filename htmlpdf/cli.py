@@ -0,0 +1,203 @@
+"""Linha de comando: converte arquivos/pastas/globs em PDF (ou une tudo em um PDF).
+
+Exemplos:
+    htmlpdf relatorios/ -o saidas/
+    htmlpdf "entrada/**/*.docx" planilha.xlsx --merge -o pacote.pdf -j 8
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from .convert import SUPPORTED_EXTS
+from .errors import ConversionError
+from .merge import merge_pdfs_to_file
+from .metrics import FileMetrics, to_jsonl
+from .options import ConvertOptions, MergeOptions
+from .pool import iter_convert
+
+
+def expand_inputs(patterns: list[str], recursive: bool = False) -> list[Path]:
+    found, seen = [], set()
+
+    def _add(path: Path):
+        key = path.resolve()
+        if key not in seen and path.suffix.lower() in SUPPORTED_EXTS:
+            seen.add(key)
+            found.append(path)
+
+    for pat in patterns:
+        p = Path(pat)
+        if p.is_dir():
+            walker = p.rglob("*") if recursive else p.glob("*")
+            for child in sorted(c for c in walker if c.is_file()):
+                _add(child)
+        elif glob.has_magic(pat):
+            for match in sorted(glob.glob(pat, recursive=True)):
+                if os.path.isfile(match):
+                    _add(Path(match))
+        elif p.is_file():
+            _add(p)
+        else:
+            print(f"aviso: nada encontrado em {pat}", file=sys.stderr)
+    return found
+
+
+def _output_path(out_dir: Path, src: Path, used: set) -> Path:
+    target = out_dir / f"{src.stem}.pdf"
+    n = 2
+    while target in used:
+        target = out_dir / f"{src.stem}_{n}.pdf"
+        n += 1
+    used.add(target)
+    return target
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="htmlpdf",
+        description="Converte HTML/XLS(X)/DOCX/Imagens/PDF em PDF (sem interface).",
+    )
+    ap.add_argument("inputs", nargs="+", help="arquivos, pastas ou globs (ex.: 'docs/**/*.html')")
+    ap.add_argument("-o", "--output", required=True,
+                    help="pasta de saída (padrão) ou arquivo .pdf final com --merge")
+    ap.add_argument("--merge", action="store_true", help="une todos os PDFs em um único arquivo, na ordem das entradas")
+    ap.add_argument("-r", "--recursive", action="store_true", help="percorre subpastas das pastas informadas")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="processos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--engine", choices=["weasyprint", "xhtml2pdf"], default="weasyprint")
+    ap.add_argument("--no-preserve-layout", dest="preserve_layout", action="store_false",
+                    help="ignora o tamanho de página do documento e usa --page-size/--orientation")
+    ap.add_argument("--page-size", choices=["A4", "Letter"], default="A4")
+    ap.add_argument("--orientation", choices=["portrait", "landscape"], default="portrait")
+    ap.add_argument("--margin-mm", type=int, default=10, help="margem lateral em mm (esquerda = direita)")
+    ap.add_argument("--no-paginate-sheets", dest="paginate_sheets", action="store_false",
+                    help="não quebra página entre planilhas do Excel")
+    ap.add_argument("--excel-chunk-rows", type=int, default=2000,
+                    help="linhas por bloco ao renderizar .xlsx em streaming (0 = planilha inteira via pandas)")
+    ap.add_argument("--no-sanitize", dest="sanitize", action="store_false", help="não sanitiza CSS (xhtml2pdf)")
+    ap.add_argument("--images-via-html", dest="native_images", action="store_false",
+                    help="renderiza imagens pelo motor de HTML em vez do caminho direto imagem -> PDF")
+    ap.add_argument("--docx-max-image-px", type=int, default=0,
+                    help="reduz imagens do .docx com lado maior acima disso, antes da renderização (0 = não reduz)")
+    ap.add_argument("--asset-dir", default=os.environ.get("HTMLPDF_ASSET_DIR", ""),
+                    help="cache/espelho local de CSS, fontes e imagens remotos (WeasyPrint)")
+    ap.add_argument("--offline", action="store_true", help="nunca acessa a rede; URLs sem cópia local são puladas")
+    ap.add_argument("--split-render", action="store_true",
+                    help="HTML muito longo (WeasyPrint): corta em blocos e renderiza em paralelo (-j processos)")
+    ap.add_argument("--max-seconds", type=float, default=float(os.environ.get("HTMLPDF_MAX_SECONDS") or 0),
+                    help="limite de tempo por arquivo, em segundos (0 = sem limite); ao passar, o arquivo "
+                         "falha e os demais seguem")
+    ap.add_argument("--max-cpu-seconds", type=float, default=float(os.environ.get("HTMLPDF_MAX_CPU_SECONDS") or 0),
+                    help="limite de tempo de CPU por arquivo, em segundos (0 = sem limite)")
+    ap.add_argument("--max-memory-mb", type=int, default=int(os.environ.get("HTMLPDF_MAX_MEMORY_MB") or 0),
+                    help="limite de memória (RSS) do processo de cada conversão, em MB (0 = sem limite)")
+    ap.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                    help="com --merge: não deduplica fontes/imagens repetidas entre os documentos")
+    ap.add_argument("--recompress", action="store_true", help="com --merge: recomprime streams (Flate nível 9)")
+    ap.add_argument("--max-image-dpi", type=int, default=0,
+                    help="com --merge: reduz imagens acima desse DPI (0 = não reduz)")
+    ap.add_argument("--metrics", metavar="ARQUIVO.jsonl",
+                    help="grava tempo (relógio/CPU) e pico de memória por arquivo e etapa, em JSON lines")
+    ap.add_argument("-q", "--quiet", action="store_true")
+    return ap
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    options = ConvertOptions(
+        engine=args.engine,
+        preserve_layout=args.preserve_layout,
+        page_size=args.page_size,
+        orientation=args.orientation,
+        margin_mm=args.margin_mm,
+        paginate_sheets=args.paginate_sheets,
+        sanitize=args.sanitize,
+        native_images=args.native_images,
+        stream_excel=args.excel_chunk_rows > 0,
+        excel_chunk_rows=max(1, args.excel_chunk_rows),
+        docx_max_image_px=max(0, args.docx_max_image_px),
+        asset_dir=args.asset_dir,
+        offline=args.offline,
+        split_render=args.split_render,
+        split_workers=max(1, args.jobs),
+        max_seconds=max(0.0, args.max_seconds),
+        max_cpu_seconds=max(0.0, args.max_cpu_seconds),
+        max_memory_mb=max(0, args.max_memory_mb),
+    )
+
+    sources = expand_inputs(args.inputs, recursive=args.recursive)
+    if not sources:
+        print("erro: nenhum arquivo suportado encontrado.", file=sys.stderr)
+        return 2
+
+    out = Path(args.output)
+    if args.merge:
+        # Cada PDF vai para um arquivo temporário; o merge lê e grava em disco
+        spool = tempfile.TemporaryDirectory(prefix="htmlpdf_cli_")
+    else:
+        out.mkdir(parents=True, exist_ok=True)
+        used = set()
+        dests = [_output_path(out, src, used) for src in sources]  # nomes estáveis, na ordem das entradas
+
+    items = [(str(src), src) for src in sources]
+    results = [None] * len(items)
+    failed = 0
+    records = [] if args.metrics else None
+    t0 = time.perf_counter()
+    for done, (i, pdf_bytes, err, warns) in enumerate(iter_convert(items, options, max(1, args.jobs), records),
+                                                      start=1):
+        src = sources[i]
+        for w in warns:
+            print(f"aviso: {src}: {w}", file=sys.stderr)
+        if err is not None:
+            failed += 1
+            print(f"[{done}/{len(items)}] ERRO {src}: {err.__class__.__name__}: {err}", file=sys.stderr)
+            continue
+        if args.merge:
+            if src.suffix.lower() == ".pdf":
+                results[i] = src  # o merge lê direto do arquivo de entrada
+            else:
+                results[i] = os.path.join(spool.name, f"{i:06d}.pdf")
+                Path(results[i]).write_bytes(pdf_bytes)
+            dest = None
+        else:
+            dest = dests[i]
+            dest.write_bytes(pdf_bytes)
+        if not args.quiet:
+            print(f"[{done}/{len(items)}] ok {src}" + (f" -> {dest}" if dest else ""), file=sys.stderr)
+
+    if args.merge:
+        with spool:
+            ordered = [p for p in results if p is not None]
+            if not ordered:
+                print("erro: nenhum arquivo pôde ser convertido.", file=sys.stderr)
+                return 1
+            if out.parent != Path(""):
+                out.parent.mkdir(parents=True, exist_ok=True)
+            merge_metrics = FileMetrics(f"(merge: {out.name})")
+            try:
+                with merge_metrics, merge_metrics.stage("merge_pdfs_to_file", documentos=len(ordered)):
+                    merge_pdfs_to_file(ordered, out, MergeOptions(dedupe=args.dedupe, recompress=args.recompress,
+                                                                  max_image_dpi=max(0, args.max_image_dpi)))
+            except ConversionError as e:
+                print(f"erro: {e}", file=sys.stderr)
+                return 1
+            finally:
+                if records is not None:
+                    records.append(merge_metrics.to_dict())
+        if not args.quiet:
+            print(f"unidos {len(ordered)} documento(s) em {out}", file=sys.stderr)
+
+    if records is not None:
+        Path(args.metrics).write_text(to_jsonl(records), encoding="utf-8")
+    if not args.quiet:
+        print(f"{len(items) - failed}/{len(items)} convertido(s) em {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Processamento por arquivo: escolhe o conversor pela extensão."""
+import io
+import os
+from pathlib import Path
+from typing import Optional
+
+from .buffers import BufferFile, file_buffer, open_mapped
+from .bundles import read_html_bundle
+from .engines import convert_html_to_pdf
+from .excel import xlsx_file_to_pdf
+from .images import image_file_to_pdf
+from .metrics import stage
+from .options import RASTER_EXTS, ConvertOptions
+from .sources import excel_to_html, html_file_to_str, image_file_to_html, read_docx_html, read_html_and_base
+
+IMAGE_EXTS = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".svg"]
+SUPPORTED_EXTS = [".pdf", ".html", ".htm", ".zip", ".xls", ".xlsx", ".docx"] + IMAGE_EXTS
+
+
+class NamedBytesIO(io.BytesIO):
+    # Equivalente mínimo do UploadedFile do Streamlit (bytes + .name)
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def convert_uploaded_file_to_pdf_bytes(file, options: ConvertOptions = ConvertOptions(),
+                                       base_url: Optional[str] = None) -> bytes:
+    ext = Path(file.name).suffix.lower()
+
+    if ext == ".pdf":
+        return bytes(file_buffer(file))
+
+    if ext in [".html", ".htm"]:
+        with stage("leitura"):
+            if base_url is None:
+                html_str, base_url = read_html_and_base(file)
+            else:
+                html_str = html_file_to_str(file)
+        return convert_html_to_pdf(html_str, base_url, options)
+
+    elif ext == ".zip":
+        # Pacote HTML + recursos: extraído uma vez; recursos só de dentro do pacote
+        with stage("leitura"):
+            html_str, base_url, root = read_html_bundle(file)
+        return convert_html_to_pdf(html_str, base_url, options, local_root=root)
+
+    elif ext in [".xls", ".xlsx"]:
+        if ext == ".xlsx" and options.stream_excel:
+            with stage("xlsx_em_blocos", linhas_por_bloco=options.excel_chunk_rows):
+                return xlsx_file_to_pdf(file, options)
+        with stage("excel_html"):
+            html_doc = excel_to_html(file, break_between=options.paginate_sheets)
+        return convert_html_to_pdf(html_doc, ".", options)
+
+    elif ext == ".docx":
+        # Imagens extraídas uma vez para a área de trabalho e referenciadas por arquivo
+        with stage("docx_html"):
+            html_doc, root = read_docx_html(file, max_image_px=options.docx_max_image_px)
+        return convert_html_to_pdf(html_doc, root, options, local_root=root)
+
+    elif ext in IMAGE_EXTS:
+        if options.native_images and ext in RASTER_EXTS:
+            from PIL import UnidentifiedImageError
+            try:
+                with stage("imagem_nativa"):
+                    return image_file_to_pdf(file, options)
+            except UnidentifiedImageError:
+                pass  # Pillow não reconhece o conteúdo: tenta pelo HTML, como antes
+        with stage("imagem_html"):
+            html_doc = image_file_to_html(file)
+        return convert_html_to_pdf(html_doc, ".", options)
+
+    else:
+        raise ValueError(f"Formato não suportado: {ext}")
+
+
+def convert(source, options: Optional[ConvertOptions] = None, *, name: Optional[str] = None) -> bytes:
+    # API pública: caminho, bytes/memoryview (com name=) ou arquivo aberto (com .name) -> bytes do PDF.
+    # Erros são ConversionError/MissingDependencyError (ou ValueError para formato não suportado).
+    # O conteúdo não é copiado: arquivos em disco são mapeados (mmap) e bytes/uploads
+    # são lidos pelo mesmo buffer (ver buffers.py).
+    options = options or ConvertOptions()
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        # HTML lido do disco resolve caminhos relativos a partir da própria pasta
+        with open_mapped(path, name or path.name) as file:
+            return convert_uploaded_file_to_pdf_bytes(file, options, base_url=str(path.resolve().parent))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if not name:
+            raise ValueError("Informe name= (com a extensão do arquivo) ao converter bytes.")
+        return convert_uploaded_file_to_pdf_bytes(BufferFile(source, name), options)
+    if name:
+        return convert_uploaded_file_to_pdf_bytes(BufferFile(file_buffer(source), name), options)
+    return convert_uploaded_file_to_pdf_bytes(source, options)
@@ -0,0 +1,566 @@
+"""Motores de PDF (WeasyPrint / xhtml2pdf) e fallback automático entre eles."""
+import bisect
+import contextlib
+import functools
+import hashlib
+import importlib.util as _iu
+import io
+import os
+import re
+import subprocess
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Optional
+
+from .errors import ConversionError, ConversionWarning, MissingDependencyError
+from .metrics import note, stage
+from .options import ConvertOptions
+from .sanitize import (_inject_page_css, _strip_external_fonts, _very_simple_html,
+                       sanitize_html_for_xhtml2pdf)
+
+XHTML2PDF_DEPS_HINT = ("python -m pip install --upgrade reportlab 'Pillow<12' pypdf svglib html5lib "
+                       "cssselect2 tinycss2 lxml python-bidi arabic-reshaper")
+
+# -----------------------
+# Monkey-patch xhtml2pdf.parser.lower() para evitar crash
+# -----------------------
+def _patch_xhtml2pdf_lower():
+    try:
+        import xhtml2pdf.parser as _p
+    except Exception:
+        return
+    def _safe_lower(seq):
+        if isinstance(seq, (list, tuple)) and seq:
+            seq = seq[0]
+        if seq is None or seq is NotImplemented:
+            return ""
+        try:
+            return str(seq).lower()
+        except Exception:
+            return ""
+    _p.lower = _safe_lower
+
+# -----------------------
+# Diagnóstico fino das dependências do xhtml2pdf
+# -----------------------
+def _probe_xhtml2pdf_deps():
+    checks = {
+        "reportlab": "reportlab",
+        "Pillow (PIL)": "PIL",
+        "html5lib": "html5lib",
+        "pypdf": "pypdf",
+        "svglib": "svglib",
+        "cssselect2": "cssselect2",
+        "tinycss2": "tinycss2",
+        "lxml": "lxml",
+        "python-bidi": "bidi",
+        "arabic-reshaper": "arabic_reshaper",
+    }
+    missing = []
+    present = []
+    for label, mod in checks.items():
+        try:
+            __import__(mod)
+            present.append(label)
+        except Exception:
+            missing.append(label)
+
+    has_pypdf2 = False
+    try:
+        __import__("PyPDF2")
+        has_pypdf2 = True
+    except Exception:
+        pass
+
+    return missing, present, has_pypdf2
+
+# -----------------------
+# Escada de fallback do xhtml2pdf (candidatos montados sob demanda)
+# -----------------------
+XHTML2PDF_RUNGS = ("HTML atual", "HTML sanitizado (forte)", "Modo simples (HTML básico)")
+_RUNG_MEMORY_MAX = 512
+_rung_memory: "OrderedDict[str, int]" = OrderedDict()
+_rung_lock = threading.Lock()
+
+_TEMPLATE_RE = re.compile(r"<style[^>]*>.*?</style>|<link[^>]*>", re.IGNORECASE | re.DOTALL)
+
+def template_fingerprint(html_str: str) -> str:
+    # Documentos do mesmo "modelo" compartilham <style>/<link>; o conteúdo do corpo muda
+    parts = _TEMPLATE_RE.findall(html_str)
+    return hashlib.sha1("\x00".join(parts).encode("utf-8", errors="ignore")).hexdigest()
+
+def _remembered_rung(fingerprint: str) -> int:
+    with _rung_lock:
+        rung = _rung_memory.get(fingerprint, 0)
+        if fingerprint in _rung_memory:
+            _rung_memory.move_to_end(fingerprint)
+        return rung
+
+def _remember_rung(fingerprint: str, rung: int) -> None:
+    with _rung_lock:
+        _rung_memory[fingerprint] = rung
+        _rung_memory.move_to_end(fingerprint)
+        while len(_rung_memory) > _RUNG_MEMORY_MAX:
+            _rung_memory.popitem(last=False)
+
+def _forget_rung(fingerprint: str) -> None:
+    with _rung_lock:
+        _rung_memory.pop(fingerprint, None)
+
+def rung_memory_snapshot() -> dict:
+    with _rung_lock:
+        return {fp: XHTML2PDF_RUNGS[r] for fp, r in _rung_memory.items()}
+
+class _XhtmlLadder:
+    def __init__(self, html_str: str, page_css: str, options: ConvertOptions):
+        self.html_str = html_str
+        self.page_css = page_css
+        self.options = options
+        self._built = {}
+
+    def candidate(self, rung: int) -> str:
+        if rung not in self._built:
+            self._built[rung] = (self._base, self._strong, self._simple)[rung]()
+        return self._built[rung]
+
+    def _base(self) -> str:
+        if self.options.sanitize or self.options.preserve_layout:
+            with stage("sanitize"):
+                candidate1 = sanitize_html_for_xhtml2pdf(self.html_str, self.page_css)
+        else:
+            candidate1 = _inject_page_css(self.html_str, self.page_css)
+
+        return _ensure_meta_charset(candidate1)
+
+    def _strong(self) -> str:
+        with stage("sanitize", modo="forte"):
+            return sanitize_html_for_xhtml2pdf(_strip_external_fonts(self.candidate(0)), self.page_css)
+
+    def _simple(self) -> str:
+        return _very_simple_html(self.candidate(0))
+
+# -----------------------
+# Builders (PDF)
+# -----------------------
+def _import_weasy():
+    try:
+        from weasyprint import HTML, CSS
+        try:
+            from weasyprint.fonts import FontConfiguration  # >=60
+        except Exception:
+            from weasyprint.text.fonts import FontConfiguration  # 53.x
+    except Exception as e:
+        raise MissingDependencyError("WeasyPrint não está instalado.\nTente: pip install weasyprint (ou conda-forge).",
+                                     hint="python -m pip install weasyprint") from e
+    return HTML, CSS, FontConfiguration
+
+WEASY_SAFETY_CSS = """
+        html, body { overflow: visible !important; }
+        * { box-sizing: border-box; min-width: 0 !important; }
+        img, svg, canvas, video { max-width: 100% !important; height: auto !important; }
+        table { width: 100% !important; table-layout: fixed !important; border-collapse: collapse; }
+        td, th { word-break: break-word; }
+        pre, code { white-space: pre-wrap; word-break: break-word; }
+"""
+WEASY_FALLBACK_FONT_CSS = """
+        html, body, * { font-family: "DejaVu Sans", "Liberation Sans", Arial, sans-serif !important; font-variant-ligatures: none; }
+"""
+
+def _weasy_page_css(options: ConvertOptions) -> str:
+    size = "" if options.preserve_layout else f"size: {options.page_size} {options.orientation};"
+    return f"""
+            @page {{
+                {size}
+                margin-left: {options.margin_mm}mm;
+                margin-right: {options.margin_mm}mm;
+            }}
+        """
+
+class WeasyRenderContext:
+    # Folhas de estilo fixas já parseadas, reaproveitadas entre documentos com as
+    # mesmas opções de página (não têm @font-face, então não dependem de uma
+    # FontConfiguration). As FontConfigurations ficam por modelo de documento
+    # (template_fingerprint): as @font-face de um documento só valem para
+    # documentos com os mesmos <style>/<link>. Cada uma é usada por uma
+    # renderização de cada vez, retirada e devolvida em font_config(), sem trava
+    # durante a renderização; se a renderização falha, ela é descartada (pode
+    # ter ficado com só parte das fontes carregadas).
+    FONT_CONFIGS_MAX = 8       # modelos guardados (LRU)
+    FONT_CONFIGS_PER_MODEL = 4  # livres por modelo (renderizações simultâneas)
+
+    def __init__(self, options: ConvertOptions):
+        HTML, CSS, FontConfiguration = _import_weasy()
+        self._CSS = CSS
+        self._FontConfiguration = FontConfiguration
+        self.page_css = CSS(string=_weasy_page_css(options))
+        self.safety_css = CSS(string=WEASY_SAFETY_CSS)
+        self._fallback_font_css = None
+        self._glyph_css = None
+        self._font_configs: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    @contextlib.contextmanager
+    def font_config(self, fingerprint: str):
+        with self._lock:
+            self.renders += 1
+            free = self._font_configs.get(fingerprint)
+            font_config = free.pop() if free else None
+        if font_config is None:
+            font_config = self.new_font_config()
+        try:
+            yield font_config
+        except BaseException:
+            raise  # renderização falhou: a configuração não volta para o contexto
+        else:
+            self._release(fingerprint, font_config)
+
+    def _release(self, fingerprint: str, font_config) -> None:
+        with self._lock:
+            free = self._font_configs.setdefault(fingerprint, [])
+            if len(free) < self.FONT_CONFIGS_PER_MODEL:
+                free.append(font_config)
+            self._font_configs.move_to_end(fingerprint)
+            while len(self._font_configs) > self.FONT_CONFIGS_MAX:
+                self._font_configs.popitem(last=False)
+
+    def new_font_config(self):
+        # FontConfiguration nova, fora do reaproveitamento (ex.: tentativa de fallback)
+        return self._FontConfiguration()
+
+    @property
+    def stylesheets(self) -> list:
+        return [self.page_css, self.safety_css]
+
+    @property
+    def glyph_stylesheets(self) -> list:
+        # Fontes reserva só para os símbolos marcados por preflight_glyphs
+        if self._glyph_css is None:
+            self._glyph_css = self._CSS(string=WEASY_GLYPH_CSS)
+        return [self.page_css, self.safety_css, self._glyph_css]
+
+    @property
+    def fallback_stylesheets(self) -> list:
+        if self._fallback_font_css is None:
+            self._fallback_font_css = self._CSS(string=WEASY_FALLBACK_FONT_CSS)
+        return [self.page_css, self.safety_css, self._fallback_font_css]
+
+_WEASY_CONTEXTS_MAX = 8
+_weasy_contexts: "OrderedDict[tuple, WeasyRenderContext]" = OrderedDict()
+_weasy_lock = threading.Lock()
+
+def _weasy_context_key(options: ConvertOptions) -> tuple:
+    if options.preserve_layout:
+        return (True, options.margin_mm)
+    return (False, options.margin_mm, options.page_size, options.orientation)
+
+def get_weasy_context(options: ConvertOptions) -> WeasyRenderContext:
+    key = _weasy_context_key(options)
+    with _weasy_lock:
+        ctx = _weasy_contexts.get(key)
+        if ctx is None:
+            ctx = _weasy_contexts[key] = WeasyRenderContext(options)
+            while len(_weasy_contexts) > _WEASY_CONTEXTS_MAX:
+                _weasy_contexts.popitem(last=False)
+        _weasy_contexts.move_to_end(key)
+        return ctx
+
+def clear_weasy_contexts() -> None:
+    # Força nova descoberta de fontes (ex.: fontes instaladas com o app aberto)
+    with _weasy_lock:
+        _weasy_contexts.clear()
+
+# -----------------------
+# Pré-checagem de glifos (emojis/símbolos sem fonte)
+# -----------------------
+_EMOJI_RANGES = ((0x1F600, 0x1F64F), (0x1F300, 0x1F5FF), (0x1F680, 0x1F6FF), (0x2600, 0x26FF),
+                 (0x2700, 0x27BF), (0xFE00, 0xFE0F), (0x1F900, 0x1F9FF), (0x1FA70, 0x1FAFF), (0x1F1E6, 0x1F1FF))
+_EMOJI_RE = re.compile("[" + "".join(f"{chr(a)}-{chr(b)}" for a, b in _EMOJI_RANGES) + "]")
+
+def _strip_emojis(text: str) -> str:
+    return _EMOJI_RE.sub("", text)
+
+@functools.lru_cache(maxsize=1)
+def _installed_charset() -> Optional[tuple[list[int], list[int]]]:
+    # União dos charsets de todas as fontes do fontconfig (o mesmo do WeasyPrint),
+    # numa só chamada ao fc-list: (inícios, fins) de faixas ordenadas e disjuntas.
+    # None = não dá para saber (sem fc-list, ex.: Windows sem GTK no PATH).
+    try:
+        res = subprocess.run(["fc-list", "--format", "%{charset}\\n"], capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if res.returncode != 0:
+        return None
+    ranges = sorted((int(lo, 16), int(hi or lo, 16))
+                    for lo, hi in re.findall(rb"([0-9a-f]+)(?:-([0-9a-f]+))?", res.stdout))
+    starts, ends = [], []
+    for lo, hi in ranges:
+        if ends and lo <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], hi)
+        else:
+            starts.append(lo)
+            ends.append(hi)
+    return starts, ends
+
+def _font_covers(codepoint: int) -> Optional[bool]:
+    charset = _installed_charset()
+    if charset is None:
+        return None
+    starts, ends = charset
+    i = bisect.bisect_right(starts, codepoint) - 1
+    return i >= 0 and codepoint <= ends[i]
+
+GLYPH_CLASS = "htmlpdf-glifo"
+WEASY_GLYPH_CSS = f"""
+        .{GLYPH_CLASS} {{ font-family: "Noto Color Emoji", "Noto Emoji", "Symbola", "DejaVu Sans", sans-serif; }}
+"""
+# Trechos onde não cabe um <span> (comentários, scripts, estilos, títulos, tags)
+_NON_TEXT_RE = re.compile(r"(<!--.*?-->|<(script|style|title|textarea)\b.*?</\2\s*>|<[^>]*>)",
+                          re.IGNORECASE | re.DOTALL)
+
+def _wrap_glyphs(html_str: str, pattern: "re.Pattern") -> str:
+    # Cada sequência de símbolos do texto vira <span class="htmlpdf-glifo">: só esses
+    # caracteres usam as fontes reserva; o resto do documento mantém as fontes dele
+    parts = []
+    at = 0
+    for m in _NON_TEXT_RE.finditer(html_str):
+        parts.append(pattern.sub(lambda g: f'<span class="{GLYPH_CLASS}">{g.group(0)}</span>', html_str[at:m.start()]))
+        parts.append(m.group(1))
+        at = m.end()
+    parts.append(pattern.sub(lambda g: f'<span class="{GLYPH_CLASS}">{g.group(0)}</span>', html_str[at:]))
+    return "".join(parts)
+
+def preflight_glyphs(html_str: str) -> tuple[str, bool]:
+    # Antes da 1ª renderização: acha emojis/símbolos (uma varredura com classe de
+    # caracteres) e checa cada caractere contra as fontes instaladas. Os que nenhuma
+    # fonte cobre são removidos; os demais ficam num <span> com as fontes reserva
+    # (WEASY_GLYPH_CSS). -> (html, precisa do WEASY_GLYPH_CSS)
+    found = set(_EMOJI_RE.findall(html_str))
+    if not found or _installed_charset() is None:
+        return html_str, False
+    uncovered = sorted(ch for ch in found if not _font_covers(ord(ch)))
+    covered = sorted(found.difference(uncovered))
+    if uncovered:
+        pattern = re.compile("[" + "".join(re.escape(ch) for ch in uncovered) + "]")
+        html_str, removed = pattern.subn("", html_str)
+        warnings.warn(f"{removed} emoji(s)/símbolo(s) sem fonte instalada foram removidos antes da renderização.",
+                      ConversionWarning)
+    if not covered:
+        return html_str, False
+    return _wrap_glyphs(html_str, re.compile("[" + "".join(re.escape(ch) for ch in covered) + "]+")), True
+
+_META_CHARSET_RE = re.compile(r"<meta charset", re.IGNORECASE)
+_HEAD_TAG_RE = re.compile(r"<head>", re.IGNORECASE)
+
+def _ensure_meta_charset(html_str: str) -> str:
+    # Busca sem diferenciar maiúsculas direto no texto (sem html_str.lower(), que
+    # copiava o documento inteiro a cada teste)
+    if _META_CHARSET_RE.search(html_str):
+        return html_str
+    if _HEAD_TAG_RE.search(html_str):
+        return _HEAD_TAG_RE.sub("<head><meta charset='utf-8'>", html_str, count=1)
+    return f"<html><head><meta charset='utf-8'></head><body>{html_str}</body></html>"
+
+def build_pdf_weasy(html_str: str, base_url: str, options: ConvertOptions, url_fetcher=None) -> bytes:
+    with stage("importacao", motor="weasyprint"):
+        HTML, _, _ = _import_weasy()
+
+    html_str = _ensure_meta_charset(html_str)
+
+    with stage("preflight_glifos"):
+        html_str, wrapped = preflight_glyphs(html_str)
+
+    fetch_kw = {"url_fetcher": url_fetcher} if url_fetcher is not None else {}
+    with stage("contexto", motor="weasyprint"):
+        ctx = get_weasy_context(options)
+    # Sem exceção: a FontConfiguration volta para o contexto; com exceção, é
+    # descartada e o fallback roda com uma nova (não a que ficou pela metade)
+    try:
+        with ctx.font_config(template_fingerprint(html_str)) as font_config:
+            with stage("weasyprint", **({"tentativa": "símbolos com fonte reserva"} if wrapped else {})):
+                pdf_bytes = HTML(string=html_str, base_url=base_url or ".", **fetch_kw).write_pdf(
+                    stylesheets=ctx.glyph_stylesheets if wrapped else ctx.stylesheets,
+                    font_config=font_config
+                )
+            if pdf_bytes is None:
+                raise RuntimeError("WeasyPrint não retornou bytes do PDF.")
+        return pdf_bytes
+    except Exception:
+        with stage("weasyprint", tentativa="sem emojis + fonte reserva"):
+            safe_html = _strip_emojis(html_str)
+            pdf_bytes = HTML(string=safe_html, base_url=base_url or ".", **fetch_kw).write_pdf(
+                stylesheets=ctx.fallback_stylesheets, font_config=ctx.new_font_config()
+            )
+        if pdf_bytes is None:
+            raise RuntimeError("WeasyPrint não retornou bytes do PDF (fallback).")
+        return pdf_bytes
+
+def build_pdf_xhtml2pdf(html_str: str, options: ConvertOptions, link_callback=None,
+                        base_path: Optional[str] = None) -> bytes:
+    spec = _iu.find_spec("xhtml2pdf")
+    if spec is None:
+        raise MissingDependencyError("xhtml2pdf não está instalado neste Python.",
+                                     hint="python -m pip install xhtml2pdf")
+
+    try:
+        with stage("importacao", motor="xhtml2pdf"):
+            from xhtml2pdf import pisa
+    except ImportError as e:
+        raise MissingDependencyError("xhtml2pdf não está instalado neste Python.",
+                                     hint="python -m pip install xhtml2pdf") from e
+    except Exception as e:
+        missing, present, has_pypdf2 = _probe_xhtml2pdf_deps()
+        lines = []
+        if present: lines.append("Pacotes encontrados: " + ", ".join(present))
+        if missing: lines.append("Pacotes ausentes: " + ", ".join(missing))
+        hint = XHTML2PDF_DEPS_HINT
+        if has_pypdf2:
+            lines.append("Conflito: PyPDF2 instalado. Prefira pypdf.")
+            hint = "python -m pip uninstall -y PyPDF2\n" + hint
+        raise MissingDependencyError(f"Falha ao importar xhtml2pdf: {e.__class__.__name__}: {e}",
+                                     log="\n".join(lines), hint=hint) from e
+
+    _patch_xhtml2pdf_lower()
+
+    page_css = f"@page {{ margin-left: {options.margin_mm}mm; margin-right: {options.margin_mm}mm; }}"
+    ladder = _XhtmlLadder(html_str, page_css, options)
+    fingerprint = template_fingerprint(html_str)
+    start = _remembered_rung(fingerprint)
+    order = list(range(start, len(XHTML2PDF_RUNGS))) + list(range(start))
+
+    last_error = None
+    last_log = None
+
+    for rung in order:
+        label = XHTML2PDF_RUNGS[rung]
+        html_try = ladder.candidate(rung)  # só monta o candidato quando o anterior falhou
+        out = io.BytesIO()
+        pisa_log = io.StringIO()
+        try:
+            extra = {"link_callback": link_callback} if link_callback is not None else {}
+            if base_path is not None:
+                extra["path"] = base_path  # pasta-base das leituras locais do pisa
+            with stage("xhtml2pdf", tentativa=label) as row:
+                res = pisa.CreatePDF(src=html_try, dest=out, encoding="utf-8", log=pisa_log, **extra)
+                if res.err and row is not None:
+                    row["resultado"] = "erro do pisa"
+            if res.err:
+                last_error = RuntimeError(f"xhtml2pdf retornou erro (tentativa: {label})")
+                last_log = pisa_log.getvalue()
+            else:
+                _remember_rung(fingerprint, rung)
+                if rung > 0:
+                    warnings.warn(f"xhtml2pdf: documento gerado na tentativa '{label}'.", ConversionWarning)
+                return out.getvalue()
+        except Exception as e:
+            last_error = e
+            last_log = pisa_log.getvalue()
+
+    _forget_rung(fingerprint)
+    raise ConversionError("xhtml2pdf encontrou um erro ao gerar o PDF. Revise o log do pisa.",
+                          log=last_log, debug_html=ladder.candidate(1)) from last_error
+
+# -----------------------
+# url_fetcher do WeasyPrint (duas APIs)
+# -----------------------
+@functools.lru_cache(maxsize=1)
+def _resolver_fetcher_class():
+    # Versões com weasyprint.urls.URLFetcher: o fetcher tem que ser uma subclasse
+    # (o WeasyPrint lê atributos dela) e devolver URLFetcherResponse
+    from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+    class ResolverFetcher(URLFetcher):
+        def __init__(self, resolve):
+            super().__init__()
+            self.resolve = resolve
+            self.missing = getattr(resolve, "missing", [])
+            self.counts = getattr(resolve, "counts", dict)
+
+        def fetch(self, url, headers=None):
+            found = self.resolve(url)
+            if found is None:
+                return super().fetch(url, headers)
+            path, mime, final_url = found
+            return URLFetcherResponse(final_url, open(path, "rb"), {"Content-Type": mime})
+
+    return ResolverFetcher
+
+
+def make_weasy_fetcher(resolve):
+    # resolve(url) -> (arquivo local, mime, URL final); None = fetcher padrão do
+    # WeasyPrint; exceção = recurso recusado (o WeasyPrint avisa e segue sem ele).
+    # `missing` e `counts()` do resolve ficam visíveis no fetcher.
+    try:
+        return _resolver_fetcher_class()(resolve)
+    except ImportError:
+        pass
+    from weasyprint.urls import default_url_fetcher  # API antiga: função que devolve dict
+
+    def fetch(url, *args, **kwargs):
+        found = resolve(url)
+        if found is None:
+            return default_url_fetcher(url, *args, **kwargs)
+        path, mime, final_url = found
+        return {"file_obj": open(path, "rb"), "mime_type": mime, "filename": os.path.basename(path),
+                "redirected_url": final_url}
+
+    fetch.missing = getattr(resolve, "missing", [])
+    fetch.counts = getattr(resolve, "counts", dict)
+    return fetch
+
+
+# -----------------------
+# Fallback automático
+# -----------------------
+def weasy_url_fetcher(base_url: str, options: ConvertOptions, local_root: Optional[str] = None):
+    # url_fetcher do WeasyPrint: arquivos do pacote (local_root) e, se configurado,
+    # URLs http(s) pelo cache local. None = fetcher padrão.
+    resolve = None
+    if local_root is not None:
+        from .bundles import bundle_resolver
+        resolve = bundle_resolver(local_root, base_url)
+    from .fetch import get_asset_cache
+    assets = get_asset_cache(options.asset_dir, options.offline)
+    if assets is not None:
+        # URLs http(s) pelo cache local; o resto como antes (pacote ou fetcher padrão)
+        resolve = assets.resolver(fallback=resolve)
+    return make_weasy_fetcher(resolve) if resolve is not None else None
+
+
+def convert_html_to_pdf(html_str: str, base_url: str = ".", options: ConvertOptions = ConvertOptions(),
+                        local_root: Optional[str] = None) -> bytes:
+    # local_root: restringe recursos (CSS/imagens/fontes) aos arquivos dessa pasta, sem rede
+    link_callback = base_path = None
+    if local_root is not None:
+        from .bundles import bundle_link_callback
+        link_callback = bundle_link_callback(local_root, base_url)
+        base_path = os.path.join(local_root, "index.html")
+
+    if options.use_weasy:
+        url_fetcher = weasy_url_fetcher(base_url, options, local_root)
+        try:
+            split = None
+            if options.split_render:
+                from .split import render_split
+                split = render_split(html_str, base_url, options, local_root)
+            if split is not None:
+                pdf_bytes, missing, counts = split
+            else:
+                pdf_bytes = build_pdf_weasy(html_str, base_url, options, url_fetcher)
+                missing = getattr(url_fetcher, "missing", [])
+                counts = getattr(url_fetcher, "counts", dict)()
+        except Exception as e:
+            if _iu.find_spec("xhtml2pdf"):
+                warnings.warn("WeasyPrint indisponível. Usando xhtml2pdf como fallback.", ConversionWarning)
+                return build_pdf_xhtml2pdf(html_str, options, link_callback, base_path)
+            raise ConversionError("WeasyPrint falhou e xhtml2pdf não está instalado.") from e
+        if any(counts.values()):
+            note("recursos_remotos", **counts)
+        missing = list(dict.fromkeys(missing))
+        if missing:
+            warnings.warn(f"{len(missing)} recurso(s) remoto(s) sem cópia local foram ignorados: "
+                          + ", ".join(missing[:3]) + (" ..." if len(missing) > 3 else ""), ConversionWarning)
+        return pdf_bytes
+    else:
+        return build_pdf_xhtml2pdf(html_str, options, link_callback, base_path)
@@ -0,0 +1,27 @@
+"""Exceções da conversão (sem dependência de interface)."""
+from typing import Optional
+
+
+class ConversionError(RuntimeError):
+    def __init__(self, message: str, *, log: Optional[str] = None,
+                 debug_html: Optional[str] = None, hint: Optional[str] = None):
+        super().__init__(message)
+        self.log = log                # log do motor (ex.: pisa)
+        self.debug_html = debug_html  # HTML da tentativa, para depurar
+        self.hint = hint              # comando sugerido para corrigir o ambiente
+
+
+class MissingDependencyError(ConversionError):
+    pass
+
+
+class ResourceLimitError(ConversionError):
+    # Conversão interrompida pelo vigia (watchdog.py); `reason`: "tempo", "cpu", "memoria" ou "processo"
+    def __init__(self, message: str, *, reason: str, **kwargs):
+        super().__init__(message, **kwargs)
+        self.reason = reason
+
+
+class ConversionWarning(UserWarning):
+    # Avisos mostrados ao usuário (ex.: fallback de motor)
+    pass
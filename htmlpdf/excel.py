@@ -0,0 +1,286 @@
+"""Excel (.xlsx) ➜ PDF em streaming, com memória limitada.
+
+Em vez de carregar cada planilha num DataFrame e montar um HTML único, lê as
+linhas com openpyxl em modo read-only, renderiza blocos de até N linhas como
+documentos HTML independentes (mesmo CSS e mesma formatação de células do
+excel_to_html) e monta o PDF final em streaming (merge.assemble_pdf). A última
+página de cada bloco, ainda incompleta, é descartada e as linhas dela voltam no
+bloco seguinte: a tabela continua na mesma página, com o cabeçalho repetido nas
+quebras. O pico de memória depende do tamanho do bloco, não da planilha.
+"""
+import datetime as _dt
+import io
+import itertools
+import tempfile
+from html import escape
+from typing import Iterator, Optional
+
+from .buffers import as_file
+from .engines import convert_html_to_pdf
+from .errors import MissingDependencyError
+from .merge import assemble_pdf, prepare_pdf
+from .options import ConvertOptions, MergeOptions
+
+TABLE_CSS = f"""
+      body {{ margin:24px; }}
+      h2 {{ font-family: Arial, sans-serif; }}
+      table {{ border-collapse: collapse; width: 100%; table-layout: fixed; }}
+      th, td {{ border: 1px solid {"#"}999; padding: 6px; word-wrap: break-word; }}
+      th, td {{ font-family: Arial; font-size: 12px; }}
+      pre, code {{ white-space: pre-wrap; word-wrap: break-word; }}
+"""
+
+
+def _html_doc(body: str, extra_css: str = "") -> str:
+    return f"""
+    <html><head><meta charset="utf-8">
+    <style>{TABLE_CSS}{extra_css}</style></head>
+    <body>{body}</body></html>
+    """
+
+
+def _fmt(value) -> str:
+    # Mesma apresentação do Styler do pandas para os tipos comuns
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    if isinstance(value, (_dt.datetime, _dt.date, _dt.time)):
+        return str(value)
+    return escape(str(value))
+
+
+def _header_names(row) -> list[str]:
+    # Como o pandas: vazio vira "Unnamed: i" e nomes repetidos ganham ".1", ".2"...
+    names, seen = [], {}
+    for i, v in enumerate(row):
+        name = f"Unnamed: {i}" if v is None else str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _thead(header: list[str]) -> str:
+    cells = "".join(f"<th>{escape(h)}</th>" for h in header)
+    return f"<thead><tr><th></th>{cells}</tr></thead>"
+
+
+# -----------------------
+# DataFrame -> <table> (sem Styler)
+# -----------------------
+def _escape_all(values) -> list:
+    return [escape(v) for v in values]
+
+
+def _column_cells(col, with_microseconds: Optional[bool] = None) -> list:
+    # Texto já escapado de cada célula, formatado por coluna inteira (mesma
+    # apresentação do Styler: float com 6 casas, datas com hora); NaN/NaT = vazio.
+    # with_microseconds: decidido pela planilha inteira (None = pela coluna)
+    import numpy as np
+    kind = col.dtype.kind
+    missing = col.isna().to_numpy()
+    if kind == "f":
+        out = np.char.mod("%.6f", col.to_numpy(dtype="float64")).astype(object)
+    elif kind in "iub":
+        return col.astype(str).tolist()
+    elif kind == "M":
+        if with_microseconds is None:
+            with_microseconds = bool((col.dt.microsecond.fillna(0) != 0).any())
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if with_microseconds else "%Y-%m-%d %H:%M:%S"
+        out = col.dt.strftime(fmt).to_numpy(dtype=object)
+    elif kind == "m":
+        out = col.astype(str).to_numpy(dtype=object)
+    else:
+        import pandas as pd
+        if pd.api.types.infer_dtype(col, skipna=True) == "string":
+            out = np.array(_escape_all(col.where(~missing, "").astype(str)), dtype=object)
+        else:
+            out = np.array([_fmt(v) for v in col.where(~missing, None)], dtype=object)
+    if missing.any():
+        out[missing] = ""
+    return out.tolist()
+
+
+def dataframe_table_html(df) -> str:
+    # <table> compacto para o CSS compartilhado (TABLE_CSS): sem ids nem regras
+    # por célula, com o mesmo conteúdo que o Styler mostrava (índice + colunas)
+    header = [str(c) for c in df.columns]
+    index = _escape_all(df.index.astype(str))
+    columns = [_column_cells(df.iloc[:, j]) for j in range(df.shape[1])]
+    th = ["<tr><th>" + i + "</th>" for i in index]
+    tds = [["<td>" + v + "</td>" for v in col] for col in columns]
+    body = "".join("".join(row) for row in zip(th, *tds, itertools.repeat("</tr>")))
+    return ('<table border="1" cellspacing="0" cellpadding="6">' + _thead(header)
+            + "<tbody>" + body + "</tbody></table>")
+
+
+# -----------------------
+# .xlsx em blocos (openpyxl read-only)
+# -----------------------
+# Cada linha de dados leva um marcador de sumário (outline/bookmark) no índice:
+# com ele se sabe em que página do bloco cada linha caiu. xhtml2pdf usa
+# -pdf-outline, WeasyPrint usa bookmark-level; cada motor ignora o do outro.
+ROW_MARK_CSS = """
+      th.r { -pdf-outline: true; -pdf-outline-level: 0; -pdf-outline-open: false; bookmark-level: 1; }
+      tr { page-break-inside: avoid; }
+"""
+
+
+def _cell_value(value):
+    # Como o leitor openpyxl do pandas: número inteiro guardado como float vira int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _column_dtypes(ws, width: int) -> tuple[list[str], list[bool]]:
+    # 1ª passada na planilha: o dtype que o pandas daria a cada coluna (para o
+    # _column_cells formatar igual ao excel_to_html) e se há microssegundos nas datas
+    seen = [set() for _ in range(width)]
+    micro = [False] * width
+    rows = ws.iter_rows(values_only=True)
+    next(rows, None)
+    for row in rows:
+        for j, v in enumerate(row[:width]):
+            v = _cell_value(v)
+            seen[j].add(type(v))
+            if isinstance(v, _dt.datetime) and v.microsecond:
+                micro[j] = True
+        for j in range(len(row), width):
+            seen[j].add(type(None))
+    dtypes = []
+    for types in seen:
+        values = types - {type(None)}
+        if not values or values <= {int, float}:
+            dtypes.append("int64" if values == {int} and type(None) not in types else "float64")
+        elif values == {bool} and type(None) not in types:
+            dtypes.append("bool")
+        elif values == {_dt.datetime}:
+            dtypes.append("datetime64[ns]")
+        else:
+            dtypes.append("object")
+    return dtypes, micro
+
+
+def _iter_xlsx_items(wb, break_between: bool, sheets: dict) -> Iterator[tuple]:
+    # ("planilha", nº, título) e ("linha", nº, índice, valores), na ordem do arquivo;
+    # em `sheets` fica, por planilha, a abertura da tabela e o dtype das colunas
+    for i, ws in enumerate(wb.worksheets):
+        rows = ws.iter_rows(values_only=True)
+        first = next(rows, None)
+        header = _header_names(first) if first else []
+        width = len(header)
+        sheets[i] = ('<table repeat="1" border="1" cellspacing="0" cellpadding="6">' + _thead(header)
+                     + "<tbody>", *_column_dtypes(ws, width))
+        br = 'style="page-break-before: always;"' if (break_between and i > 0) else ""
+        yield "planilha", i, f'<h2 {br}>Planilha: {escape(ws.title)}</h2>'
+        for idx, row in enumerate(rows):
+            yield "linha", i, idx, [_cell_value(v) for v in row[:width]] + [None] * (width - len(row))
+
+
+def _rows_html(rows: list, dtypes: list[str], micro: list[bool]) -> str:
+    # Linhas de uma planilha formatadas por coluna com o mesmo _column_cells do excel_to_html
+    import pandas as pd
+    columns = [_column_cells(pd.Series([r[3][j] for r in rows], dtype=dtype), micro[j])
+               for j, dtype in enumerate(dtypes)]
+    th = [f'<tr><th class="r">{r[2]}</th>' for r in rows]
+    tds = [["<td>" + v + "</td>" for v in col] for col in columns]
+    return "".join("".join(row) for row in zip(th, *tds, itertools.repeat("</tr>")))
+
+
+def _chunk_html(items: list, sheets: dict) -> str:
+    parts, group = [], []
+    for item in items + [("fim", None)]:
+        if group and (item[0] != "linha" or item[1] != group[0][1]):
+            table_open, dtypes, micro = sheets[group[0][1]]
+            parts.append(table_open + _rows_html(group, dtypes, micro) + "</tbody></table>")
+            group = []
+        if item[0] == "planilha":
+            parts.append(item[2])
+            if not any(x[0] == "linha" and x[1] == item[1] for x in items):
+                parts.append(sheets[item[1]][0] + "</tbody></table>")  # planilha sem linhas
+        elif item[0] == "linha":
+            group.append(item)
+    return _html_doc("".join(parts), ROW_MARK_CSS)
+
+
+def _row_pages(reader) -> list[int]:
+    # Página (0-based) de cada marcador de linha, na ordem do documento
+    pages, stack = [], [reader.outline]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif str(node.get("/Title", "")).isdigit():
+            pages.append(reader.get_destination_page_number(node))
+    return pages
+
+
+def _split_last_page(pdf_bytes: bytes, items: list) -> tuple[int, int]:
+    # -> (páginas a manter, 1º item que vai para o próximo bloco). O que caiu na
+    # última página (incompleta) volta para o próximo bloco, que continua a
+    # mesma página em vez de abrir outra
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    n = len(reader.pages)
+    rows = [k for k, item in enumerate(items) if item[0] == "linha"]
+    pages = _row_pages(reader)
+    if len(pages) != len(rows):
+        return n, len(items)  # sem os marcadores (ex.: degrau simplificado do xhtml2pdf)
+    if n == 1:
+        return 0, 0  # tudo cabe numa página: junta com o próximo bloco
+    first = next((j for j, page in enumerate(pages) if page == n - 1), None)
+    if not first:
+        return n, len(items)
+    carry = rows[first]
+    if items[carry - 1][0] == "planilha":
+        carry -= 1  # o título acompanha as primeiras linhas da planilha
+    return n - 1, carry
+
+
+def xlsx_file_to_pdf(uploaded_file, options: ConvertOptions = ConvertOptions()) -> bytes:
+    try:
+        import openpyxl
+    except Exception:
+        raise MissingDependencyError("Falta 'openpyxl' para ler .xlsx.", hint="python -m pip install openpyxl")
+
+    wb = openpyxl.load_workbook(as_file(uploaded_file), read_only=True, data_only=True)
+    sheets: dict = {}
+    items = _iter_xlsx_items(wb, options.paginate_sheets, sheets)
+    docs, pending, done = [], [], False
+    target = max(1, options.excel_chunk_rows)
+    try:
+        while True:
+            rows = sum(1 for item in pending if item[0] == "linha")
+            while not done and rows < target:
+                item = next(items, None)
+                if item is None:
+                    done = True
+                else:
+                    pending.append(item)
+                    rows += item[0] == "linha"
+            if not pending:
+                break
+            pdf_bytes = convert_html_to_pdf(_chunk_html(pending, sheets), ".", options)
+            keep, carry = (None, len(pending)) if done else _split_last_page(pdf_bytes, pending)
+            if keep != 0:
+                docs.append(prepare_pdf(pdf_bytes, MergeOptions(), max_pages=keep))
+                target = max(1, options.excel_chunk_rows)
+            else:
+                target = max(rows, target) * 2  # coube numa página só: relê com mais linhas
+            pending = pending[carry:]
+        # Montagem em streaming (páginas regravadas, sem os marcadores de sumário)
+        with tempfile.TemporaryFile(prefix="htmlpdf_xlsx_") as out:
+            assemble_pdf(docs, out)
+            out.seek(0)
+            return out.read()
+    finally:
+        wb.close()
+        for doc in docs:
+            doc.close()
@@ -0,0 +1,240 @@
+"""Recursos remotos (CSS, fontes, logos) servidos de um cache local.
+
+O WeasyPrint busca cada URL do documento com o fetcher padrão; sem rede, cada
+busca espera o timeout. Aqui as URLs http(s) passam por um `AssetCache`:
+
+  1. índice URL -> hash (`<pasta>/index/`), conteúdo em `<pasta>/objects/`
+     (endereçado por conteúdo: o mesmo arquivo servido por URLs diferentes é
+     guardado uma vez);
+  2. espelho montado à mão: `<pasta>/mirror/<host>/<caminho>`;
+  3. rede, só se não estiver offline, com timeout curto; o resultado entra no
+     cache. Um host que falhou é pulado na hora até `retry_after_s` passar.
+
+Sem rede e sem cópia local, a URL falha imediatamente (o WeasyPrint segue sem
+o recurso). Acertos/faltas são contados por processo (`AssetCache.stats`, na
+barra lateral do app) e por documento (linha "recursos_remotos" das métricas).
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+MAX_ASSET_BYTES = 50 * 1024 * 1024
+
+
+class AssetCache:
+    def __init__(self, root: str, offline: bool = False, timeout_s: float = 5.0, retry_after_s: float = 600):
+        self.root = Path(root)
+        self.offline = offline
+        self.timeout_s = timeout_s
+        self.retry_after_s = retry_after_s
+        for sub in ("objects", "index", "mirror"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._down_hosts: dict = {}  # host -> instante da última falha
+        self.hits = 0
+        self.mirror_hits = 0
+        self.downloads = 0
+        self.misses = 0
+
+    # -----------------------
+    # Armazenamento
+    # -----------------------
+    def _index_path(self, url: str) -> Path:
+        return self.root / "index" / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def _mirror_path(self, url: str) -> Optional[Path]:
+        parts = urlsplit(url)
+        rel = unquote(parts.path).lstrip("/") or "index.html"
+        path = (self.root / "mirror" / parts.hostname / rel) if parts.hostname else None
+        if path is None or ".." in Path(rel).parts:
+            return None
+        return path if path.is_file() else None
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _lookup(self, url: str) -> Optional[tuple[Path, str]]:
+        try:
+            meta = json.loads(self._index_path(url).read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+        path = self._object_path(meta.get("digest", ""))
+        return (path, meta.get("mime_type") or "") if path.is_file() else None
+
+    def store(self, url: str, data: bytes, mime_type: str = "") -> Path:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            self._atomic_write(path, data)
+        meta = {"url": url, "digest": digest, "mime_type": mime_type, "stored_at": time.time()}
+        self._atomic_write(self._index_path(url), json.dumps(meta).encode("utf-8"))
+        return path
+
+    # -----------------------
+    # Resolução
+    # -----------------------
+    def _host_is_down(self, host: str) -> bool:
+        with self._lock:
+            failed_at = self._down_hosts.get(host)
+        return failed_at is not None and time.time() - failed_at < self.retry_after_s
+
+    def _download(self, url: str) -> Optional[tuple[Path, str]]:
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+        host = urlsplit(url).hostname or ""
+        if self._host_is_down(host):
+            return None
+        try:
+            with urlopen(Request(url, headers={"User-Agent": "htmlpdf"}), timeout=self.timeout_s) as resp:
+                data = resp.read(MAX_ASSET_BYTES + 1)
+                mime = resp.headers.get_content_type()
+        except HTTPError:
+            return None  # o host respondeu (404, 403...): não marca como fora do ar
+        except Exception:
+            with self._lock:
+                self._down_hosts[host] = time.time()
+            return None
+        if len(data) > MAX_ASSET_BYTES:
+            return None
+        return self.store(url, data, mime), mime
+
+    def resolve(self, url: str, doc: Optional["AssetFetcher"] = None) -> Optional[tuple[Path, str]]:
+        # -> (arquivo local, mime) ou None; atualiza os contadores (do processo e,
+        # se vier, os do documento)
+        kind, found = self._find(url)
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+        if doc is not None:
+            setattr(doc, kind, getattr(doc, kind) + 1)
+        return found
+
+    def _find(self, url: str) -> tuple[str, Optional[tuple[Path, str]]]:
+        found = self._lookup(url)
+        if found is not None:
+            return "hits", found
+        mirrored = self._mirror_path(url)
+        if mirrored is not None:
+            return "mirror_hits", (mirrored, mimetypes.guess_type(str(mirrored))[0] or "")
+        found = None if self.offline else self._download(url)
+        return ("misses", None) if found is None else ("downloads", found)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = list(self._down_hosts)
+            counts = {"acertos": self.hits, "acertos_espelho": self.mirror_hits,
+                      "baixados": self.downloads, "faltas": self.misses}
+        return {"pasta": str(self.root), "offline": self.offline, **counts,
+                "hosts_indisponiveis": sorted(h for h in hosts if self._host_is_down(h))}
+
+    # -----------------------
+    # Resolvedor do WeasyPrint
+    # -----------------------
+    def resolver(self, fallback=None) -> "AssetFetcher":
+        return AssetFetcher(self, fallback)
+
+
+class AssetFetcher:
+    # Resolvedor de um documento (ver engines.make_weasy_fetcher): http(s) pelo
+    # cache, o resto pelo `fallback` (outro resolvedor; None = fetcher padrão do
+    # WeasyPrint). Guarda as URLs que faltaram e os contadores deste documento.
+    def __init__(self, cache: AssetCache, fallback=None):
+        self.cache = cache
+        self.fallback = fallback
+        self.missing: list[str] = []
+        self.hits = self.mirror_hits = self.downloads = self.misses = 0
+
+    def __call__(self, url: str) -> Optional[tuple[Path, str, str]]:
+        if not url.lower().startswith(("http://", "https://")):
+            return self.fallback(url) if self.fallback is not None else None
+        found = self.cache.resolve(url, self)
+        if found is None:
+            self.missing.append(url)
+            raise ValueError(f"Recurso remoto indisponível (offline/sem cópia local): {url}")
+        path, mime = found
+        return path, mime or mimetypes.guess_type(url)[0] or "application/octet-stream", url
+
+    def counts(self) -> dict:
+        return {"acertos": self.hits, "acertos_espelho": self.mirror_hits,
+                "baixados": self.downloads, "faltas": self.misses}
+
+
+_caches: dict = {}
+_caches_lock = threading.Lock()
+
+MIRROR_VERSION_TTL_S = 30.0
+_mirror_versions: dict = {}  # pasta mirror/ -> (instante da leitura, versão)
+_mirror_versions_lock = threading.Lock()
+
+
+def _asset_root(root: str, offline: bool) -> Optional[str]:
+    # Sem pasta (nem HTMLPDF_ASSET_DIR) o cache fica desligado, a não ser offline:
+    # aí usa <tmp>/htmlpdf_assets
+    root = root or os.environ.get("HTMLPDF_ASSET_DIR", "")
+    if not root:
+        if not offline:
+            return None
+        root = os.path.join(tempfile.gettempdir(), "htmlpdf_assets")
+    return os.path.abspath(root)
+
+
+def _mirror_version(mirror: str) -> int:
+    # Maior mtime de mirror/ (pastas e arquivos), relido no máximo a cada
+    # MIRROR_VERSION_TTL_S: o espelho pode ter milhares de arquivos e a chave do
+    # cache é calculada a cada arquivo enviado, a cada rerun
+    now = time.monotonic()
+    with _mirror_versions_lock:
+        cached = _mirror_versions.get(mirror)
+    if cached is not None and now - cached[0] < MIRROR_VERSION_TTL_S:
+        return cached[1]
+    latest = 0
+    for dirpath, dirnames, filenames in os.walk(mirror):
+        for name in [".", *filenames]:
+            try:
+                latest = max(latest, os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+            except OSError:
+                pass
+    with _mirror_versions_lock:
+        _mirror_versions[mirror] = (now, latest)
+    return latest
+
+
+def asset_version(root: str = "", offline: bool = False) -> Optional[dict]:
+    # Pasta e versão do cache de recursos, para a chave do cache de PDFs: muda
+    # quando o índice ganha/troca uma entrada (mtime da pasta index/, na hora) ou
+    # quando algo muda no espelho (em até MIRROR_VERSION_TTL_S). None = desligado.
+    root = _asset_root(root, offline)
+    if root is None:
+        return None
+    latest = 0
+    try:
+        latest = os.stat(os.path.join(root, "index")).st_mtime_ns
+    except OSError:
+        pass
+    return {"asset_dir": root, "assets_version": max(latest, _mirror_version(os.path.join(root, "mirror")))}
+
+
+def get_asset_cache(root: str = "", offline: bool = False) -> Optional[AssetCache]:
+    # Um cache por (pasta, offline) por processo (ver _asset_root)
+    root = _asset_root(root, offline)
+    if root is None:
+        return None
+    key = (root, bool(offline))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = AssetCache(key[0], offline=key[1])
+        return cache
@@ -0,0 +1,161 @@
+"""Imagem ➜ PDF direto, sem passar por HTML nem por um motor de layout.
+
+JPEGs são embutidos como estão (/DCTDecode, sem recodificar). Os demais
+formatos são decodificados uma vez pelo Pillow e gravados sem perda
+(/FlateDecode), com canal alfa como /SMask. TIFF/GIF com vários quadros viram
+várias páginas. Cada imagem é ajustada à página (tamanho/orientação/margem
+das opções), sem ampliar além do tamanho natural (96 dpi, como no HTML).
+"""
+import io
+import zlib
+
+from .buffers import BufferFile, file_buffer
+from .options import ConvertOptions
+
+MM_TO_PT = 72.0 / 25.4
+PX_TO_PT = 72.0 / 96.0
+
+# Orientação EXIF -> (a, b, c, d, e, f) mapeando o quadrado unitário da imagem
+# gravada (u, v) para a área exibida normalizada (s, t):
+#   s = a*u + b*v + c ;  t = d*u + e*v + f
+_EXIF_TRANSFORMS = {
+    1: (1, 0, 0, 0, 1, 0),
+    2: (-1, 0, 1, 0, 1, 0),
+    3: (-1, 0, 1, 0, -1, 1),
+    4: (1, 0, 0, 0, -1, 1),
+    5: (0, -1, 1, -1, 0, 1),
+    6: (0, 1, 0, -1, 0, 1),
+    7: (0, 1, 0, 1, 0, 0),
+    8: (0, -1, 1, 1, 0, 0),
+}
+
+_COLORSPACES = {"1": ("/DeviceGray", 1), "L": ("/DeviceGray", 8), "RGB": ("/DeviceRGB", 8),
+                "CMYK": ("/DeviceCMYK", 8)}
+
+
+class _PdfWriter:
+    # Escritor mínimo de PDF: objetos numerados, xref e trailer.
+    def __init__(self):
+        self.buf = io.BytesIO()
+        self.offsets = {}
+        self.next_id = 3  # 1 = Catalog, 2 = Pages
+        self.page_ids = []
+        self.buf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def alloc(self) -> int:
+        oid = self.next_id
+        self.next_id += 1
+        return oid
+
+    def obj(self, oid: int, body: str, stream=None):
+        self.offsets[oid] = self.buf.tell()
+        w = self.buf.write
+        w(f"{oid} 0 obj\n".encode("ascii"))
+        if stream is None:
+            w(body.encode("ascii"))
+        else:
+            w(f"{body[:-2]} /Length {len(stream)} >>\nstream\n".encode("ascii"))
+            w(stream)
+            w(b"\nendstream")
+        w(b"\nendobj\n")
+
+    def finish(self) -> bytes:
+        kids = " ".join(f"{pid} 0 R" for pid in self.page_ids)
+        self.obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        self.obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        xref_at = self.buf.tell()
+        w = self.buf.write
+        w(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode("ascii"))
+        for oid in range(1, self.next_id):
+            w(f"{self.offsets[oid]:010d} 00000 n \n".encode("ascii"))
+        w(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("ascii"))
+        return self.buf.getvalue()
+
+
+def _page_box(options: ConvertOptions) -> tuple[float, float, float]:
+    page_w, page_h = options.page_size_pt()
+    return page_w, page_h, options.margin_mm * MM_TO_PT
+
+
+def _image_xobject(writer: _PdfWriter, frame, raw_jpeg=None) -> int:
+    # Devolve o id do XObject da imagem (com /SMask se houver transparência)
+    w, h = frame.size
+    if raw_jpeg is not None:
+        colorspace, bpc = _COLORSPACES[frame.mode]
+        decode = " /Decode [1 0 1 0 1 0 1 0]" if frame.mode == "CMYK" and "adobe" in frame.info else ""
+        oid = writer.alloc()
+        writer.obj(oid, f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace {colorspace} "
+                        f"/BitsPerComponent {bpc}{decode} /Filter /DCTDecode >>", raw_jpeg)
+        return oid
+
+    smask = ""
+    if frame.mode in ("RGBA", "LA", "PA") or (frame.mode == "P" and "transparency" in frame.info):
+        frame = frame.convert("RGBA") if frame.mode in ("P", "PA") else frame
+        alpha = frame.getchannel("A")
+        if alpha.getextrema() != (255, 255):
+            sid = writer.alloc()
+            writer.obj(sid, f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceGray "
+                            f"/BitsPerComponent 8 /Filter /FlateDecode >>", zlib.compress(alpha.tobytes(), 6))
+            smask = f" /SMask {sid} 0 R"
+        frame = frame.convert("L" if frame.mode == "LA" else "RGB")
+    elif frame.mode not in _COLORSPACES:
+        # P, I;16, I, F, YCbCr, LAB... -> rasteriza para um modo que o PDF entende
+        frame = frame.convert("L" if frame.mode in ("I;16", "I", "F") else "RGB")
+
+    colorspace, bpc = _COLORSPACES[frame.mode]
+    oid = writer.alloc()
+    writer.obj(oid, f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace {colorspace} "
+                    f"/BitsPerComponent {bpc}{smask} /Filter /FlateDecode >>", zlib.compress(frame.tobytes(), 6))
+    return oid
+
+
+def _add_page(writer: _PdfWriter, image_id: int, size_px: tuple[int, int], orientation: int,
+              options: ConvertOptions) -> None:
+    page_w, page_h, margin = _page_box(options)
+    px_w, px_h = size_px
+    if orientation in (5, 6, 7, 8):
+        px_w, px_h = px_h, px_w
+    nat_w, nat_h = px_w * PX_TO_PT, px_h * PX_TO_PT
+    box_w, box_h = max(page_w - 2 * margin, 1.0), max(page_h - 2 * margin, 1.0)
+    scale = min(1.0, box_w / nat_w, box_h / nat_h)
+    disp_w, disp_h = nat_w * scale, nat_h * scale
+    x = (page_w - disp_w) / 2  # centralizada na horizontal, no topo (como no HTML)
+    y = page_h - margin - disp_h
+
+    a, b, c, d, e, f = _EXIF_TRANSFORMS.get(orientation, _EXIF_TRANSFORMS[1])
+    cm = (disp_w * a, disp_h * d, disp_w * b, disp_h * e, x + disp_w * c, y + disp_h * f)
+    content = ("q " + " ".join(f"{v:.4f}" for v in cm) + " cm /Im0 Do Q").encode("ascii")
+
+    cid = writer.alloc()
+    writer.obj(cid, "<< >>", content)
+    pid = writer.alloc()
+    writer.obj(pid, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}] "
+                    f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {cid} 0 R >>")
+    writer.page_ids.append(pid)
+
+
+def image_bytes_to_pdf(data, options: ConvertOptions = ConvertOptions()) -> bytes:
+    # `data`: bytes ou memoryview (o JPEG vai direto do buffer para o PDF).
+    # Levanta PIL.UnidentifiedImageError para formatos que o Pillow não abre (ex.: SVG)
+    from PIL import Image, ImageSequence
+
+    writer = _PdfWriter()
+    with Image.open(BufferFile(data)) as im:
+        try:
+            orientation = int(im.getexif().get(0x0112, 1))
+        except Exception:
+            orientation = 1
+        if im.format == "JPEG" and im.mode in _COLORSPACES and im.mode != "1":
+            # Sem decodificar os pixels: só o cabeçalho foi lido
+            image_id = _image_xobject(writer, im, raw_jpeg=data)
+            _add_page(writer, image_id, im.size, orientation, options)
+        else:
+            for frame in ImageSequence.Iterator(im):
+                frame.load()
+                image_id = _image_xobject(writer, frame)
+                _add_page(writer, image_id, frame.size, orientation, options)
+    return writer.finish()
+
+
+def image_file_to_pdf(uploaded_file, options: ConvertOptions = ConvertOptions()) -> bytes:
+    return image_bytes_to_pdf(file_buffer(uploaded_file), options)
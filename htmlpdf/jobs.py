@@ -0,0 +1,283 @@
+"""Fila de tarefas em segundo plano: conversões que não prendem o script do Streamlit.
+
+`JobQueue.submit(itens, opções)` grava as entradas em `<pasta>/<id>/entradas/`,
+devolve o id da tarefa e volta na hora. Uma thread despachante roda as tarefas
+na ordem de chegada (os arquivos de cada uma em paralelo, no pool de processos
+de `pool.py`) e grava cada PDF em `<id>/saidas/` assim que fica pronto. O estado
+(`tarefa.json`: situação, progresso, erros e avisos por arquivo) é regravado a
+cada arquivo concluído.
+
+Tudo fica em disco: qualquer sessão consulta a tarefa pelo id, um rerun não
+perde o que já foi feito e tarefas interrompidas (processo encerrado) são
+retomadas de onde pararam quando a fila sobe de novo. Sem broker externo;
+`jobs_http.py` expõe a mesma fila por HTTP.
+"""
+import collections
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .metrics import to_jsonl
+from .options import ConvertOptions
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "na fila", "executando", "concluída", "cancelada", "falhou"
+FINISHED = (DONE, CANCELLED, FAILED)
+JOB_FILE = "tarefa.json"
+JOB_ID_RE = re.compile(r"[0-9]{8}-[0-9]{6}-[0-9a-f]{8}")  # AAAAmmdd-HHMMSS-<8 hex>, ver submit()
+CANCEL_FLAG = "cancelar"
+
+
+def _pid_alive(pid: int) -> bool:
+    if not pid:
+        return False
+    if os.name == "nt":
+        try:
+            import psutil
+            return psutil.pid_exists(pid)
+        except ImportError:
+            return True  # sem como saber: não retoma (evita rodar a mesma tarefa duas vezes)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe, mas é de outro usuário
+    return True
+
+
+def _safe_name(name: str) -> str:
+    base = Path(str(name).replace("\\", "/")).name or "arquivo"
+    return "".join(c if c.isalnum() or c in "._- " else "_" for c in base)
+
+
+class JobQueue:
+    def __init__(self, root: str, max_age_s: float = 72 * 3600):
+        self.root = Path(root)
+        self.max_age_s = max_age_s
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: collections.deque = collections.deque()
+        self._thread: Optional[threading.Thread] = None
+        self._resume()
+
+    # -----------------------
+    # Estado em disco
+    # -----------------------
+    def _dir(self, job_id: str) -> Path:
+        # Só ids no formato gerado por submit(): nada de "..", barras ou nomes soltos
+        if not isinstance(job_id, str) or not JOB_ID_RE.fullmatch(job_id):
+            raise KeyError(job_id)
+        return self.root / job_id
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        try:
+            return json.loads((self._dir(job_id) / JOB_FILE).read_text("utf-8"))
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def _save(self, job: dict) -> None:
+        job["atualizada"] = time.time()
+        path = self._dir(job["id"]) / JOB_FILE
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _resume(self) -> None:
+        # Tarefas de um processo que já não existe voltam para a fila; as antigas
+        # já encerradas são apagadas
+        now = time.time()
+        for path in self.root.glob(".part-*"):
+            if now - path.stat().st_mtime > 3600:
+                shutil.rmtree(path, ignore_errors=True)  # envio interrompido
+        jobs = [j for j in (self._load(p.name) for p in self.root.iterdir() if p.is_dir()) if j]
+        for job in sorted(jobs, key=lambda j: j["criada"]):
+            pid = job.get("pid", 0)
+            if job["situacao"] in FINISHED:
+                if now - job.get("atualizada", job["criada"]) > self.max_age_s:
+                    shutil.rmtree(self._dir(job["id"]), ignore_errors=True)
+            elif pid == os.getpid() or not _pid_alive(pid):
+                self._enqueue(job["id"])
+
+    # -----------------------
+    # API
+    # -----------------------
+    def submit(self, items: list[tuple[str, object]], options: ConvertOptions, workers: int = 1) -> str:
+        # items: (nome, bytes | memoryview | caminho | arquivo aberto). Devolve o id da tarefa.
+        job_id = time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(4)
+        tmp = Path(tempfile.mkdtemp(prefix=".part-", dir=self.root))
+        try:
+            (tmp / "entradas").mkdir()
+            (tmp / "saidas").mkdir()
+            files = []
+            for i, (name, source) in enumerate(items):
+                rel = f"entradas/{i:06d}-{_safe_name(name)}"
+                _write_input(tmp / rel, source)
+                files.append({"nome": name, "entrada": rel, "saida": None, "erro": None, "dica": None,
+                              "avisos": []})
+            job = {"id": job_id, "criada": time.time(), "situacao": QUEUED, "pid": os.getpid(),
+                   "workers": max(1, int(workers)), "opcoes": options.to_dict(),
+                   "feitos": 0, "total": len(files), "arquivos": files}
+            with open(tmp / JOB_FILE, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp, self._dir(job_id))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self._enqueue(job_id)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self._load(job_id)
+        if job is not None:
+            with self._lock:
+                job["posicao_na_fila"] = (list(self._pending).index(job_id) + 1
+                                          if job_id in self._pending else None)
+        return job
+
+    def list_jobs(self) -> list[dict]:
+        jobs = [self._load(p.name) for p in self.root.iterdir() if p.is_dir() and not p.name.startswith(".")]
+        return sorted((j for j in jobs if j), key=lambda j: j["criada"], reverse=True)
+
+    def outputs(self, job_id: str) -> list[tuple[str, Path]]:
+        # PDFs prontos, na ordem de envio: (nome original, caminho)
+        job = self._load(job_id) or {"arquivos": []}
+        base = self._dir(job_id)
+        return [(f["nome"], base / f["saida"]) for f in job["arquivos"] if f["saida"]]
+
+    def metrics_path(self, job_id: str) -> Path:
+        return self._dir(job_id) / "medicoes.jsonl"
+
+    def cancel(self, job_id: str) -> None:
+        # Vale também para tarefas rodando em outro processo: o despachante
+        # confere a marca a cada arquivo concluído
+        path = self._dir(job_id)
+        if path.is_dir():
+            (path / CANCEL_FLAG).touch()
+        with self._lock:
+            if job_id in self._pending:
+                self._pending.remove(job_id)
+                queued = True
+            else:
+                queued = False
+        if queued:
+            job = self._load(job_id)
+            if job is not None:
+                job["situacao"] = CANCELLED
+                self._save(job)
+
+    def remove(self, job_id: str) -> bool:
+        job = self._load(job_id)
+        if job is None or job["situacao"] not in FINISHED:
+            return False
+        shutil.rmtree(self._dir(job_id), ignore_errors=True)
+        return True
+
+    # -----------------------
+    # Execução
+    # -----------------------
+    def _enqueue(self, job_id: str) -> None:
+        with self._lock:
+            self._pending.append(job_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._dispatch, name="htmlpdf-jobs", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                job_id = self._pending.popleft()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                job = self._load(job_id)
+                if job is not None:
+                    job["situacao"], job["erro"] = FAILED, f"{e.__class__.__name__}: {e}"
+                    self._save(job)
+
+    def _run(self, job_id: str) -> None:
+        from .pool import iter_convert
+        job = self._load(job_id)
+        if job is None or job["situacao"] in FINISHED:
+            return
+        base = self._dir(job_id)
+        if (base / CANCEL_FLAG).exists():
+            job["situacao"] = CANCELLED
+            self._save(job)
+            return
+        job["situacao"], job["pid"] = RUNNING, os.getpid()
+        self._save(job)
+
+        # Retomada: só o que ainda não tem resultado
+        todo = [(i, f) for i, f in enumerate(job["arquivos"]) if not f["saida"] and not f["erro"]]
+        items = [(f["nome"], str(base / f["entrada"])) for _, f in todo]
+        records: list = []
+        results = iter_convert(items, ConvertOptions.from_dict(job["opcoes"]), job["workers"], records)
+        try:
+            for j, pdf_bytes, err, warns in results:
+                i, f = todo[j]
+                if err is None:
+                    rel = f"saidas/{i:06d}-{Path(_safe_name(f['nome'])).stem}.pdf"
+                    fd, tmp = tempfile.mkstemp(dir=base / "saidas", suffix=".part")
+                    with os.fdopen(fd, "wb") as out:
+                        out.write(pdf_bytes)
+                    os.replace(tmp, base / rel)
+                    f["saida"] = rel
+                else:
+                    f["erro"] = f"{err.__class__.__name__}: {err}"
+                    f["dica"] = getattr(err, "hint", None)
+                f["avisos"] = warns
+                job["feitos"] = sum(1 for x in job["arquivos"] if x["saida"] or x["erro"])
+                if records:
+                    with open(self.metrics_path(job_id), "a", encoding="utf-8") as m:
+                        m.write(to_jsonl(records))
+                    records.clear()
+                if (base / CANCEL_FLAG).exists():
+                    job["situacao"] = CANCELLED
+                    self._save(job)
+                    return
+                self._save(job)
+        finally:
+            results.close()  # cancela o que ainda não começou no pool
+        job["situacao"] = DONE
+        self._save(job)
+
+
+def _write_input(target: Path, source) -> None:
+    if isinstance(source, (str, os.PathLike)):
+        shutil.copyfile(source, target)
+        return
+    with open(target, "wb") as f:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            f.write(source)
+        else:
+            source.seek(0)
+            shutil.copyfileobj(source, f, 1024 * 1024)
+
+
+_queues: dict = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(root: str = "") -> JobQueue:
+    # Uma fila por pasta por processo (compartilhada entre sessões do Streamlit e
+    # o endpoint HTTP); pasta padrão: HTMLPDF_JOBS_DIR ou <tmp>/htmlpdf_jobs
+    root = os.path.abspath(root or os.environ.get("HTMLPDF_JOBS_DIR")
+                           or os.path.join(tempfile.gettempdir(), "htmlpdf_jobs"))
+    with _queues_lock:
+        queue = _queues.get(root)
+        if queue is None:
+            queue = _queues[root] = JobQueue(
+                root, max_age_s=float(os.environ.get("HTMLPDF_JOBS_MAX_AGE_H", 72)) * 3600)
+        return queue
@@ -0,0 +1,160 @@
+"""Endpoint HTTP mínimo (biblioteca padrão) para a fila de tarefas de `jobs.py`.
+
+    POST   /jobs                    envia uma tarefa; devolve {"id": ...} (202)
+             - JSON: {"arquivos": [{"nome": "a.html", "conteudo_b64": "..."}],
+                      "opcoes": {...ConvertOptions...}, "workers": 2}
+             - ou o próprio arquivo no corpo: POST /jobs?nome=a.html
+    GET    /jobs                    lista as tarefas
+    GET    /jobs/<id>               situação e progresso
+    GET    /jobs/<id>/files/<n>     PDF do n-ésimo arquivo (0 = primeiro)
+    DELETE /jobs/<id>               cancela (ou apaga, se já terminou)
+
+Escuta só em 127.0.0.1 por padrão. Com HTMLPDF_JOBS_TOKEN definido, exige o
+cabeçalho `Authorization: Bearer <token>`.
+
+    python -m htmlpdf.jobs_http --port 8765
+"""
+import argparse
+import base64
+import binascii
+import hmac
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .jobs import FINISHED, JobQueue, get_job_queue
+from .options import ConvertOptions
+
+MAX_BODY = int(float(os.environ.get("HTMLPDF_JOBS_MAX_MB", 512)) * 1024 * 1024)
+
+
+def _handler(queue: JobQueue, token: str):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "htmlpdf-jobs"
+
+        def log_message(self, fmt, *args):
+            pass  # sem log de acesso no stderr do Streamlit
+
+        def _send(self, status: int, payload=None, body: Optional[bytes] = None, mime: str = "application/json"):
+            if body is None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if not token:
+                return True
+            sent = self.headers.get("Authorization", "")
+            if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+                return True
+            self._send(401, {"erro": "token inválido"})
+            return False
+
+        def _route(self) -> list[str]:
+            return [p for p in urlsplit(self.path).path.split("/") if p]
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            parts = self._route()
+            if parts == ["jobs"]:
+                return self._send(200, queue.list_jobs())
+            if len(parts) == 2 and parts[0] == "jobs":
+                job = queue.status(parts[1])
+                return self._send(200, job) if job else self._send(404, {"erro": "tarefa não encontrada"})
+            if len(parts) == 4 and parts[0] == "jobs" and parts[2] == "files" and parts[3].isdigit():
+                job = queue.status(parts[1])
+                n = int(parts[3])
+                if job is None or n >= len(job["arquivos"]):
+                    return self._send(404, {"erro": "arquivo não encontrado"})
+                f = job["arquivos"][n]
+                if not f["saida"]:
+                    return self._send(409, {"erro": f["erro"] or "ainda não convertido", "situacao": job["situacao"]})
+                path = queue.root / job["id"] / f["saida"]
+                return self._send(200, body=path.read_bytes(), mime="application/pdf")
+            self._send(404, {"erro": "rota não encontrada"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            if self._route() != ["jobs"]:
+                return self._send(404, {"erro": "rota não encontrada"})
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY:
+                return self._send(413 if length else 411, {"erro": f"corpo vazio ou maior que {MAX_BODY} bytes"})
+            body = self.rfile.read(length)
+            query = parse_qs(urlsplit(self.path).query)
+            try:
+                if self.headers.get_content_type() == "application/json":
+                    req = json.loads(body)
+                    items = [(f["nome"], base64.b64decode(f["conteudo_b64"], validate=True))
+                             for f in req["arquivos"]]
+                    options = ConvertOptions.from_dict(req.get("opcoes") or {})
+                    workers = int(req.get("workers") or 1)
+                else:
+                    items = [(query["nome"][0], body)]
+                    options, workers = ConvertOptions(), int(query.get("workers", ["1"])[0])
+            except (KeyError, TypeError, ValueError, binascii.Error) as e:
+                return self._send(400, {"erro": f"requisição inválida: {e.__class__.__name__}: {e}"})
+            if not items:
+                return self._send(400, {"erro": "nenhum arquivo enviado"})
+            job_id = queue.submit(items, options, workers)
+            self._send(202, {"id": job_id, "situacao": queue.status(job_id)["situacao"]})
+
+        def do_DELETE(self):
+            if not self._authorized():
+                return
+            parts = self._route()
+            job = queue.status(parts[1]) if len(parts) == 2 and parts[0] == "jobs" else None
+            if job is None:
+                return self._send(404, {"erro": "tarefa não encontrada"})
+            if job["situacao"] in FINISHED:
+                queue.remove(job["id"])
+                return self._send(200, {"id": job["id"], "removida": True})
+            queue.cancel(job["id"])
+            self._send(202, {"id": job["id"], "situacao": "cancelando"})
+
+    return Handler
+
+
+def make_server(queue: Optional[JobQueue] = None, host: str = "127.0.0.1", port: int = 8765,
+                token: Optional[str] = None) -> ThreadingHTTPServer:
+    token = os.environ.get("HTMLPDF_JOBS_TOKEN", "") if token is None else token
+    server = ThreadingHTTPServer((host, port), _handler(queue or get_job_queue(), token))
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_background(queue: Optional[JobQueue] = None, host: str = "127.0.0.1",
+                        port: int = 8765) -> ThreadingHTTPServer:
+    # Para rodar dentro do processo do Streamlit: mesma fila (e mesmo pool) das sessões
+    server = make_server(queue, host, port)
+    threading.Thread(target=server.serve_forever, name="htmlpdf-jobs-http", daemon=True).start()
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="htmlpdf.jobs_http", description="Fila de conversões por HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=int(os.environ.get("HTMLPDF_JOBS_HTTP_PORT") or 8765))
+    ap.add_argument("--jobs-dir", default="", help="pasta das tarefas (padrão: HTMLPDF_JOBS_DIR ou <tmp>/htmlpdf_jobs)")
+    args = ap.parse_args(argv)
+    server = make_server(get_job_queue(args.jobs_dir), args.host, args.port)
+    print(f"fila de tarefas em http://{args.host}:{server.server_address[1]}/jobs", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,557 @@
+"""Merge de múltiplos PDFs.
+
+`merge_pdfs` monta tudo em memória (pypdf/PyPDF2). `merge_pdfs_to_file` é o
+modo streaming: lê cada entrada de arquivo/stream e grava página por página
+direto no destino, guardando só o mapa de objetos já escritos. O pico de
+memória fica perto do da maior página (com seus recursos), não da soma das
+entradas.
+
+O streaming tem duas etapas: `prepare_pdf` serializa cada documento uma vez
+para um rascunho em disco e `assemble_pdf` monta a saída a partir dos
+rascunhos. `PreparedPdfCache` guarda os rascunhos da sessão, então mudar a
+seleção ou a ordem só repete a montagem.
+"""
+import hashlib
+import importlib.util as _iu
+import io
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Union
+
+from .cache import content_digest
+from .errors import MissingDependencyError
+from .options import MergeOptions
+
+PdfSource = Union[bytes, bytearray, memoryview, str, os.PathLike, BinaryIO]
+
+
+def merge_pdfs(pdf_bytes_list: list) -> bytes:
+    # Cada item pode ser os bytes do PDF ou o caminho de um arquivo .pdf
+    writer = None
+    try:
+        from pypdf import PdfReader, PdfWriter
+        writer = PdfWriter()
+    except Exception:
+        try:
+            from PyPDF2 import PdfReader, PdfWriter
+            writer = PdfWriter()
+        except Exception:
+            raise MissingDependencyError("Para unir PDFs, instale 'pypdf' ou 'PyPDF2' no requirements.txt.",
+                                         hint="python -m pip install pypdf")
+
+    for pdf_bytes in pdf_bytes_list:
+        src = pdf_bytes if isinstance(pdf_bytes, (str, os.PathLike)) else io.BytesIO(pdf_bytes)
+        reader = PdfReader(src)
+        for page in reader.pages:
+            writer.add_page(page)
+
+    out = io.BytesIO()
+    writer.write(out)
+    out.seek(0)
+    return out.getvalue()
+
+# -----------------------
+# Merge em streaming
+# -----------------------
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+class _StreamingPdfWriter:
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.start = out.tell()
+        self.offsets = {}
+        self.next_id = 3  # 1 = Catalog, 2 = Pages (gravados no fim)
+        self.page_ids = []
+        self.digests = {}  # sha256 do objeto serializado -> id (deduplicação entre documentos)
+        self.deduped = 0
+        out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def alloc(self) -> int:
+        oid = self.next_id
+        self.next_id += 1
+        return oid
+
+    def begin(self, oid: int) -> None:
+        self.offsets[oid] = self.out.tell() - self.start
+        self.out.write(f"{oid} 0 obj\n".encode("ascii"))
+
+    def end(self) -> None:
+        self.out.write(b"\nendobj\n")
+
+    def finish(self) -> None:
+        kids = " ".join(f"{pid} 0 R" for pid in self.page_ids)
+        for oid, body in ((_CATALOG_ID, f"<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>"),
+                          (_PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")):
+            self.begin(oid)
+            self.out.write(body.encode("ascii"))
+            self.end()
+        xref_at = self.out.tell() - self.start
+        w = self.out.write
+        w(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode("ascii"))
+        for oid in range(1, self.next_id):
+            off = self.offsets.get(oid)
+            w(f"{off:010d} 00000 n \n".encode("ascii") if off is not None else b"0000000000 65535 f \n")
+        w(f"trailer\n<< /Size {self.next_id} /Root {_CATALOG_ID} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("ascii"))
+
+
+_TREE_TYPES = ("/Page", "/Pages", "/Catalog")
+_JPEG_QUALITY = 85
+
+
+def _filters(obj) -> list[str]:
+    f = obj.get("/Filter")
+    if f is None:
+        return []
+    return [str(x) for x in f] if isinstance(f, list) else [str(f)]
+
+
+# Filtros que o pypdf decodifica sem perda (o conteúdo volta como Flate) e os de
+# imagem que o get_data() devolve como estão (JPEG / JPEG 2000)
+_LOSSLESS_FILTERS = ("/FlateDecode", "/LZWDecode", "/ASCIIHexDecode", "/ASCII85Decode", "/RunLengthDecode")
+_IMAGE_FILTERS = ("/DCTDecode", "/JPXDecode")
+
+
+def _stream_data(obj, items: dict) -> Optional[bytes]:
+    # Conteúdo do stream pelo get_data() do pypdf, com `items` ajustado ao que sai:
+    # filtros sem perda são desfeitos (/Filter e /DecodeParms saem; ver _flate) e
+    # JPEG/JPEG 2000 seguem com o próprio filtro. None = o pypdf não devolve os
+    # bytes intactos (CCITT, JBIG2, Crypt...) ou não conseguiu decodificar
+    filters = _filters(obj)
+    image = filters[-1:] if filters and filters[-1] in _IMAGE_FILTERS else []
+    if any(f not in _LOSSLESS_FILTERS for f in filters[:len(filters) - len(image)]):
+        return None
+    try:
+        data = obj.get_data()
+    except Exception:
+        return None
+    if filters != image:
+        from pypdf.generic import NameObject
+        parms = items.pop("/DecodeParms", None)
+        items.pop("/Filter", None)
+        if image:
+            items[NameObject("/Filter")] = NameObject(image[0])
+            if isinstance(parms, list) and parms[-1] is not None:
+                items[NameObject("/DecodeParms")] = parms[-1]
+    return data
+
+
+def _flate(items: dict, data: bytes, level: int, always: bool) -> bytes:
+    import zlib
+    from pypdf.generic import NameObject
+    packed = zlib.compress(data, level)
+    if always or len(packed) < len(data):
+        items[NameObject("/Filter")] = NameObject("/FlateDecode")
+        return packed
+    return data
+
+
+def _image_mode(colorspace):
+    # Espaço de cor -> modo do Pillow (Gray/RGB, inclusive ICCBased com N = 1/3)
+    cs = colorspace.get_object() if hasattr(colorspace, "get_object") else colorspace
+    if isinstance(cs, list) and len(cs) == 2 and cs[0] == "/ICCBased":
+        n = cs[1].get_object().get("/N")
+        return {1: "L", 3: "RGB"}.get(int(n) if n is not None else 0)
+    return {"/DeviceRGB": "RGB", "/DeviceGray": "L"}.get(str(cs))
+
+
+def _downsample(items: dict, data: bytes, max_px: int) -> bytes:
+    # Reduz imagens 8 bits Gray/RGB (JPEG ou já decodificadas) maiores que max_px
+    from PIL import Image
+    from pypdf.generic import NameObject, NumberObject
+    if items.get("/Subtype") != "/Image" or items.get("/ImageMask") or items.get("/BitsPerComponent") != 8:
+        return data
+    mode = _image_mode(items.get("/ColorSpace"))
+    w, h = int(items.get("/Width", 0)), int(items.get("/Height", 0))
+    filters = _filters(items)
+    if mode is None or max(w, h) <= max_px or filters not in ([], ["/DCTDecode"]):
+        return data
+    try:
+        if filters:
+            im = Image.open(io.BytesIO(data))
+            im = im.convert(mode)
+        else:
+            im = Image.frombytes(mode, (w, h), data)
+    except Exception:
+        return data
+
+    scale = max_px / max(w, h)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    im = im.resize(size, Image.LANCZOS)
+    if filters:
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=_JPEG_QUALITY)
+        out = buf.getvalue()
+        items.pop("/DecodeParms", None)
+    else:
+        out = im.tobytes()  # comprimido com Flate em _write
+    items[NameObject("/Width")], items[NameObject("/Height")] = NumberObject(size[0]), NumberObject(size[1])
+    return out
+
+
+class _Body:
+    # Corpo de um objeto em montagem: bytes literais + posições das referências
+    def __init__(self):
+        self.buf = io.BytesIO()
+        self.refs = []  # (posição no corpo, id local)
+
+    def write(self, data: bytes) -> None:
+        self.buf.write(data)
+
+    def ref(self, lid: int) -> None:
+        self.refs.append((self.buf.tell(), lid))
+
+
+class PreparedPdf:
+    # Documento já serializado para a união: os corpos dos objetos ficam num arquivo
+    # de rascunho, com as referências como lacunas (id local). Remontar em outra
+    # ordem/seleção só copia trechos e renumera, sem reler nem reanalisar o PDF.
+    def __init__(self, spool_path: str):
+        self.path = spool_path
+        self.objects = []  # id local -> (hash ou None, início, fim, [(posição, id local), ...])
+        self.pages = []    # ids locais das páginas, em ordem
+        self.size = 0      # bytes no rascunho
+        self._finalizer = weakref.finalize(self, _remove_quietly, spool_path)
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _merkle(own: list, children: list) -> list:
+    # Hash de cada objeto = hash próprio + hashes dos filhos. Objetos sem hash
+    # próprio (páginas) ou em ciclos ficam None, e quem aponta para eles também.
+    out = [None] * len(own)
+    state = [0] * len(own)  # 0 = novo, 1 = em visita, 2 = pronto
+    for first in range(len(own)):
+        if state[first]:
+            continue
+        state[first] = 1
+        stack = [(first, iter(children[first]))]
+        while stack:
+            node, it = stack[-1]
+            child = next(it, -1)
+            if child >= 0:
+                if state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(children[child])))
+                continue
+            stack.pop()
+            state[node] = 2
+            if own[node] is None or any(out[c] is None for c in children[node]):
+                continue
+            h = hashlib.sha256(own[node])
+            for c in children[node]:
+                h.update(out[c])
+            out[node] = h.digest()
+    return out
+
+
+class _DocumentPreparer:
+    # Serializa as páginas de um PdfReader (e o que elas referenciam) para um
+    # PreparedPdf. O hash de cada objeto é calculado sobre o original: a
+    # deduplicação entre documentos independe de recompressão/redução.
+    def __init__(self, reader, options: MergeOptions, doc: PreparedPdf, spool: BinaryIO,
+                 max_pages: Optional[int] = None):
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+        self._types = (ArrayObject, DictionaryObject, IndirectObject, StreamObject)
+        self.reader = reader
+        self.options = options
+        self.doc = doc
+        self.spool = spool
+        self.ids = {}       # (idnum, geração) na entrada -> id local
+        self.pending = []   # referências com id local mas ainda não serializadas
+        self.own = []       # id local -> hash próprio (sem os filhos) ou None
+        self.max_px = 0     # lado máximo em pixels para imagens na página atual
+        self.max_pages = max_pages  # None = todas; senão, só as primeiras páginas
+
+    def _alloc(self) -> int:
+        self.doc.objects.append(None)
+        self.own.append(None)
+        return len(self.doc.objects) - 1
+
+    def _ref(self, ref) -> int:
+        key = (ref.idnum, ref.generation)
+        lid = self.ids.get(key)
+        if lid is None:
+            lid = self.ids[key] = self._alloc()
+            self.pending.append(ref)
+        return lid
+
+    @property
+    def _optimizing(self) -> bool:
+        return self.options.recompress or self.max_px > 0
+
+    def _write(self, obj, body: _Body, optimize: bool = False) -> None:
+        ArrayObject, DictionaryObject, IndirectObject, StreamObject = self._types
+        if isinstance(obj, IndirectObject):
+            body.ref(self._ref(obj))
+        elif isinstance(obj, StreamObject):
+            items = dict(obj)
+            items.pop("/Length", None)
+            filtered = "/Filter" in items
+            data = _stream_data(obj, items)
+            if data is None:
+                data = obj._data  # sem decodificação confiável: os bytes originais, com o /Filter
+            else:
+                reduced = _downsample(items, data, self.max_px) if optimize and self.max_px else data
+                recompress = optimize and self.options.recompress
+                if "/Filter" not in items and (filtered or recompress or reduced is not data):
+                    reduced = _flate(items, reduced, 9 if recompress else 6, always=filtered)
+                data = reduced
+            body.write(b"<<")
+            self._write_entries(items, body)
+            body.write(f" /Length {len(data)} >>\nstream\n".encode("ascii"))
+            body.write(data)
+            body.write(b"\nendstream")
+        elif isinstance(obj, DictionaryObject):
+            body.write(b"<<")
+            self._write_entries(obj, body)
+            body.write(b" >>")
+        elif isinstance(obj, ArrayObject):
+            body.write(b"[")
+            for item in obj:
+                body.write(b" ")
+                self._write(item, body)
+            body.write(b" ]")
+        elif obj is None:
+            body.write(b"null")
+        else:
+            buf = io.BytesIO()
+            obj.write_to_stream(buf)
+            body.write(buf.getvalue())
+
+    def _write_entries(self, items, body: _Body) -> None:
+        for k, v in items.items():
+            body.write(b" ")
+            body.write(self._name_bytes(k))
+            body.write(b" ")
+            self._write(v, body)
+
+    @staticmethod
+    def _name_bytes(name) -> bytes:
+        buf = io.BytesIO()
+        name.write_to_stream(buf)
+        return buf.getvalue()
+
+    @staticmethod
+    def _hash(body: _Body) -> bytes:
+        h = hashlib.sha256(body.buf.getbuffer())
+        for pos, _ in body.refs:
+            h.update(pos.to_bytes(8, "big"))
+        return h.digest()
+
+    def _store(self, lid: int, body: _Body, own: Optional[bytes]) -> None:
+        start = self.spool.tell()
+        self.spool.write(body.buf.getbuffer())
+        self.doc.objects[lid] = (None, start, self.spool.tell(), body.refs)
+        self.own[lid] = own
+
+    def _drain(self) -> None:
+        while self.pending:
+            ref = self.pending.pop()
+            lid = self.ids[(ref.idnum, ref.generation)]
+            obj = ref.get_object()
+            tree_type = obj.get("/Type") if hasattr(obj, "get") else None
+            if tree_type in ("/Pages", "/Catalog"):
+                # Nós da árvore de páginas/catálogo da entrada não são copiados
+                obj = None
+            body = _Body()
+            self._write(obj, body, optimize=True)
+            own = None
+            if self.options.dedupe and tree_type not in _TREE_TYPES:
+                if self._optimizing and isinstance(obj, self._types[3]):
+                    original = _Body()
+                    self._write(obj, original)  # mesmas referências: nada novo em pending
+                    own = self._hash(original)
+                else:
+                    own = self._hash(body)
+            self._store(lid, body, own)
+
+    def prepare(self) -> None:
+        pages = list(self.reader.pages)[:self.max_pages]
+        lids = []
+        for page in pages:
+            # Ids antes de tudo: links internos podem citar páginas futuras
+            ref = page.indirect_reference
+            lids.append(self._ref(ref) if ref is not None else self._alloc())
+        self.pending.clear()  # as páginas são gravadas abaixo, sem o /Parent original
+
+        for page, lid in zip(pages, lids):
+            if self.options.max_image_dpi > 0:
+                box = page.mediabox
+                longest_in = max(float(box.width), float(box.height)) / 72.0
+                self.max_px = max(1, int(longest_in * self.options.max_image_dpi))
+            body = _Body()
+            body.write(f"<< /Parent {_PAGES_ID} 0 R".encode("ascii"))
+            self._write_entries({k: v for k, v in page.items() if k != "/Parent"}, body)
+            body.write(b" >>")
+            self._store(lid, body, None)
+            self.doc.pages.append(lid)
+            self._drain()
+            # Objetos já serializados não precisam ficar em memória no leitor
+            cache = getattr(self.reader, "resolved_objects", None)
+            if isinstance(cache, dict):
+                cache.clear()
+
+        digests = _merkle(self.own, [[c for _, c in o[3]] for o in self.doc.objects])
+        self.doc.objects = [(d, *o[1:]) for d, o in zip(digests, self.doc.objects)]
+        self.doc.size = self.spool.tell()
+
+
+def _open_source(src: PdfSource):
+    # Devolve (stream, fechar_depois)
+    if isinstance(src, (str, os.PathLike)):
+        return open(src, "rb"), True
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return io.BytesIO(src), True
+    src.seek(0)
+    return src, False
+
+
+def prepare_pdf(src: PdfSource, options: MergeOptions = MergeOptions(),
+                max_pages: Optional[int] = None) -> PreparedPdf:
+    # Lê e serializa um PDF uma vez; o rascunho é apagado no close() (ou quando o
+    # objeto deixa de ser usado). max_pages: só as primeiras páginas da entrada
+    try:
+        from pypdf import PdfReader
+    except Exception:
+        raise MissingDependencyError("Para unir PDFs em streaming, instale 'pypdf'.",
+                                     hint="python -m pip install pypdf")
+    fd, spool_path = tempfile.mkstemp(prefix="htmlpdf_prep_", suffix=".bin")
+    doc = PreparedPdf(spool_path)
+    stream, close = _open_source(src)
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            _DocumentPreparer(PdfReader(stream), options, doc, spool, max_pages).prepare()
+    except BaseException:
+        doc.close()
+        raise
+    finally:
+        if close:
+            stream.close()
+    return doc
+
+
+def assemble_pdf(docs: list, dest: Union[str, os.PathLike, BinaryIO]) -> int:
+    # Grava os documentos preparados, na ordem, em `dest`. Objetos com o mesmo hash
+    # (fontes, imagens, perfis de cor...) são gravados uma vez só. Devolve o nº de páginas.
+    out = open(dest, "wb") if isinstance(dest, (str, os.PathLike)) else dest
+    try:
+        writer = _StreamingPdfWriter(out)
+        for doc in docs:
+            ids = []
+            fresh = []
+            for lid, (digest, *_rest) in enumerate(doc.objects):
+                oid = writer.digests.get(digest) if digest is not None else None
+                if oid is None:
+                    oid = writer.alloc()
+                    if digest is not None:
+                        writer.digests[digest] = oid
+                    fresh.append(lid)
+                else:
+                    writer.deduped += 1
+                ids.append(oid)
+            with open(doc.path, "rb") as spool:
+                for lid in fresh:
+                    _, start, end, refs = doc.objects[lid]
+                    spool.seek(start)
+                    body = spool.read(end - start)
+                    writer.begin(ids[lid])
+                    at = 0
+                    for pos, child in refs:
+                        out.write(body[at:pos])
+                        out.write(b"%d 0 R" % ids[child])
+                        at = pos
+                    out.write(body[at:])
+                    writer.end()
+            writer.page_ids.extend(ids[lid] for lid in doc.pages)
+        writer.finish()
+        return len(writer.page_ids)
+    finally:
+        if out is not dest:
+            out.close()
+
+
+class PreparedPdfCache:
+    # Documentos preparados por (chave, opções), para a sessão: reordenar ou trocar
+    # a seleção só remonta. Limitado pelo tamanho dos rascunhos em disco (LRU); na
+    # memória ficam só os índices dos objetos.
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, max_docs: int = 500):
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self._docs: "OrderedDict[tuple, PreparedPdf]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Optional[str], src: PdfSource, options: MergeOptions = MergeOptions()) -> PreparedPdf:
+        # key: hash/chave do conteúdo (None = calcula a partir de `src`)
+        if key is None:
+            stream, close = _open_source(src)
+            try:
+                key = content_digest(stream.read())
+            finally:
+                if close:
+                    stream.close()
+        cache_key = (key, options)
+        with self._lock:
+            doc = self._docs.get(cache_key)
+            if doc is not None:
+                self._docs.move_to_end(cache_key)
+                return doc
+        doc = prepare_pdf(src, options)
+        with self._lock:
+            old = self._docs.pop(cache_key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._docs[cache_key] = doc
+            self._bytes += doc.size
+            while len(self._docs) > 1 and (self._bytes > self.max_bytes or len(self._docs) > self.max_docs):
+                _, evicted = self._docs.popitem(last=False)
+                self._bytes -= evicted.size  # o rascunho some quando ninguém mais o usa
+        return doc
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"documentos": len(self._docs), "bytes": self._bytes}
+
+
+def merge_pdfs_to_file(sources: list, dest: Union[str, os.PathLike, BinaryIO],
+                       options: MergeOptions = MergeOptions()) -> int:
+    # Cada item pode ser bytes, caminho ou arquivo binário aberto (ex.: upload,
+    # SpooledTemporaryFile). Devolve o número de páginas gravadas em `dest`
+    # (-1 no fallback em memória com PyPDF2).
+    if _iu.find_spec("pypdf") is None:
+        # Sem pypdf: cai no merge em memória (PyPDF2)
+        merged = merge_pdfs([s if isinstance(s, (bytes, str, os.PathLike)) else _open_source(s)[0].read()
+                             for s in sources])
+        if isinstance(dest, (str, os.PathLike)):
+            with open(dest, "wb") as f:
+                f.write(merged)
+        else:
+            dest.write(merged)
+        return -1
+
+    docs = []
+    try:
+        for src in sources:
+            docs.append(prepare_pdf(src, options))
+        return assemble_pdf(docs, dest)
+    finally:
+        for doc in docs:
+            doc.close()
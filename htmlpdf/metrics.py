@@ -0,0 +1,182 @@
+"""Medição por arquivo e por etapa: tempo de relógio, tempo de CPU e pico de memória.
+
+`FileMetrics(nome)` abre o registro de um arquivo; enquanto ele está ativo, cada
+`stage("etapa", **info)` (leitura, sanitização, WeasyPrint, tentativa do
+xhtml2pdf...) vira uma linha com os seus números. Fora de um registro, `stage`
+não mede nada. Os registros são dicts simples: atravessam o pool de processos
+e viram JSON lines com `to_jsonl`.
+
+Pico de memória: o pico (VmHWM) é do processo inteiro. Só quando a conversão é o
+único trabalho do processo (`exclusive=True`: worker do pool ou do vigia) ele é
+zerado no começo de cada etapa (Linux), e o valor é o da etapa/arquivo. No
+processo do app as sessões são threads do mesmo processo: zerar o pico
+estragaria a medição das outras, então o valor é o pico do processo até ali,
+marcado com "pico_escopo": "processo".
+
+Tempo de CPU: o da thread que converte (`time.thread_time`). Processos filhos,
+como os workers que renderizam blocos em paralelo, não entram na conta.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+from typing import Iterable, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar("htmlpdf_metrics", default=None)
+_can_reset_peak: Optional[bool] = None
+
+
+# -----------------------
+# Memória (pico de RSS)
+# -----------------------
+def _reset_peak() -> None:
+    global _can_reset_peak
+    if _can_reset_peak is False:
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        _can_reset_peak = True
+    except OSError:
+        _can_reset_peak = False
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)  # peak_wset: Windows
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+# -----------------------
+# Registros
+# -----------------------
+class FileMetrics:
+    # exclusive: esta conversão é o único trabalho do processo (pode zerar o pico)
+    def __init__(self, name: str, exclusive: bool = False):
+        self.name = name
+        self.exclusive = exclusive
+        self.stages: list[dict] = []
+        self.ok = True
+        self.wall_s = self.cpu_s = 0.0
+        self.peak_mb: Optional[float] = None
+        self._depth = 0
+        self._peaks: list = [None]  # pico já visto: do arquivo + de cada etapa aberta
+        self._token = None
+
+    def __enter__(self) -> "FileMetrics":
+        self._token = _current.set(self)
+        self._t0, self._c0 = time.perf_counter(), time.thread_time()
+        if self.exclusive:
+            _reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self._token)
+        self.wall_s = time.perf_counter() - self._t0
+        self.cpu_s = time.thread_time() - self._c0
+        self.peak_mb = _max_peak(self._peaks[0], peak_rss_mb())
+        self.ok = exc_type is None
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **info):
+        self._peaks[-1] = _max_peak(self._peaks[-1], peak_rss_mb())  # antes de zerar
+        row = {"etapa": name, "nivel": self._depth, **info}
+        self.stages.append(row)
+        self._depth += 1
+        self._peaks.append(None)
+        if self.exclusive:
+            _reset_peak()
+        t0, c0 = time.perf_counter(), time.thread_time()
+        try:
+            yield row
+            row.setdefault("resultado", "ok")
+        except BaseException as e:
+            row["resultado"] = f"erro: {e.__class__.__name__}"
+            raise
+        finally:
+            row["parede_s"] = round(time.perf_counter() - t0, 4)
+            row["cpu_s"] = round(time.thread_time() - c0, 4)
+            peak = _max_peak(self._peaks.pop(), peak_rss_mb())
+            row["pico_rss_mb"] = round(peak, 1) if peak is not None else None
+            self._depth -= 1
+            self._peaks[-1] = _max_peak(self._peaks[-1], peak)
+
+    def to_dict(self) -> dict:
+        return {"arquivo": self.name, "ok": self.ok, "parede_s": round(self.wall_s, 4),
+                "cpu_s": round(self.cpu_s, 4),
+                "pico_rss_mb": round(self.peak_mb, 1) if self.peak_mb is not None else None,
+                "pico_escopo": "arquivo" if self.exclusive else "processo",
+                "pid": os.getpid(), "inicio": round(time.time() - self.wall_s, 3), "etapas": self.stages}
+
+
+def _max_peak(*values) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+@contextlib.contextmanager
+def stage(name: str, **info):
+    # Mede a etapa no registro do arquivo atual (se houver); devolve a linha (dict)
+    # para quem quiser acrescentar detalhes, ou None.
+    rec = _current.get()
+    if rec is None:
+        yield None
+        return
+    with rec.stage(name, **info) as row:
+        yield row
+
+
+def note(name: str, **info) -> None:
+    # Linha só com detalhes (sem medição) no registro do arquivo atual, se houver
+    rec = _current.get()
+    if rec is not None:
+        rec.stages.append({"etapa": name, "nivel": rec._depth, **info})
+
+
+def current() -> Optional[FileMetrics]:
+    return _current.get()
+
+
+# -----------------------
+# Exportação
+# -----------------------
+def stage_rows(records: Iterable[dict]) -> list[dict]:
+    # Uma linha por etapa (e uma de total por arquivo), para tabela
+    rows = []
+    for rec in records:
+        scope = rec.get("pico_escopo", "arquivo")
+        rows.append({"arquivo": rec["arquivo"], "etapa": "(total)", "detalhe": "" if rec["ok"] else "falhou",
+                     "parede_s": rec["parede_s"], "cpu_s": rec["cpu_s"], "pico_rss_mb": rec["pico_rss_mb"],
+                     "pico_escopo": scope})
+        for s in rec["etapas"]:
+            extra = {k: v for k, v in s.items()
+                     if k not in ("etapa", "nivel", "parede_s", "cpu_s", "pico_rss_mb", "resultado")}
+            detail = ", ".join(f"{k}={v}" for k, v in extra.items())
+            if s.get("resultado", "ok") != "ok":
+                detail = f"{detail}; {s['resultado']}" if detail else s["resultado"]
+            rows.append({"arquivo": rec["arquivo"], "etapa": "  " * s["nivel"] + s["etapa"], "detalhe": detail,
+                         "parede_s": s.get("parede_s"), "cpu_s": s.get("cpu_s"),
+                         "pico_rss_mb": s.get("pico_rss_mb"), "pico_escopo": scope})
+    return rows
+
+
+def to_jsonl(records: Iterable[dict]) -> str:
+    return "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in records)
@@ -0,0 +1,96 @@
+"""Opções de renderização, explícitas (antes vinham dos widgets do Streamlit)."""
+from dataclasses import asdict, dataclass, fields
+
+PAGE_SIZES_PT = {"A4": (595.28, 841.89), "Letter": (612.0, 792.0)}
+# Formatos que o caminho nativo (imagem -> PDF sem HTML) sabe tratar; SVG segue pelo HTML
+RASTER_EXTS = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"]
+
+
+@dataclass(frozen=True)
+class ConvertOptions:
+    engine: str = "weasyprint"        # "weasyprint" | "xhtml2pdf"
+    preserve_layout: bool = True
+    page_size: str = "A4"             # "A4" | "Letter"
+    orientation: str = "portrait"     # "portrait" | "landscape"
+    margin_mm: int = 10
+    paginate_sheets: bool = True
+    sanitize: bool = True
+    native_images: bool = True        # imagens direto para PDF, sem motor de HTML
+    stream_excel: bool = True         # .xlsx em blocos de linhas (memória limitada)
+    excel_chunk_rows: int = 2000
+    docx_max_image_px: int = 0        # 0 = imagens do DOCX como estão; senão, lado maior reduzido a isso
+    asset_dir: str = ""               # cache/espelho local de CSS/fontes/imagens remotos (WeasyPrint)
+    offline: bool = False             # nunca acessa a rede: URLs sem cópia local falham na hora
+    split_render: bool = False        # HTML muito longo: renderiza em blocos paralelos (WeasyPrint)
+    split_workers: int = 0            # processos para os blocos (0 = um por bloco, até o nº de CPUs)
+    max_seconds: float = 0            # limites por arquivo (0 = sem limite); com algum deles, cada
+    max_cpu_seconds: float = 0        # conversão roda num processo vigiado, encerrado ao passar
+    max_memory_mb: int = 0            # do limite (watchdog.py)
+
+    @property
+    def use_weasy(self) -> bool:
+        return self.engine.lower().startswith("weasy")
+
+    @property
+    def has_limits(self) -> bool:
+        return bool(self.max_seconds or self.max_cpu_seconds or self.max_memory_mb)
+
+    def page_size_pt(self) -> tuple[float, float]:
+        # Mesma regra do HTML: preservando o layout, a página padrão é A4 retrato
+        if self.preserve_layout:
+            return PAGE_SIZES_PT["A4"]
+        w, h = PAGE_SIZES_PT.get(self.page_size, PAGE_SIZES_PT["A4"])
+        return (h, w) if self.orientation == "landscape" else (w, h)
+
+    def cache_settings(self, ext: str) -> dict:
+        # Só entram na chave as configurações que de fato mudam o PDF deste tipo de arquivo
+        ext = ext.lower()
+        if self.native_images and ext in RASTER_EXTS:
+            return {"ext": ".jpg" if ext == ".jpeg" else ext, "engine": "imagem-nativa",
+                    "page_size_pt": self.page_size_pt(), "margin_mm": int(self.margin_mm)}
+        settings = {
+            "ext": ".html" if ext == ".htm" else ext,
+            "engine": "weasyprint" if self.use_weasy else "xhtml2pdf",
+            "preserve_layout": bool(self.preserve_layout),
+            "margin_mm": int(self.margin_mm),
+        }
+        if self.use_weasy and not self.preserve_layout:
+            settings["page_size"] = self.page_size
+            settings["orientation"] = self.orientation
+        if not self.use_weasy:
+            settings["sanitize"] = bool(self.sanitize)
+        if ext in [".xls", ".xlsx"]:
+            settings["paginate_sheets"] = bool(self.paginate_sheets)
+        if ext == ".xlsx" and self.stream_excel:
+            settings["excel_chunk_rows"] = int(self.excel_chunk_rows)
+        if ext == ".docx" and self.docx_max_image_px:
+            settings["docx_max_image_px"] = int(self.docx_max_image_px)
+        if self.use_weasy and self.split_render:
+            settings["split_render"] = True  # cada bloco começa em página nova
+        if self.offline:
+            settings["offline"] = True  # recursos remotos podem ter ficado de fora
+        if self.use_weasy:
+            # CSS/fontes/imagens remotos vêm do cache de recursos: outra pasta, ou a
+            # mesma com entradas novas no índice/espelho, pode mudar o PDF
+            from .fetch import asset_version
+            settings.update(asset_version(self.asset_dir, self.offline) or {})
+        return settings
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConvertOptions":
+        # Ignora chaves desconhecidas (ex.: tarefa gravada por outra versão)
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+@dataclass(frozen=True)
+class MergeOptions:
+    dedupe: bool = True               # fontes/imagens/streams idênticos gravados uma vez só
+    recompress: bool = False          # recomprime streams (Flate nível 9) quando fica menor
+    max_image_dpi: int = 0            # 0 = não reduz; senão, reduz imagens acima desse DPI
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -0,0 +1,235 @@
+"""Conversão de vários arquivos em paralelo (pool de processos).
+
+WeasyPrint e xhtml2pdf/reportlab são CPU-bound e seguram o GIL, então o
+paralelismo precisa ser por processo. O pool é criado uma vez por processo, com
+tamanho fixo (POOL_MAX_WORKERS), e compartilhado entre sessões e reruns; cada
+chamador limita só a própria concorrência (no máximo `workers` tarefas suas no
+pool de cada vez), sem recriar o pool nem cancelar tarefas de outros. Os
+workers usam "spawn" para não herdar as threads do servidor do Streamlit e
+sobem sob demanda.
+"""
+import concurrent.futures as cf
+import contextlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import types
+import warnings
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, Optional
+
+from .convert import convert
+from .errors import ConversionWarning
+from .metrics import FileMetrics
+from .options import ConvertOptions
+
+POOL_MAX_WORKERS = max(1, int(os.environ.get("HTMLPDF_POOL_MAX_WORKERS", os.cpu_count() or 1)))
+
+_pool: Optional[cf.ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+SPOOL_MIN_BYTES = 8 * 1024 * 1024  # acima disso, o worker recebe um arquivo (mmap) em vez dos bytes
+
+
+def convert_job(name: str, source, options: ConvertOptions) -> tuple[bytes, list[str], dict]:
+    # Roda no worker: devolve o PDF, os avisos emitidos (ex.: fallback de motor) e
+    # as medições por etapa. `source` são os bytes do arquivo ou um caminho (lido
+    # já dentro do worker). Em caso de erro, as medições vão em `erro.metrics`.
+    # Num worker (pool ou vigia) a conversão é o único trabalho do processo.
+    rec = FileMetrics(name, exclusive=multiprocessing.parent_process() is not None)
+    try:
+        with rec, warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ConversionWarning)
+            pdf_bytes = convert(source, options, name=name)
+    except Exception as e:
+        e.metrics = rec.to_dict()
+        raise
+    messages = [str(w.message) for w in caught if issubclass(w.category, ConversionWarning)]
+    return pdf_bytes, list(dict.fromkeys(messages)), rec.to_dict()
+
+
+def _noop() -> None:
+    return None
+
+
+@contextlib.contextmanager
+def _plain_main_module():
+    # Sob o Streamlit, __main__ é o próprio script (com __file__) e o "spawn"
+    # reexecutaria a interface inteira em cada worker. Os workers só precisam
+    # do pacote htmlpdf, então escondemos o script enquanto eles sobem.
+    main = sys.modules.get("__main__")
+    if main is None or not getattr(main, "__file__", None):
+        yield
+        return
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def get_pool(workers: int = 0) -> cf.ProcessPoolExecutor:
+    # Pool compartilhado (POOL_MAX_WORKERS processos no máximo). `workers`: quantos
+    # processos subir já (ex.: pré-aquecimento); o resto sobe quando for usado.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = cf.ProcessPoolExecutor(max_workers=POOL_MAX_WORKERS,
+                                           mp_context=multiprocessing.get_context("spawn"))
+        pool = _pool
+    ready = [_submit(pool, _noop) for _ in range(min(workers, POOL_MAX_WORKERS))]
+    for fut in ready:
+        fut.result()
+    return pool
+
+
+def _submit(pool: cf.ProcessPoolExecutor, fn: Callable, *args) -> cf.Future:
+    # O executor sobe um processo novo dentro do submit() quando nenhum está livre
+    with _plain_main_module():
+        return pool.submit(fn, *args)
+
+
+def _discard_pool(pool: cf.ProcessPoolExecutor) -> None:
+    # Pool quebrado (um worker morreu): o próximo get_pool cria outro. As tarefas
+    # dele já falharam com BrokenProcessPool; nada de outros chamadores é cancelado
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def reset_pool() -> None:
+    # Workers novos na próxima conversão (ex.: fontes redescobertas). O pool antigo
+    # termina o que já recebeu antes de encerrar.
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def iter_bounded(calls: Iterable[tuple[object, Callable, tuple]], workers: int
+                 ) -> Iterator[tuple[object, cf.Future]]:
+    # Roda as chamadas (chave, função, argumentos) no pool compartilhado com no
+    # máximo `workers` delas em andamento e produz (chave, future) conforme terminam.
+    # Se o consumidor parar antes, só as tarefas deste chamador são canceladas.
+    pool = get_pool()
+    calls = iter(calls)
+    running: dict = {}  # future -> (chave, pool em que foi submetida)
+    try:
+        while True:
+            for key, fn, args in calls:
+                try:
+                    running[_submit(pool, fn, *args)] = (key, pool)
+                except BrokenProcessPool:
+                    _discard_pool(pool)
+                    pool = get_pool()
+                    running[_submit(pool, fn, *args)] = (key, pool)
+                if len(running) >= max(1, workers):
+                    break
+            if not running:
+                return
+            done, _ = cf.wait(running, return_when=cf.FIRST_COMPLETED)
+            for fut in done:
+                key, used = running.pop(fut)
+                if used is pool and isinstance(fut.exception(), BrokenProcessPool):
+                    # Só o pool que quebrou: várias tarefas dele falham juntas, e o
+                    # pool novo (talvez já com tarefas de outros) fica como está
+                    _discard_pool(pool)
+                    pool = get_pool()
+                yield key, fut
+    finally:
+        for fut in running:
+            fut.cancel()
+        cf.wait([f for f in running if not f.cancelled()])
+
+
+def _for_pool(items: list[tuple[str, object]], spool_dir: list) -> list[tuple[str, object]]:
+    # Os argumentos do pool são serializados (pickle): uma cópia inteira no processo
+    # principal por arquivo em andamento, e memoryview nem é serializável. Conteúdos
+    # grandes vão para um arquivo temporário, que o worker mapeia com mmap.
+    out = []
+    for i, (name, source) in enumerate(items):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            if view.nbytes >= SPOOL_MIN_BYTES:
+                if not spool_dir:
+                    spool_dir.append(tempfile.mkdtemp(prefix="htmlpdf_spool_"))
+                path = os.path.join(spool_dir[0], f"{i:06d}{os.path.splitext(name)[1]}")
+                with open(path, "wb") as f:
+                    f.write(view)
+                source = path
+            elif isinstance(source, memoryview):
+                source = view.tobytes()
+        out.append((name, source))
+    return out
+
+
+def iter_convert(items: list[tuple[str, object]], options: ConvertOptions, workers: int = 1,
+                 metrics: Optional[list] = None) -> Iterator[tuple[int, Optional[bytes], Optional[BaseException], list[str]]]:
+    # Produz (índice, pdf, erro, avisos) à medida que cada arquivo termina. Com
+    # `metrics`, acrescenta nela o registro de tempo/memória de cada arquivo.
+    def _keep(record) -> None:
+        if metrics is not None and record is not None:
+            metrics.append(record)
+
+    if options.has_limits:
+        # Cada arquivo num processo vigiado (tempo/CPU/memória), mesmo com um só
+        from .watchdog import iter_convert_limited
+        spool_dir: list = []
+        try:
+            yield from iter_convert_limited(_for_pool(items, spool_dir), options, workers, _keep)
+        finally:
+            if spool_dir:
+                shutil.rmtree(spool_dir[0], ignore_errors=True)
+        return
+
+    if workers <= 1 or len(items) <= 1:
+        for i, (name, source) in enumerate(items):
+            try:
+                pdf_bytes, warns, record = convert_job(name, source, options)
+                _keep(record)
+                yield i, pdf_bytes, None, warns
+            except Exception as e:
+                _keep(getattr(e, "metrics", None))
+                yield i, None, e, []
+        return
+
+    spool_dir: list = []
+    calls = ((i, convert_job, (name, source, options))
+             for i, (name, source) in enumerate(_for_pool(items, spool_dir)))
+    try:
+        for i, fut in iter_bounded(calls, workers):
+            try:
+                pdf_bytes, warns, record = fut.result()
+                _keep(record)
+                yield i, pdf_bytes, None, warns
+            except BrokenProcessPool as e:
+                # Um worker morreu (ex.: OOM); os arquivos seguintes vão para um pool novo
+                yield i, None, e, []
+            except Exception as e:
+                _keep(getattr(e, "metrics", None))
+                yield i, None, e, []
+    finally:
+        if spool_dir:
+            # iter_bounded só termina depois que nenhum worker lê mais os arquivos
+            shutil.rmtree(spool_dir[0], ignore_errors=True)
+
+
+def convert_many(items: list[tuple[str, object]], options: ConvertOptions,
+                 workers: int = 1) -> tuple[list[tuple[str, bytes]], list[tuple[str, BaseException]]]:
+    # Versão em lote de iter_convert: (pdfs, errors) na ordem de entrada
+    results = [None] * len(items)
+    for i, pdf_bytes, err, _ in iter_convert(items, options, workers):
+        results[i] = (pdf_bytes, err)
+    pdfs, errors = [], []
+    for (name, _), (pdf_bytes, err) in zip(items, results):
+        if err is None:
+            pdfs.append((name, pdf_bytes))
+        else:
+            errors.append((name, err))
+    return pdfs, errors
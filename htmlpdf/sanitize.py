@@ -0,0 +1,310 @@
+"""Sanitização de HTML/CSS para o xhtml2pdf (que não entende CSS moderno)."""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html import unescape
+from typing import Optional
+
+# -----------------------
+# Sanitização (para xhtml2pdf)
+# -----------------------
+UNSUPPORTED_AT_RULES = ("@media", "@supports", "@keyframes", "@-webkit-", "@-moz-", "@-ms-")
+
+def strip_unsupported_at_rules(css: str) -> str:
+    out, i = [], 0
+    while i < len(css):
+        if css[i] == "@" and any(css.startswith(x, i) for x in UNSUPPORTED_AT_RULES):
+            depth, j = 0, i
+            while j < len(css):
+                if j < len(css) and css[j] == "{":
+                    depth += 1
+                elif j < len(css) and css[j] == "}":
+                    depth -= 1
+                    if depth <= 0:
+                        j += 1
+                        break
+                j += 1
+            i = j
+            continue
+        out.append(css[i]); i += 1
+    return "".join(out)
+
+def sanitize_selectors(css: str) -> str:
+    css = re.sub(r"::[a-zA-Z0-9_-]+", "", css)
+    css = re.sub(r":[a-zA-Z-]+\([^)]*\)", "", css)
+    css = re.sub(r":[a-zA-Z-]+", "", css)
+    css = css.replace("~", " ").replace(">", " ").replace("+", " ")
+    return css
+
+def normalize_display_props(css: str) -> str:
+    patterns = [
+        r"display\s*:\s*inline-flex[^;]*;", r"display\s*:\s*inline-grid[^;]*;",
+        r"display\s*:\s*flex[^;]*;", r"display\s*:\s*grid[^;]*;", r"display\s*:\s*contents[^;]*;",
+    ]
+    for p in patterns:
+        css = re.sub(p, "display:block;", css, flags=re.IGNORECASE)
+    return css
+
+def neutralize_css_functions(css: str) -> str:
+    css = re.sub(r"var\(\s*--[^)]+\)", "", css, flags=re.IGNORECASE)
+    css = re.sub(r"calc\([^)]+\)", "1", css, flags=re.IGNORECASE)
+    return css
+
+def strip_unsupported_props(css: str) -> str:
+    props = [
+        r"position\s*:\s*fixed[^;]*;", r"position\s*:\s*absolute[^;]*;",
+        r"backdrop-filter\s*:[^;]*;", r"filter\s*:[^;]*;", r"box-shadow\s*:[^;]*;",
+        r"transform\s*:[^;]*;", r"transition\s*:[^;]*;", r"animation\s*:[^;]*;", r"@font-face\s*{[^}]*}",
+    ]
+    for p in props:
+        css = re.sub(p, "", css, flags=re.IGNORECASE)
+    return css
+
+def sanitize_css_legacy(css: str) -> str:
+    # Cadeia original de regex (mantida para comparação no benchmark)
+    css = unescape(css)
+    css = strip_unsupported_at_rules(css)
+    css = sanitize_selectors(css)
+    css = normalize_display_props(css)
+    css = strip_unsupported_props(css)
+    css = neutralize_css_functions(css)
+    return css
+
+# -----------------------
+# Sanitizador em uma passada (tokenizador)
+# -----------------------
+# Mesmas regras da cadeia acima, mas aplicadas a um fluxo de tokens: as regras de
+# seletor valem só para seletores e as de propriedade só para declarações (a cadeia
+# de regex também apagava ":valor" de declarações como "color:red" e cortava
+# "text-transform"). O resultado é guardado por hash da folha de estilo.
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\]|\\.)*"?|'(?:[^'\\]|\\.)*'?)
+  | (?P<at>@[-\w]+)
+  | (?P<open>\{)
+  | (?P<close>\})
+  | (?P<semi>;)
+  | (?P<text>[^{};"'/@]+|[/@])
+""", re.DOTALL | re.VERBOSE)
+_PSEUDO_RE = re.compile(r"::[a-zA-Z0-9_-]+|:[a-zA-Z-]+\([^)]*\)|:[a-zA-Z-]+")
+_COMBINATORS = str.maketrans({"~": " ", ">": " ", "+": " "})
+_VENDOR_RE = re.compile(r"^-[a-z]+-")
+_CSS_FUNC_RE = re.compile(r"\b(var|calc)\(", re.IGNORECASE)
+
+UNSUPPORTED_AT_PREFIXES = tuple(x.lower() for x in UNSUPPORTED_AT_RULES) + ("@font-face",)
+RULE_BLOCK_AT_RULES = ("@layer", "@container", "@document", "@scope")
+DROPPED_PROPS = frozenset(["backdrop-filter", "filter", "box-shadow", "transform", "transition", "animation"])
+BLOCK_DISPLAYS = frozenset(["flex", "grid", "inline-flex", "inline-grid", "contents"])
+
+_SANITIZED_MAX_CHARS = 32 * 1024 * 1024
+_sanitized: "OrderedDict[bytes, str]" = OrderedDict()
+_sanitized_chars = 0
+_sanitized_lock = threading.Lock()
+
+
+def _neutralize_functions(value: str) -> str:
+    # var(--x) -> "" e calc(...) -> "1", respeitando parênteses aninhados
+    if "(" not in value:
+        return value
+    out, pos = [], 0
+    for m in _CSS_FUNC_RE.finditer(value):
+        if m.start() < pos:
+            continue
+        depth, j = 1, m.end()
+        while j < len(value) and depth:
+            c = value[j]
+            if c == "(":
+                depth += 1
+            elif c == ")":
+                depth -= 1
+            j += 1
+        fn = m.group(1).lower()
+        if fn == "var" and not value[m.end():].lstrip().startswith("--"):
+            continue
+        out.append(value[pos:m.start()])
+        out.append("1" if fn == "calc" else "")
+        pos = j
+    out.append(value[pos:])
+    return "".join(out)
+
+
+def _sanitize_selector(prelude: str) -> str:
+    return _PSEUDO_RE.sub("", prelude).translate(_COMBINATORS)
+
+
+def _sanitize_declaration(decl: str) -> Optional[str]:
+    name, sep, value = decl.partition(":")
+    if not sep:
+        return decl
+    prop = name.strip().lower()
+    base = _VENDOR_RE.sub("", prop)
+    if base in DROPPED_PROPS:
+        return None
+    words = value.strip().lower().split()
+    first = words[0] if words else ""
+    if prop == "position" and first in ("fixed", "absolute"):
+        return None
+    if prop == "display" and first in BLOCK_DISPLAYS:
+        return f"{name}:block"
+    return f"{name}:{_neutralize_functions(value)}"
+
+
+def _sanitize_css_uncached(css: str) -> str:
+    out = []
+    buf = []
+    stack = ["rules"]   # "rules" (regras/seletores) | "decls" (declarações)
+    skip_depth = None   # != None enquanto pulamos uma at-rule não suportada
+
+    for m in _TOKEN_RE.finditer(css):
+        kind, tok = m.lastgroup, m.group()
+        if kind == "comment":
+            continue
+
+        if skip_depth is not None:
+            if kind == "open":
+                skip_depth += 1
+            elif kind == "close":
+                skip_depth -= 1
+                if skip_depth <= 0:
+                    skip_depth = None
+            elif kind == "semi" and skip_depth == 0:
+                skip_depth = None
+            continue
+
+        ctx = stack[-1]
+        if kind == "at" and ctx == "rules" and not "".join(buf).strip():
+            if tok.lower().startswith(UNSUPPORTED_AT_PREFIXES):
+                buf = []
+                skip_depth = 0
+                continue
+            buf.append(tok)
+        elif kind in ("text", "string", "at"):
+            buf.append(tok)
+        elif kind == "open":
+            prelude = "".join(buf)
+            buf = []
+            head = prelude.strip().lower()
+            if head.startswith("@"):
+                if head.startswith("@page"):
+                    prelude = _sanitize_selector(prelude)
+                stack.append("rules" if head.startswith(RULE_BLOCK_AT_RULES) else "decls")
+            else:
+                prelude = _sanitize_selector(prelude)
+                stack.append("decls")
+            out.append(prelude + "{")
+        elif kind == "semi":
+            text = "".join(buf)
+            buf = []
+            if ctx == "decls":
+                decl = _sanitize_declaration(text)
+                if decl is not None:
+                    out.append(decl + ";")
+            else:
+                out.append(text + ";")
+        else:  # close
+            text = "".join(buf)
+            buf = []
+            if ctx == "decls":
+                decl = _sanitize_declaration(text)
+                if decl is not None:
+                    out.append(decl)
+            else:
+                out.append(text)
+            if len(stack) > 1:
+                stack.pop()
+            out.append("}")
+
+    if buf and skip_depth is None:
+        out.append("".join(buf))
+    return "".join(out)
+
+
+def sanitize_css(css: str) -> str:
+    global _sanitized_chars
+    css = unescape(css)
+    key = hashlib.blake2b(css.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    with _sanitized_lock:
+        hit = _sanitized.get(key)
+        if hit is not None:
+            _sanitized.move_to_end(key)
+            return hit
+
+    result = _sanitize_css_uncached(css)
+
+    with _sanitized_lock:
+        if key not in _sanitized and len(result) <= _SANITIZED_MAX_CHARS:
+            _sanitized[key] = result
+            _sanitized_chars += len(result)
+            while _sanitized_chars > _SANITIZED_MAX_CHARS:
+                _, old = _sanitized.popitem(last=False)
+                _sanitized_chars -= len(old)
+    return result
+
+INLINE_ALLOWED_PROPS = frozenset(["color", "background-color", "font-size", "font-family",
+                                  "text-align", "width", "height"])
+INLINE_ALLOWED_PREFIXES = ("border", "padding", "margin")
+_STYLE_BLOCK_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+_INLINE_STYLE_RE = re.compile(r'\sstyle="(.*?)"', re.IGNORECASE | re.DOTALL)
+
+
+def _clean_inline_style(m) -> str:
+    allowed = []
+    for decl in m.group(1).split(";"):
+        d = decl.strip()
+        if not d:
+            continue
+        prop = d.partition(":")[0].strip().lower()
+        if prop in INLINE_ALLOWED_PROPS or prop.startswith(INLINE_ALLOWED_PREFIXES):
+            allowed.append(_neutralize_functions(d))
+    return ' style="' + "; ".join(allowed) + '"'
+
+
+def sanitize_html_for_xhtml2pdf(html: str, page_css: str) -> str:
+    html = unescape(html)
+    page_block = f"<style>{page_css}</style>"
+    lower = html.lower()
+    if "</head>" in lower:
+        idx = lower.rfind("</head>")
+        html = html[:idx] + page_block + html[idx:]
+    else:
+        html = f"<html><head><meta charset='utf-8'>{page_block}</head><body>{html}</body></html>"
+
+    html = _STYLE_BLOCK_RE.sub(lambda m: "<style>" + sanitize_css(m.group(1)) + "</style>", html)
+    html = _INLINE_STYLE_RE.sub(_clean_inline_style, html)
+    return html
+
+def _inject_page_css(html_str: str, page_css: str) -> str:
+    lower = html_str.lower()
+    block = f"<style>{page_css}</style>"
+    if "</head>" in lower:
+        idx = lower.rfind("</head>")
+        return html_str[:idx] + block + html_str[idx:]
+    return f"<html><head><meta charset='utf-8'>{block}</head><body>{html_str}</body></html>"
+
+# -----------------------
+# Helpers extras para fallback forte (xhtml2pdf)
+# -----------------------
+_FONT_FACE_RE = re.compile(r"@font-face\s*{[^}]*}", re.IGNORECASE | re.DOTALL)
+_FONT_LINK_RE = re.compile(r'<link[^>]+href="[^"]*fonts[^"]*"[^>]*>', re.IGNORECASE)
+_WOFF_URL_RE = re.compile(r'url\([^)]+\.woff2?\)', re.IGNORECASE)
+
+def _strip_external_fonts(html: str) -> str:
+    html = _FONT_FACE_RE.sub("", html)
+    html = _FONT_LINK_RE.sub("", html)
+    html = _WOFF_URL_RE.sub("", html)
+    return html
+
+def _very_simple_html(html: str) -> str:
+    body = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.IGNORECASE|re.DOTALL)
+    body = re.sub(r'\sstyle="[^"]*"', "", body, flags=re.IGNORECASE)
+    return f"""<html><head><meta charset="utf-8">
+    <style>
+      body {{ font-family: Arial, sans-serif; font-size: 12pt; margin: 10mm; }}
+      img {{ max-width: 100%; height: auto; display: block; margin: 6px 0; }}
+      table {{ width:100%; border-collapse: collapse; table-layout: fixed; }}
+      th, td {{ border: 1px solid #999; padding: 6px; word-wrap: break-word; }}
+      h1,h2,h3 {{ margin: 8px 0; }}
+      pre,code {{ white-space: pre-wrap; word-break: break-word; }}
+    </style>
+    </head><body>{body}</body></html>"""
@@ -0,0 +1,178 @@
+"""Leitura dos arquivos enviados e conversão para HTML (HTML/DOCX/Imagens/Excel)."""
+import base64
+import io
+from html import escape
+from pathlib import Path
+from typing import Optional
+
+from .buffers import BufferFile, as_file, decode_text, file_buffer
+from .cache import content_digest
+from .errors import MissingDependencyError
+from .workspace import Workspace, get_workspace
+
+# -----------------------
+# Leitura do HTML + base_url (para preservar caminhos relativos)
+# -----------------------
+def read_html_and_base(uploaded_file, workspace: Optional[Workspace] = None):
+    # Hash e cópia em disco saem do buffer do upload; o texto é decodificado uma vez, no fim
+    raw = file_buffer(uploaded_file)
+
+    # Pasta por conteúdo na área de trabalho gerenciada (reaproveitada entre reruns)
+    workspace = workspace or get_workspace()
+    fname = Path(uploaded_file.name).name
+    base_url = str(workspace.entry(content_digest(raw), {fname: raw}))
+    return decode_text(raw), base_url
+
+# -----------------------
+# DOCX com imagens em arquivos (uma cópia por conteúdo)
+# -----------------------
+DOCX_HTML = "documento{suffix}.html"
+
+
+def _downscale_image(data: bytes, max_px: int) -> Optional[tuple[bytes, str]]:
+    # -> (bytes, extensão) reduzidos para caber em max_px; None se não precisar/der
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        im = Image.open(io.BytesIO(data))
+        if max(im.size) <= max_px:
+            return None
+        im.thumbnail((max_px, max_px))
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None  # EMF/WMF e afins seguem como estão
+    out = io.BytesIO()
+    if im.mode in ("RGBA", "LA", "P") or "transparency" in im.info:
+        im.save(out, "PNG", optimize=True)
+        return out.getvalue(), ".png"
+    if im.mode not in ("RGB", "L"):
+        im = im.convert("RGB")
+    im.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue(), ".jpg"
+
+
+def _docx_image_writer(workspace: Workspace, target: Path, max_px: int = 0):
+    # convert_image do mammoth: grava cada imagem distinta uma vez em `target` e
+    # devolve o nome do arquivo; repetições (ex.: logo do cabeçalho) reusam o mesmo
+    import mimetypes
+
+    names: dict = {}  # hash do conteúdo original -> nome do arquivo
+
+    def convert_image(image):
+        with image.open() as f:
+            data = f.read()
+        digest = content_digest(data)
+        name = names.get(digest)
+        if name is None:
+            ext = mimetypes.guess_extension(image.content_type or "") or ".bin"
+            reduced = _downscale_image(data, max_px) if max_px else None
+            if reduced is not None:
+                data, ext = reduced
+            name = f"img-{digest[:32]}{f'-{max_px}px' if reduced else ''}{ext}"
+            if not (target / name).exists():
+                workspace.write_files(target, {name: data})
+            names[digest] = name
+        return {"src": name}
+
+    return convert_image
+
+
+def read_docx_html(uploaded_file, workspace: Optional[Workspace] = None,
+                   max_image_px: int = 0) -> tuple[str, str]:
+    # -> (html, pasta do documento). As imagens ficam em arquivos ao lado do HTML, em vez
+    # de um data: URI em base64 por ocorrência; o HTML gerado é reaproveitado entre reruns.
+    try:
+        import mammoth
+    except Exception:
+        raise MissingDependencyError("Pacote 'mammoth' não está instalado. Adicione 'mammoth' ao requirements.txt.",
+                                     hint="python -m pip install mammoth")
+
+    raw = file_buffer(uploaded_file)
+    workspace = workspace or get_workspace()
+    html_name = DOCX_HTML.format(suffix=f"-{max_image_px}px" if max_image_px else "")
+
+    def render(target: Path) -> None:
+        result = mammoth.convert_to_html(
+            BufferFile(raw),
+            convert_image=mammoth.images.img_element(_docx_image_writer(workspace, target, max_image_px))
+        )
+        html = f"<html><head><meta charset='utf-8'></head><body>{result.value}</body></html>"
+        workspace.write_files(target, {html_name: html.encode("utf-8")})  # por último: marca "pronto"
+
+    root = workspace.entry(content_digest(raw), extract=render)
+    if not (root / html_name).is_file():
+        render(root)  # pasta já existia (outro tamanho de imagem)
+    return (root / html_name).read_text("utf-8"), str(root)
+
+
+def image_file_to_html(uploaded_file) -> str:
+    from PIL import Image
+
+    raw = file_buffer(uploaded_file)
+    try:
+        im = Image.open(BufferFile(raw))
+        if im.format in ("JPEG", "PNG") and im.mode in ("RGB", "L"):
+            # Já num formato que os motores leem: vai como está, sem decodificar os pixels
+            mime = f"image/{im.format.lower()}"
+        else:
+            if im.mode in ("P", "LA", "RGBA", "CMYK"):
+                im = im.convert("RGB")
+            buf = io.BytesIO()
+            im.save(buf, format="PNG")
+            raw = buf.getbuffer()
+            mime = "image/png"
+    except Exception:
+        ext = Path(uploaded_file.name).suffix.lower().lstrip(".")
+        mime = f"image/{'jpeg' if ext in ['jpg','jpeg'] else ext}"
+    b64 = base64.b64encode(raw).decode("ascii")
+    data_uri = f"data:{mime};base64,{b64}"
+    html = f"""
+    <html><head><meta charset="utf-8">
+      <style>
+        html,body{{margin:0;padding:0}}
+        .wrap{{padding:0; margin:0 auto;}}
+        img{{display:block; max-width:100%; height:auto; margin:0 auto;}}
+      </style>
+    </head>
+    <body><div class="wrap"><img src="{data_uri}"/></div></body></html>
+    """
+    return html
+
+# -----------------------
+# Excel -> HTML
+# -----------------------
+def excel_to_html(uploaded_file, break_between=True) -> str:
+    import pandas as pd
+
+    name = uploaded_file.name.lower()
+    bio = as_file(uploaded_file)
+
+    xls_engine = None
+    if name.endswith(".xlsx"):
+        xls_engine = "openpyxl"
+        try:
+            import openpyxl  # noqa
+        except Exception:
+            raise MissingDependencyError("Falta 'openpyxl' para ler .xlsx.",
+                                         hint="python -m pip install openpyxl")
+    elif name.endswith(".xls"):
+        xls_engine = "xlrd"
+        try:
+            import xlrd  # noqa
+        except Exception:
+            raise MissingDependencyError("Falta 'xlrd' (>=2.0) para ler .xls.",
+                                         hint="python -m pip install 'xlrd>=2.0'")
+
+    xls = pd.ExcelFile(bio, engine=xls_engine) if xls_engine else pd.ExcelFile(bio)
+
+    from .excel import _html_doc, dataframe_table_html
+
+    parts = []
+    for i, sheet in enumerate(xls.sheet_names):
+        df = xls.parse(sheet)
+        br = 'style="page-break-before: always;"' if (break_between and i > 0) else ""
+        parts.append(f'<h2 {br}>Planilha: {escape(str(sheet))}</h2>' + dataframe_table_html(df))
+
+    return _html_doc("".join(parts))
+
+def html_file_to_str(uploaded_file) -> str:
+    return decode_text(file_buffer(uploaded_file))
@@ -0,0 +1,269 @@
+"""Renderização em blocos (opcional) para HTMLs muito longos, só no WeasyPrint.
+
+O WeasyPrint monta o layout do documento inteiro em um único processo. Aqui o
+corpo do HTML é cortado em blocos em pontos seguros, na ordem de preferência:
+
+  1. quebras explícitas (`page-break-before`/`break-before`, como as que o
+     `excel_to_html` põe entre as planilhas);
+  2. filhos diretos do <body> (seções, tabelas, parágrafos...);
+  3. grupos de linhas de uma tabela grande (o bloco repete a abertura da
+     tabela e o <thead>).
+
+Cada bloco leva o mesmo <head> (CSS, @page: mesmo tamanho de página e margens)
+e uma cópia dos elementos de cabeçalho/rodapé corrente (<header>/<footer>,
+`position: fixed` ou `position: running(...)`). Os blocos são renderizados em
+paralelo no pool de processos e os PDFs são juntados na ordem.
+
+Limites: cada bloco começa em página nova; links internos entre blocos deixam
+de funcionar; documentos que usam `counter(page)`/`counter(pages)` não são
+cortados (a numeração recomeçaria em cada bloco).
+"""
+import io
+import multiprocessing
+import re
+import warnings
+from typing import Optional
+
+from .errors import ConversionWarning
+from .metrics import stage
+from .options import ConvertOptions
+
+SPLIT_MIN_CHARS = 400_000     # abaixo disso, renderiza inteiro
+SPLIT_CHUNK_CHARS = 200_000   # tamanho alvo de cada bloco (independe do nº de workers)
+
+# Tags que sempre fecham (controlam a profundidade); <p>, <li>, <tr>, <td>... podem
+# ficar abertas no HTML, por isso só marcam início de unidade.
+_CONTAINERS = frozenset("""div section article main aside nav header footer table thead tbody tfoot
+    ul ol dl figure form blockquote fieldset details center""".split())
+_BLOCKS = _CONTAINERS | frozenset("p h1 h2 h3 h4 h5 h6 pre hr img svg".split())
+_HEADINGS = frozenset("h1 h2 h3 h4 h5 h6".split())
+_RUNNING_TAGS = frozenset(("header", "footer"))
+
+_TOKEN_RE = re.compile(
+    r"<!--.*?-->|<(script|style|textarea|title)\b[^>]*>.*?</\1\s*>|<(/?)([a-zA-Z][\w:-]*)([^>]*)>",
+    re.S | re.I)
+_BODY_OPEN_RE = re.compile(r"<body\b[^>]*>", re.I)
+_BODY_CLOSE_RE = re.compile(r"</body\s*>", re.I)
+_BREAK_RE = re.compile(r"(?:page-)?break-before\s*:\s*(?:always|page|left|right)", re.I)
+_COUNTER_RE = re.compile(r"counter\(\s*pages?\s*\)|target-counter", re.I)
+_STYLE_ATTR_RE = re.compile(r"""\bstyle\s*=\s*("[^"]*"|'[^']*')""", re.I)
+_POSITION_RE = re.compile(r"position\s*:\s*(?:fixed|running\()", re.I)
+_CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_SIMPLE_SELECTOR_RE = re.compile(r"^\s*([a-zA-Z][\w-]*)?(?:([#.])([\w-]+))?\s*$")
+
+
+# -----------------------
+# Leitura do corpo
+# -----------------------
+def _attr_style(attrs: str) -> str:
+    m = _STYLE_ATTR_RE.search(attrs)
+    return m.group(1)[1:-1] if m else ""
+
+
+def _running_selectors(head: str) -> list[tuple]:
+    # Seletores simples (tag, #id, .classe) com position: fixed/running no CSS do <head>
+    found = []
+    for m in _CSS_RULE_RE.finditer(head):
+        if not _POSITION_RE.search(m.group(2)):
+            continue
+        for sel in m.group(1).split(","):
+            sm = _SIMPLE_SELECTOR_RE.match(sel.split("}")[-1])
+            if sm and (sm.group(1) or sm.group(3)):
+                found.append((sm.group(1) and sm.group(1).lower(), sm.group(2), sm.group(3)))
+    return found
+
+
+def _matches(tag: str, attrs: str, selectors: list[tuple]) -> bool:
+    for sel_tag, kind, name in selectors:
+        if sel_tag and sel_tag != tag:
+            continue
+        if kind == "#" and not re.search(r"""\bid\s*=\s*["']?%s["'\s>]""" % re.escape(name), attrs + ">", re.I):
+            continue
+        if kind == "." and not re.search(r"""\bclass\s*=\s*["'][^"']*\b%s\b""" % re.escape(name), attrs, re.I):
+            continue
+        return True
+    return False
+
+
+def _units(html: str, start: int, end: int, selectors: list[tuple]) -> Optional[list[dict]]:
+    # Filhos diretos do corpo: [{ini, fim, tag, quebra, corrente}]. None se a
+    # estrutura não fecha (aí não é seguro cortar).
+    units, stack = [], []
+    for m in _TOKEN_RE.finditer(html, start, end):
+        closing, tag = m.group(2), (m.group(3) or "").lower()
+        if not tag:
+            continue  # comentário ou script/style: fica dentro da unidade atual
+        if closing:
+            if tag in _CONTAINERS and tag in stack:
+                while stack.pop() != tag:
+                    pass
+                if not stack and units:
+                    units[-1]["fim"] = m.end()
+            continue
+        if stack:
+            if tag in _CONTAINERS and not m.group(4).rstrip().endswith("/"):
+                stack.append(tag)
+            continue
+        if tag in _BLOCKS:
+            attrs = m.group(4)
+            style = _attr_style(attrs)
+            units.append({"ini": m.start(), "fim": m.end(), "tag": tag, "quebra": bool(_BREAK_RE.search(style)),
+                          "corrente": tag in _RUNNING_TAGS or bool(_POSITION_RE.search(style))
+                          or _matches(tag, attrs, selectors)})
+            if tag in _CONTAINERS and not attrs.rstrip().endswith("/"):
+                stack.append(tag)
+    if stack or not units:
+        return None
+    # Texto solto entre unidades vai junto com a unidade anterior (o começo, com a primeira)
+    units[0]["ini"] = start
+    for prev, nxt in zip(units, units[1:]):
+        prev["fim"] = nxt["ini"]
+    units[-1]["fim"] = end
+    return units
+
+
+def _table_parts(html: str, unit: dict, target: int) -> list[str]:
+    # Corta uma <table> grande em grupos de linhas; cada parte repete a abertura
+    # da tabela, o <caption>/<colgroup>/<thead> e fecha a tabela no fim.
+    text = html[unit["ini"]:unit["fim"]]
+    depth, rows, head_end, tbody_open, table_start, table_close = 0, [], None, "", None, None
+    for m in _TOKEN_RE.finditer(text):
+        closing, tag = m.group(2), (m.group(3) or "").lower()
+        if tag == "table":
+            depth += -1 if closing else 1
+            if table_start is None:
+                table_start = m.start()
+            if closing and depth == 0:
+                table_close = m.start()
+                break
+            continue
+        if depth != 1:
+            continue
+        if tag == "tbody" and not closing and head_end is None:
+            head_end, tbody_open = m.start(), m.group(0)
+        elif tag == "tr" and not closing:
+            if head_end is None:
+                head_end = m.start()
+            rows.append(m.start())
+        elif tag == "thead" and closing:
+            head_end = None  # linhas do <thead> não são pontos de corte
+            rows.clear()
+    if table_close is None or head_end is None or len(rows) < 2:
+        return [text]
+    body_start = head_end + len(tbody_open) if tbody_open else head_end
+    rows = [r for r in rows if r >= body_start]
+    if len(rows) < 2:
+        return [text]
+    opener = text[table_start:body_start]  # <table ...>, <caption>, <thead>... e o <tbody> (se houver)
+    closer = "</tbody></table>" if tbody_open else "</table>"
+    parts, cut = [], body_start
+    for r in rows[1:]:
+        if r - cut >= target:
+            parts.append(text[cut:r])
+            cut = r
+    last = text[cut:table_close]
+    if tbody_open:
+        last = re.sub(r"</tbody\s*>\s*$", "", last, flags=re.I)
+    if not parts:
+        return [text]
+    # A última parte fecha com o resto original da unidade ("</table>" e o que vier depois)
+    return ([text[:table_start] + opener + parts[0] + closer]
+            + [opener + p + closer for p in parts[1:]]
+            + [opener + last + ("</tbody>" if tbody_open else "") + text[table_close:]])
+
+
+# -----------------------
+# Blocos
+# -----------------------
+def split_html(html: str, chunk_chars: int = SPLIT_CHUNK_CHARS) -> Optional[list[str]]:
+    # -> lista de documentos HTML completos, ou None quando não dá para cortar com segurança
+    if _COUNTER_RE.search(html):
+        return None
+    body = _BODY_OPEN_RE.search(html)
+    close = _BODY_CLOSE_RE.search(html, body.end()) if body else None
+    if body is None or close is None:
+        return None
+    head, tail = html[:body.end()], html[close.start():]
+    units = _units(html, body.end(), close.start(), _running_selectors(html[:body.start()]))
+    if units is None:
+        return None
+
+    running = "".join(html[u["ini"]:u["fim"]] for u in units if u["corrente"])
+    pieces = []  # (texto, começa com quebra explícita, é título)
+    for u in units:
+        if u["corrente"]:
+            continue
+        if u["tag"] == "table" and u["fim"] - u["ini"] > chunk_chars:
+            parts = _table_parts(html, u, chunk_chars)
+            pieces += [(p, u["quebra"] and i == 0, False) for i, p in enumerate(parts)]
+        else:
+            pieces.append((html[u["ini"]:u["fim"]], u["quebra"], u["tag"] in _HEADINGS))
+
+    chunks, cur, size, after_heading = [], [], 0, False
+    for text, brk, heading in pieces:
+        # Na quebra explícita o corte é "de graça" (a página já mudaria ali);
+        # um título nunca fica sozinho no fim de um bloco
+        if cur and not after_heading and (size >= chunk_chars or (brk and size >= chunk_chars * 0.3)):
+            chunks.append(cur)
+            cur, size = [], 0
+        cur.append(text)
+        size += len(text)
+        after_heading = heading
+    if cur:
+        chunks.append(cur)
+    if len(chunks) < 2:
+        return None
+    return [head + running + "".join(c) + tail for c in chunks]
+
+
+def _render_chunk(html: str, base_url: str, options: ConvertOptions,
+                  local_root: Optional[str]) -> tuple[bytes, list[str], list[str], dict]:
+    # Roda no worker: -> (pdf, avisos, URLs remotas que faltaram, contadores do cache de recursos)
+    from .engines import build_pdf_weasy, weasy_url_fetcher
+    fetcher = weasy_url_fetcher(base_url, options, local_root)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ConversionWarning)
+        pdf_bytes = build_pdf_weasy(html, base_url, options, fetcher)
+    messages = [str(w.message) for w in caught if issubclass(w.category, ConversionWarning)]
+    return pdf_bytes, messages, list(getattr(fetcher, "missing", [])), getattr(fetcher, "counts", dict)()
+
+
+def render_split(html: str, base_url: str, options: ConvertOptions, local_root: Optional[str] = None,
+                 workers: int = 0) -> Optional[tuple[bytes, list[str], dict]]:
+    # -> (pdf, URLs remotas que faltaram, contadores do cache de recursos), ou None quando o documento deve ser
+    # renderizado inteiro (curto, sem pontos de corte, um processo só, ou já dentro
+    # de um worker: aí os arquivos já estão em paralelo entre si).
+    workers = workers or options.split_workers or multiprocessing.cpu_count() or 1
+    if len(html) < SPLIT_MIN_CHARS or workers <= 1 or multiprocessing.parent_process() is not None:
+        return None
+    with stage("corte_em_blocos") as row:
+        chunks = split_html(html)
+        if row is not None:
+            row["blocos"] = len(chunks) if chunks else 1
+    if not chunks:
+        warnings.warn("Renderização em blocos: o documento não tem pontos de corte seguros "
+                      "(ou usa numeração de páginas); renderizado inteiro.", ConversionWarning)
+        return None
+
+    from .pool import iter_bounded
+    with stage("weasyprint_em_blocos", blocos=len(chunks), workers=workers):
+        results = [None] * len(chunks)
+        calls = ((n, _render_chunk, (c, base_url, options, local_root)) for n, c in enumerate(chunks))
+        for n, fut in iter_bounded(calls, workers):
+            results[n] = fut.result()
+
+    missing, seen, counts = [], set(), {}
+    for _, messages, urls, chunk_counts in results:
+        for key, n in chunk_counts.items():
+            counts[key] = counts.get(key, 0) + n
+        for msg in messages:
+            if msg not in seen:
+                seen.add(msg)
+                warnings.warn(msg, ConversionWarning)
+        missing += urls
+
+    from .merge import merge_pdfs_to_file
+    with stage("juncao_blocos"):
+        out = io.BytesIO()
+        merge_pdfs_to_file([r[0] for r in results], out)
+    return out.getvalue(), missing, counts
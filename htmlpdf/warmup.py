@@ -0,0 +1,190 @@
+"""Pré-aquecimento opcional do motor e perfil de inicialização.
+
+O primeiro PDF de cada processo paga a importação do motor (WeasyPrint ou
+xhtml2pdf/reportlab), a descoberta de fontes e a preparação do sanitizador.
+`warm_up(opções)` faz isso com um documento mínimo, antes do primeiro upload;
+`start_warmup` roda em segundo plano (numa thread e, com vários processos, em
+cada worker do pool). Os tempos de cada passo ficam no dict devolvido.
+
+`python -m htmlpdf.warmup` mede, em processos novos, a importação de cada
+biblioteca pesada e a primeira conversão com e sem pré-aquecimento.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from typing import Optional
+
+from .options import ConvertOptions
+
+WARMUP_HTML = ("<html><head><meta charset='utf-8'><style>body { font-family: sans-serif; }</style></head>"
+               "<body><h1>Aquecimento</h1><p>Ação, coração — 123.</p>"
+               "<table><tr><th>a</th><td>1</td></tr></table></body></html>")
+HEAVY_MODULES = ("streamlit", "pandas", "numpy", "PIL.Image", "pypdf", "openpyxl", "mammoth", "lxml.etree",
+                 "reportlab.pdfgen.canvas", "xhtml2pdf.pisa", "weasyprint", "htmlpdf")
+
+
+def warm_up(options: ConvertOptions) -> dict:
+    # Importa o motor, monta fontes/CSS e gera um PDF mínimo. Cada passo é medido
+    # separadamente; uma falha (ex.: WeasyPrint sem Pango) não interrompe os outros.
+    from .engines import _import_weasy, convert_html_to_pdf, get_weasy_context
+    from .sanitize import sanitize_html_for_xhtml2pdf
+
+    steps, errors = {}, {}
+
+    def _step(name, fn):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            errors[name] = f"{e.__class__.__name__}: {e}"
+        finally:
+            steps[name] = round(time.perf_counter() - t0, 4)
+
+    t0 = time.perf_counter()
+    if options.use_weasy:
+        _step("importacao_weasyprint", _import_weasy)
+        _step("fontes_e_css", lambda: get_weasy_context(options))
+    else:
+        _step("importacao_xhtml2pdf", lambda: __import__("xhtml2pdf.pisa"))
+        if options.sanitize:
+            _step("sanitizador", lambda: sanitize_html_for_xhtml2pdf(WARMUP_HTML, "@page { margin: 10mm; }"))
+    _step("pypdf", lambda: __import__("pypdf"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # ex.: fallback de motor; aparece de novo na conversão real
+        _step("primeiro_pdf", lambda: convert_html_to_pdf(WARMUP_HTML, ".", options))
+    return {"motor": options.engine, "pid": os.getpid(), "etapas": steps, "erros": errors,
+            "total_s": round(time.perf_counter() - t0, 4)}
+
+
+def warm_up_pool(options: ConvertOptions, workers: int) -> dict:
+    # Sobe `workers` processos do pool compartilhado e aquece cada um (uma tarefa
+    # por worker; os que já terminaram podem pegar outra, então a cobertura é a
+    # melhor possível). O tamanho do pool não muda.
+    from .pool import get_pool, iter_bounded
+    t0 = time.perf_counter()
+    get_pool(workers)
+    start_s = time.perf_counter() - t0
+    results = [fut.result() for _, fut in iter_bounded(((n, warm_up, (options,)) for n in range(workers)), workers)]
+    return {"subida_do_pool_s": round(start_s, 4), "workers": results,
+            "workers_aquecidos": len({r["pid"] for r in results}),
+            "total_s": round(time.perf_counter() - t0, 4)}
+
+
+def start_warmup(options: ConvertOptions, workers: int = 1) -> dict:
+    # Dispara em segundo plano e devolve na hora um dict que a thread preenche:
+    # {"estado": "rodando" | "pronto" | "falhou", "processo": {...}, "pool": {...}}
+    state = {"estado": "rodando", "inicio": time.time()}
+
+    def _run():
+        try:
+            state["processo"] = warm_up(options)
+            if workers > 1:
+                state["pool"] = warm_up_pool(options, workers)
+            state["estado"] = "pronto"
+        except Exception as e:
+            state["estado"], state["erro"] = "falhou", f"{e.__class__.__name__}: {e}"
+        state["total_s"] = round(time.time() - state["inicio"], 3)
+
+    threading.Thread(target=_run, name="htmlpdf-warmup", daemon=True).start()
+    return state
+
+
+def summary(state: dict) -> str:
+    # Uma linha para a interface
+    if state.get("estado") != "pronto":
+        return f"pré-aquecimento: {state.get('estado', '?')}" + (f" ({state['erro']})" if state.get("erro") else "")
+    proc = state["processo"]
+    parts = [f"{k} {v * 1000:.0f} ms" for k, v in proc["etapas"].items()]
+    text = f"pré-aquecido em {state['total_s']:.1f} s ({', '.join(parts)})"
+    if "pool" in state:
+        text += f"; {state['pool']['workers_aquecidos']} worker(s) em {state['pool']['total_s']:.1f} s"
+    if proc["erros"]:
+        text += "; falhas: " + ", ".join(proc["erros"])
+    return text
+
+
+# -----------------------
+# Perfil de inicialização (processos novos)
+# -----------------------
+_FIRST_CONVERSION = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+t0 = time.perf_counter()
+from htmlpdf.options import ConvertOptions
+from htmlpdf.engines import convert_html_to_pdf
+from htmlpdf.warmup import WARMUP_HTML, warm_up
+opts = ConvertOptions(engine=sys.argv[1])
+out = {"importacao_htmlpdf_s": time.perf_counter() - t0}
+if sys.argv[2] == "1":
+    out["aquecimento"] = warm_up(opts)
+doc = WARMUP_HTML.replace("Aquecimento", "Documento")
+for label in ("primeira_conversao_s", "segunda_conversao_s"):
+    t = time.perf_counter()
+    convert_html_to_pdf(doc, ".", opts)
+    out[label] = time.perf_counter() - t
+print(json.dumps(out))
+"""
+
+
+def _run_fresh(code: str, *args: str) -> Optional[dict]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.environ.get("PYTHONPATH", "")]))
+    proc = subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True, env=env)
+    lines = proc.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1]) if proc.returncode == 0 and lines else None
+    except ValueError:
+        return None
+
+
+def import_profile(modules=HEAVY_MODULES) -> dict:
+    # Tempo de importação de cada módulo, cada um num processo novo (None = não instalado/falhou)
+    code = ("import json, sys, time\nt = time.perf_counter()\nimport importlib\n"
+            "importlib.import_module(sys.argv[1])\nprint(json.dumps(time.perf_counter() - t))")
+    out = {}
+    for mod in modules:
+        res = _run_fresh(code, mod)
+        out[mod] = round(res, 4) if isinstance(res, float) else None
+    return out
+
+
+def first_conversion_profile(engine: str) -> dict:
+    return {"sem_aquecimento": _run_fresh(_FIRST_CONVERSION, engine, "0"),
+            "com_aquecimento": _run_fresh(_FIRST_CONVERSION, engine, "1")}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="htmlpdf.warmup",
+                                 description="Perfil de inicialização: importações e primeira conversão.")
+    ap.add_argument("--engine", choices=["weasyprint", "xhtml2pdf"], default="xhtml2pdf")
+    ap.add_argument("--json", metavar="ARQUIVO", help="grava o resultado em JSON")
+    args = ap.parse_args(argv)
+
+    imports = import_profile()
+    print("importação (processo novo):")
+    for mod, secs in imports.items():
+        print(f"  {mod:<24} " + (f"{secs * 1000:>8.0f} ms" if secs is not None else "     —  (indisponível)"))
+    first = first_conversion_profile(args.engine)
+    print(f"primeira conversão ({args.engine}):")
+    for label, res in first.items():
+        if res is None:
+            print(f"  {label:<16} falhou")
+            continue
+        line = (f"  {label:<16} 1ª {res['primeira_conversao_s'] * 1000:>7.0f} ms   "
+                f"2ª {res['segunda_conversao_s'] * 1000:>7.0f} ms")
+        if "aquecimento" in res:
+            line += f"   (aquecimento {res['aquecimento']['total_s'] * 1000:.0f} ms)"
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"importacao_s": imports, "primeira_conversao": first}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
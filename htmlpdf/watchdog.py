@@ -0,0 +1,286 @@
+"""Limites por conversão (tempo de relógio, tempo de CPU e memória) com um vigia.
+
+Com algum limite nas opções (`max_seconds`, `max_cpu_seconds`, `max_memory_mb`),
+cada arquivo é convertido num processo próprio, acompanhado pelo processo
+principal a cada WATCH_INTERVAL_S. Ao passar de um limite, o processo é encerrado
+(SIGTERM e, se não sair em KILL_GRACE_S, SIGKILL) e o arquivo volta como
+`ResourceLimitError` com o motivo; os demais arquivos do lote seguem. Diferente do
+pool de `pool.py`, matar um desses processos não derruba as conversões vizinhas.
+
+Os processos são reaproveitados entre arquivos (e entre lotes) enquanto se
+comportam, para não pagar a importação do motor a cada arquivo; o tempo e a CPU
+contam a partir do início de cada arquivo. CPU e memória vêm de /proc (Linux) ou
+do psutil, se instalado; sem nenhum dos dois, vale o tempo de relógio e, em
+POSIX, o limite de CPU aplicado pelo próprio worker (RLIMIT_CPU).
+"""
+import collections
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from .errors import ConversionError, ResourceLimitError
+from .options import ConvertOptions
+
+WATCH_INTERVAL_S = 0.2
+KILL_GRACE_S = 2.0
+
+_sysconf = getattr(os, "sysconf", None)
+_CLK_TCK = _sysconf("SC_CLK_TCK") if _sysconf else 100
+_PAGE_MB = (_sysconf("SC_PAGE_SIZE") if _sysconf else 4096) / (1024 * 1024)
+
+IDLE_MAX = os.cpu_count() or 1
+
+_idle: list = []  # workers livres, reaproveitados entre lotes (até IDLE_MAX)
+_idle_lock = threading.Lock()
+
+
+# -----------------------
+# Dentro do worker
+# -----------------------
+def _arm_cpu_limit(seconds: float) -> None:
+    # Reforço para quando o vigia não consegue medir a CPU (ex.: macOS sem psutil).
+    # RLIMIT_CPU é acumulado no processo: o limite vai para o uso atual + o desta
+    # conversão, com folga para o vigia chegar antes (com o motivo certo).
+    try:
+        import resource
+    except ImportError:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    target = hard
+    if seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        target = int(usage.ru_utime + usage.ru_stime + seconds) + 2
+        if hard != resource.RLIM_INFINITY:
+            target = min(target, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (target, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker_main(conn) -> None:
+    from .pool import convert_job
+    conn.send(("pronto", None))  # o relógio do primeiro arquivo começa aqui, sem a subida do processo
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        name, source, options = task
+        _arm_cpu_limit(options.max_cpu_seconds)
+        try:
+            result = ("ok", convert_job(name, source, options))
+        except Exception as e:
+            result = ("erro", e)
+        try:
+            conn.send(result)
+        except Exception:
+            # Exceção que não se serializa: vai só a mensagem
+            err = result[1] if result[0] == "erro" else None
+            conn.send(("erro", ConversionError(f"{err.__class__.__name__}: {err}" if err is not None
+                                               else "O resultado da conversão não pôde ser enviado.")))
+
+
+# -----------------------
+# No processo principal
+# -----------------------
+def process_usage(pid: int) -> tuple[Optional[float], Optional[float]]:
+    # (CPU em segundos, RSS em MB) de outro processo; None quando não dá para medir
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return (int(stat[11]) + int(stat[12])) / _CLK_TCK, pages * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        times = proc.cpu_times()
+        return times.user + times.system, proc.memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None, None
+
+
+def describe_limits(options: ConvertOptions) -> str:
+    parts = []
+    if options.max_seconds:
+        parts.append(f"tempo {options.max_seconds:g} s")
+    if options.max_cpu_seconds:
+        parts.append(f"CPU {options.max_cpu_seconds:g} s")
+    if options.max_memory_mb:
+        parts.append(f"memória {options.max_memory_mb} MB")
+    return ", ".join(parts) or "sem limites"
+
+
+class _Worker:
+    def __init__(self):
+        from .pool import _plain_main_module
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child,), name="htmlpdf-vigiado", daemon=True)
+        with _plain_main_module():
+            self.proc.start()
+        child.close()
+        self.task: Optional[dict] = None
+
+    def start(self, index: int, name: str, source, options: ConvertOptions) -> None:
+        cpu, rss = process_usage(self.proc.pid)
+        self.task = {"indice": index, "nome": name, "inicio": time.monotonic(), "inicio_epoch": time.time(),
+                     "cpu0": cpu, "cpu_s": 0.0, "pico_mb": rss}
+        self.conn.send((name, source, options))
+
+    def restart_clock(self) -> None:
+        self.task["cpu0"], _ = process_usage(self.proc.pid)
+        self.task["inicio"], self.task["inicio_epoch"] = time.monotonic(), time.time()
+
+    def check(self, options: ConvertOptions) -> Optional[tuple[str, str]]:
+        # -> (motivo, mensagem) se passou de algum limite
+        task = self.task
+        elapsed = time.monotonic() - task["inicio"]
+        cpu, rss = process_usage(self.proc.pid)
+        if cpu is not None and task["cpu0"] is not None:
+            task["cpu_s"] = cpu - task["cpu0"]
+        if rss is not None:
+            task["pico_mb"] = max(rss, task["pico_mb"] or 0.0)
+        if options.max_memory_mb and rss is not None and rss > options.max_memory_mb:
+            return "memoria", f"passou do limite de memória ({rss:.1f} MB > {options.max_memory_mb} MB)"
+        if options.max_cpu_seconds and task["cpu_s"] > options.max_cpu_seconds:
+            return "cpu", f"passou do limite de CPU ({task['cpu_s']:.1f} s > {options.max_cpu_seconds:g} s)"
+        if options.max_seconds and elapsed > options.max_seconds:
+            return "tempo", f"passou do limite de tempo ({elapsed:.1f} s > {options.max_seconds:g} s)"
+        return None
+
+    def died_reason(self) -> tuple[str, str]:
+        code = self.proc.exitcode
+        if code is not None and code < 0 and -code == getattr(signal, "SIGXCPU", None):
+            return "cpu", "passou do limite de CPU (encerrado pelo sistema)"
+        if code is not None and code < 0 and -code == getattr(signal, "SIGKILL", None):
+            return "processo", ("o processo de conversão foi encerrado pelo sistema (SIGKILL; "
+                                "provavelmente falta de memória)")
+        return "processo", f"o processo de conversão terminou inesperadamente (código {code})"
+
+    def metrics(self, error: str) -> dict:
+        # Registro no formato do FileMetrics.to_dict, para o painel de desempenho
+        task = self.task
+        wall = round(time.monotonic() - task["inicio"], 4)
+        peak = round(task["pico_mb"], 1) if task["pico_mb"] is not None else None
+        return {"arquivo": task["nome"], "ok": False, "parede_s": wall, "cpu_s": round(task["cpu_s"], 4),
+                "pico_rss_mb": peak, "pico_escopo": "arquivo", "pid": self.proc.pid, "inicio": round(task["inicio_epoch"], 3),
+                "etapas": [{"etapa": "interrompida_pelo_vigia", "nivel": 0, "resultado": f"erro: {error}",
+                            "parede_s": wall, "cpu_s": round(task["cpu_s"], 4), "pico_rss_mb": peak}]}
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join(KILL_GRACE_S)
+            if self.proc.is_alive():
+                self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+            self.proc.join(KILL_GRACE_S)
+        except (OSError, ValueError):
+            pass
+        self.kill()
+
+
+def _limit_error(worker: _Worker, reason: str, message: str) -> ResourceLimitError:
+    err = ResourceLimitError(f"Conversão interrompida: {message}.", reason=reason)
+    err.metrics = worker.metrics(err.__class__.__name__)
+    return err
+
+
+def iter_convert_limited(items: list[tuple[str, object]], options: ConvertOptions, workers: int = 1,
+                         keep: Optional[Callable[[Optional[dict]], None]] = None
+                         ) -> Iterator[tuple[int, Optional[bytes], Optional[BaseException], list[str]]]:
+    # Mesmo contrato de pool.iter_convert: (índice, pdf, erro, avisos) conforme terminam.
+    # `items` já vêm prontos para outro processo (ver pool._for_pool).
+    keep = keep or (lambda record: None)
+    workers = max(1, workers)
+    todo = collections.deque(enumerate(items))
+    with _idle_lock:
+        idle = [w for w in _idle[:workers] if w.proc.is_alive()]
+        del _idle[:workers]
+    busy: list[_Worker] = []
+    try:
+        while todo or busy:
+            while todo and len(busy) < workers:
+                i, (name, source) = todo.popleft()
+                worker = idle.pop() if idle else _Worker()
+                try:
+                    worker.start(i, name, source, options)
+                except (OSError, ValueError):
+                    worker.kill()  # morreu parado: outro no lugar
+                    worker = _Worker()
+                    worker.start(i, name, source, options)
+                busy.append(worker)
+
+            multiprocessing.connection.wait([w.conn for w in busy] + [w.proc.sentinel for w in busy],
+                                            timeout=WATCH_INTERVAL_S)
+            events = []
+            for worker in list(busy):
+                i = worker.task["indice"]
+                try:
+                    answered = worker.conn.poll()
+                    status, payload = worker.conn.recv() if answered else (None, None)
+                except (EOFError, OSError):
+                    answered, status = False, None
+                if answered and status == "pronto":
+                    worker.restart_clock()
+                    answered = False
+                if answered:
+                    busy.remove(worker)
+                    _, rss = process_usage(worker.proc.pid)
+                    if options.max_memory_mb and rss is not None and rss > options.max_memory_mb * 0.8:
+                        worker.close()  # memória que não voltou: troca por um processo novo
+                    else:
+                        idle.append(worker)
+                    if status == "ok":
+                        pdf_bytes, warns, record = payload
+                        events.append((i, pdf_bytes, None, warns, record))
+                    else:
+                        events.append((i, None, payload, [], getattr(payload, "metrics", None)))
+                    continue
+                if not worker.proc.is_alive():
+                    busy.remove(worker)
+                    err = _limit_error(worker, *worker.died_reason())
+                    worker.kill()
+                    events.append((i, None, err, [], err.metrics))
+                    continue
+                over = worker.check(options)
+                if over is not None:
+                    busy.remove(worker)
+                    err = _limit_error(worker, *over)
+                    worker.kill()
+                    events.append((i, None, err, [], err.metrics))
+            for i, pdf_bytes, err, warns, record in events:
+                keep(record)
+                yield i, pdf_bytes, err, warns
+    finally:
+        for worker in busy:
+            worker.kill()  # lote abandonado (ex.: tarefa cancelada)
+        with _idle_lock:
+            _idle.extend(idle)
+            extra = _idle[IDLE_MAX:]
+            del _idle[IDLE_MAX:]
+        for worker in extra:
+            worker.close()
+
+
+def shutdown_idle() -> None:
+    with _idle_lock:
+        workers = list(_idle)
+        _idle.clear()
+    for worker in workers:
+        worker.close()
@@ -0,0 +1,242 @@
+"""Área de trabalho gerenciada para arquivos temporários da conversão.
+
+Cada conteúdo (hash) ganha uma pasta própria em `<raiz>/<hash>`, criada de forma
+atômica e reaproveitada entre reruns, sessões e workers do pool. Nada de uma
+pasta nova por chamada: o mesmo HTML reenviado usa a mesma pasta.
+
+Limpeza:
+  - `WorkspaceSession.close()` (ou o fim da sessão do Streamlit, via
+    weakref.finalize) libera as pastas que só aquela sessão usava: elas saem
+    assim que ficam `grace_s` sem uso (na hora, se já estiverem; senão, na
+    próxima faxina);
+  - `Workspace.sweep()` remove pastas antigas (idade) e as menos usadas até
+    caber no limite de tamanho. Roda sozinho de tempos em tempos.
+
+Pastas usadas há menos de `grace_s` nunca são removidas, porque um worker de
+outro processo (ou uma tarefa em segundo plano) pode estar renderizando a partir
+delas: a contagem de sessões é só deste processo, e o uso fica no mtime da pasta.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Optional
+
+LEGACY_PREFIX = "html2pdf_"  # pastas deixadas pelo read_html_and_base antigo
+
+
+class Workspace:
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024, max_age_s: float = 24 * 3600,
+                 grace_s: float = 600, sweep_every_s: float = 300):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.grace_s = grace_s
+        self.sweep_every_s = sweep_every_s
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._sessions: Counter = Counter()  # hash -> nº de sessões vivas que o usam (neste processo)
+        self._released: set = set()  # liberados pelas sessões, ainda dentro de grace_s
+
+    # -----------------------
+    # Pastas por conteúdo
+    # -----------------------
+    def entry(self, digest: str, files: Optional[dict] = None,
+              extract: Optional[Callable[[Path], object]] = None) -> Path:
+        # Devolve a pasta do conteúdo, criando-a se preciso com `files` ({nome: bytes})
+        # e/ou `extract(pasta)` (ex.: descompactar um .zip; só roda na criação)
+        path = self.root / digest
+        if path.is_dir():
+            self._touch(path)
+            missing = {n: d for n, d in (files or {}).items() if not (path / Path(n).name).exists()}
+            if missing:
+                self.write_files(path, missing)
+            return path
+
+        tmp = Path(tempfile.mkdtemp(prefix=".part-", dir=self.root))
+        try:
+            self.write_files(tmp, files or {})
+            if extract is not None:
+                extract(tmp)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Outro processo criou a mesma pasta antes: usa a dele
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not path.is_dir():
+                raise
+            self._touch(path)
+        self.maybe_sweep()
+        return path
+
+    def write_files(self, path: Path, files: dict) -> None:
+        # Grava {nome: bytes} numa pasta da área (a de um conteúdo ou a temporária
+        # do extract), cada arquivo de forma atômica: quem lê nunca vê um pela metade
+        path = Path(path)
+        if path.resolve().parent != self.root.resolve():
+            raise ValueError(f"Pasta fora da área de trabalho: {path}")
+        for name, data in files.items():
+            target = path / Path(name).name
+            fd, part = tempfile.mkstemp(dir=path, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(part, target)
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def remove(self, digest: str) -> None:
+        path = self.root / digest
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+
+    # -----------------------
+    # Sessões
+    # -----------------------
+    def _retain(self, digest: str) -> None:
+        with self._lock:
+            self._sessions[digest] += 1
+            self._released.discard(digest)
+
+    def _idle(self, path: Path, now: float) -> bool:
+        try:
+            return now - path.stat().st_mtime >= self.grace_s
+        except OSError:
+            return False
+
+    def _release(self, digests) -> None:
+        with self._lock:
+            orphans = []
+            for digest in digests:
+                self._sessions[digest] -= 1
+                if self._sessions[digest] <= 0:
+                    del self._sessions[digest]
+                    orphans.append(digest)
+        now = time.time()
+        for digest in orphans:
+            if self._idle(self.root / digest, now):
+                self.remove(digest)
+            else:
+                with self._lock:
+                    self._released.add(digest)  # em uso há pouco: fica para a faxina
+
+    # -----------------------
+    # Faxina (idade + tamanho)
+    # -----------------------
+    def _entries(self):
+        out = []
+        for item in os.scandir(self.root):
+            if not item.is_dir(follow_symlinks=False):
+                continue
+            size = 0
+            for dirpath, _, files in os.walk(item.path):
+                for name in files:
+                    try:
+                        size += os.path.getsize(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+            out.append((Path(item.path), size, item.stat().st_mtime))
+        return out
+
+    def sweep(self) -> dict:
+        now = time.time()
+        removed, freed = 0, 0
+        with self._lock:
+            live = set(self._sessions)
+            released = set(self._released)
+            self._last_sweep = now
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, mtime in entries:
+            age = now - mtime
+            if age < self.grace_s or path.name in live:
+                continue
+            if path.name in released or age > self.max_age_s or total > self.max_bytes:
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+                freed += size
+        with self._lock:
+            self._released = {d for d in self._released if (self.root / d).is_dir()}
+        removed += self._sweep_legacy(now)
+        return {"pastas_removidas": removed, "bytes_liberados": freed, "bytes_em_uso": total}
+
+    def _sweep_legacy(self, now: float) -> int:
+        # Pastas html2pdf_* antigas no /tmp (versões anteriores nunca apagavam)
+        removed = 0
+        tmp = Path(tempfile.gettempdir())
+        try:
+            items = list(os.scandir(tmp))
+        except OSError:
+            return 0
+        for item in items:
+            if item.name.startswith(LEGACY_PREFIX) and item.is_dir(follow_symlinks=False):
+                try:
+                    if now - item.stat().st_mtime > self.max_age_s:
+                        shutil.rmtree(item.path, ignore_errors=True)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def maybe_sweep(self) -> None:
+        with self._lock:
+            due = time.time() - self._last_sweep >= self.sweep_every_s
+            if due:
+                self._last_sweep = time.time()
+        if due:
+            self.sweep()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            sessions = len(self._sessions)
+        return {"pasta": str(self.root), "pastas": len(entries),
+                "bytes": sum(size for _, size, _ in entries), "em_uso_por_sessoes": sessions}
+
+
+class WorkspaceSession:
+    # Conjunto de conteúdos usados por uma sessão; liberados no close() ou
+    # quando o objeto é coletado (fim da sessão do Streamlit).
+    def __init__(self, workspace: Workspace):
+        self.workspace = workspace
+        self.digests: set = set()
+        self._finalizer = weakref.finalize(self, workspace._release, self.digests)
+
+    def track(self, digest: str) -> None:
+        if digest not in self.digests:
+            self.digests.add(digest)
+            self.workspace._retain(digest)
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+_workspace: Optional[Workspace] = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace() -> Workspace:
+    # Uma área por processo; configurável por ambiente (vale também nos workers)
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            root = os.environ.get("HTMLPDF_WORKSPACE_DIR") or os.path.join(tempfile.gettempdir(), "htmlpdf_workspace")
+            _workspace = Workspace(
+                root,
+                max_bytes=int(float(os.environ.get("HTMLPDF_WORKSPACE_MAX_MB", 512)) * 1024 * 1024),
+                max_age_s=float(os.environ.get("HTMLPDF_WORKSPACE_MAX_AGE_H", 24)) * 3600,
+            )
+        return _workspace
@@ -0,0 +1,186 @@
+"""Pacotes .zip (read_html_bundle) e o acesso restrito ao pacote durante a renderização.
+
+Casos negativos: membros com "../", caminho absoluto ou link simbólico não são
+extraídos; arquivos demais ou grandes demais recusam o pacote; e nem o
+url_fetcher (WeasyPrint) nem o link_callback (xhtml2pdf) entregam arquivos de
+fora da pasta extraída (file:///etc/passwd, "../", links simbólicos, http).
+Os testes com o WeasyPrint renderizam de verdade (HTML(..., url_fetcher=...)) e
+são pulados quando ele não carrega (ex.: sem pango).
+"""
+import base64
+import io
+import os
+import warnings
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from htmlpdf import bundles
+from htmlpdf.bundles import bundle_link_callback, bundle_resolver, bundle_url_fetcher, read_html_bundle
+from htmlpdf.engines import convert_html_to_pdf
+from htmlpdf.errors import ConversionError
+from htmlpdf.options import ConvertOptions
+from htmlpdf.workspace import Workspace
+
+INDEX = b"<html><body><p>ok</p><img src='img/a.png'></body></html>"
+
+
+def _zip(members: dict, symlinks: dict = None) -> bytes:
+    # members: nome -> conteúdo; symlinks: nome -> alvo (gravado como link simbólico)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+        for name, target in (symlinks or {}).items():
+            info = zipfile.ZipInfo(name)
+            info.create_system = 3
+            info.external_attr = (0o120777 << 16)
+            zf.writestr(info, target)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    return Workspace(str(tmp_path / "ws"))
+
+
+def _extracted(root: str) -> list[str]:
+    return sorted(str(p.relative_to(root)).replace(os.sep, "/") for p in Path(root).rglob("*") if p.is_file())
+
+
+@pytest.mark.parametrize("name", ["../fora.txt", "img/../../fora.txt", "/tmp/absoluto.txt",
+                                  "\\fora.txt", "C:/fora.txt", "img\\..\\..\\fora.txt"])
+def test_membro_fora_do_pacote_nao_e_extraido(workspace, tmp_path, name):
+    data = _zip({"index.html": INDEX, "img/a.png": b"png", name: b"segredo"})
+    html, base_url, root = read_html_bundle(data, workspace)
+    assert "<p>ok</p>" in html
+    assert _extracted(root) == ["img/a.png", "index.html"]
+    assert not (tmp_path / "fora.txt").exists()
+    assert not (tmp_path / "ws" / "fora.txt").exists()
+
+
+def test_link_simbolico_nao_e_extraido(workspace):
+    data = _zip({"index.html": INDEX}, symlinks={"senhas": "/etc/passwd", "img/a.png": "../../../etc/passwd"})
+    _, _, root = read_html_bundle(data, workspace)
+    assert _extracted(root) == ["index.html"]
+    assert not any(p.is_symlink() for p in Path(root).rglob("*"))
+
+
+def test_arquivos_demais(workspace, monkeypatch):
+    monkeypatch.setattr(bundles, "MAX_MEMBERS", 3)
+    data = _zip({"index.html": INDEX, **{f"img/{i}.png": b"x" for i in range(3)}})
+    with pytest.raises(ConversionError, match="arquivos demais"):
+        read_html_bundle(data, workspace)
+
+
+def test_descompactado_grande_demais(workspace, monkeypatch):
+    monkeypatch.setattr(bundles, "MAX_UNCOMPRESSED", 1024)
+    # comprime para quase nada, mas passa do limite depois de extraído
+    data = _zip({"index.html": INDEX, "grande.bin": b"\0" * 4096})
+    assert len(data) < 1024
+    with pytest.raises(ConversionError, match="passa do limite"):
+        read_html_bundle(data, workspace)
+
+
+def test_zip_invalido(workspace):
+    with pytest.raises(ConversionError, match="inválido"):
+        read_html_bundle(b"PK\x03\x04 isto nao e um zip", workspace)
+
+
+@pytest.fixture
+def bundle(workspace, tmp_path):
+    # Pacote extraído + um link simbólico dentro dele apontando para fora
+    _, base_url, root = read_html_bundle(_zip({"index.html": INDEX, "img/a.png": b"png"}), workspace)
+    outside = tmp_path / "fora.txt"
+    outside.write_text("segredo")
+    os.symlink(outside, Path(root) / "atalho.txt")
+    return root, base_url, outside
+
+
+def _outside_urls(outside: Path) -> list[str]:
+    return ["file:///etc/passwd", "/etc/passwd", "../../../../../../etc/passwd", "../fora.txt",
+            outside.as_uri(), str(outside), "atalho.txt", "file:///etc/passwd%00.png",
+            "http://example.com/a.png", "https://example.com/a.css", "ftp://example.com/a",
+            "jar:file:///etc/passwd!/", "img/inexistente.png"]
+
+
+def test_resolver_recusa_o_que_esta_fora(bundle):
+    root, base_url, outside = bundle
+    resolve = bundle_resolver(root, base_url)
+    for url in _outside_urls(outside):
+        with pytest.raises(ValueError, match="fora do pacote"):
+            resolve(url)
+
+
+def test_resolver_entrega_arquivos_do_pacote(bundle):
+    root, base_url, _ = bundle
+    resolve = bundle_resolver(root, base_url)
+    png = os.path.realpath(os.path.join(root, "img", "a.png"))
+    assert resolve("img/a.png") == (png, "image/png", Path(png).as_uri())
+    assert resolve(Path(png).as_uri())[0] == png
+    assert resolve("data:image/png;base64,AAAA") is None  # fica com o fetcher padrão
+
+
+def test_link_callback_recusa_o_que_esta_fora(bundle):
+    root, base_url, outside = bundle
+    callback = bundle_link_callback(root, base_url)
+    blocked = os.path.join(root, ".fora-do-pacote")
+    for url in _outside_urls(outside):
+        assert callback(url) == blocked, url
+    assert not os.path.exists(blocked)
+    assert callback("img/a.png") == os.path.realpath(os.path.join(root, "img", "a.png"))
+    assert callback("data:image/png;base64,AAAA") == "data:image/png;base64,AAAA"
+
+
+# -----------------------
+# Renderização pelo WeasyPrint
+# -----------------------
+def _weasyprint():
+    try:
+        import weasyprint
+    except Exception as e:  # OSError quando faltam as bibliotecas nativas (pango)
+        pytest.skip(f"WeasyPrint indisponível: {e}")
+    return weasyprint
+
+
+def _png() -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (20, 20), (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def image_bundle(workspace, tmp_path):
+    # Pacote com uma imagem própria, uma em data: e duas de fora (file:// e "../")
+    png = _png()
+    outside = tmp_path / "fora.png"
+    outside.write_bytes(png)
+    page = (f"<html><body><img src='img/a.png'><img src='data:image/png;base64,{base64.b64encode(png).decode()}'>"
+            f"<img src='{outside.as_uri()}'><img src='../../fora.png'>"
+            "<link rel='stylesheet' href='file:///etc/passwd'></body></html>")
+    return read_html_bundle(_zip({"index.html": page.encode(), "img/a.png": png}), workspace)
+
+
+def _image_count(pdf: bytes) -> int:
+    pypdf = pytest.importorskip("pypdf")
+    return sum(len(page.images) for page in pypdf.PdfReader(io.BytesIO(pdf)).pages)
+
+
+def test_weasyprint_renderiza_com_o_url_fetcher_do_pacote(image_bundle):
+    weasyprint = _weasyprint()
+    html, base_url, root = image_bundle
+    pdf = weasyprint.HTML(string=html, base_url=base_url,
+                          url_fetcher=bundle_url_fetcher(root, base_url)).write_pdf()
+    assert _image_count(pdf) == 2  # a do pacote e a data:; as de fora não entram
+
+
+def test_convert_html_to_pdf_usa_o_weasyprint_sem_cair_no_xhtml2pdf(image_bundle):
+    _weasyprint()
+    html, base_url, root = image_bundle
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        pdf = convert_html_to_pdf(html, base_url, ConvertOptions(engine="weasyprint"), local_root=root)
+    assert not [w for w in caught if "xhtml2pdf como fallback" in str(w.message)]
+    assert _image_count(pdf) == 2
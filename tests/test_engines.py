@@ -0,0 +1,72 @@
+"""Reaproveitamento das FontConfigurations do WeasyPrint (WeasyRenderContext).
+
+HTML/CSS/FontConfiguration falsos: a primeira renderização falha no meio e a
+configuração usada nela não pode voltar para o contexto nem ir para o fallback.
+"""
+import pytest
+
+from htmlpdf import engines
+from htmlpdf.engines import WeasyRenderContext, build_pdf_weasy
+from htmlpdf.options import ConvertOptions
+
+
+class _FontConfiguration:
+    pass
+
+
+class _CSS:
+    def __init__(self, string=""):
+        self.string = string
+
+
+class _HTML:
+    fail = 0
+    used = []
+
+    def __init__(self, string, base_url=".", url_fetcher=None):
+        self.string = string
+
+    def write_pdf(self, stylesheets=(), font_config=None):
+        _HTML.used.append(font_config)
+        if _HTML.fail:
+            _HTML.fail -= 1
+            raise RuntimeError("falhou no meio do layout")
+        return b"%PDF-falso"
+
+
+@pytest.fixture
+def fake_weasy(monkeypatch):
+    monkeypatch.setattr(engines, "_import_weasy", lambda: (_HTML, _CSS, _FontConfiguration))
+    monkeypatch.setattr(engines, "preflight_glyphs", lambda html: (html, False))
+    monkeypatch.setattr(_HTML, "fail", 0)
+    monkeypatch.setattr(_HTML, "used", [])
+    engines.clear_weasy_contexts()
+    yield
+    engines.clear_weasy_contexts()
+
+
+def test_configuracao_volta_so_sem_excecao(fake_weasy):
+    ctx = WeasyRenderContext(ConvertOptions())
+    with ctx.font_config("modelo") as ok:
+        pass
+    with pytest.raises(RuntimeError):
+        with ctx.font_config("modelo") as broken:
+            assert broken is ok  # reaproveitada
+            raise RuntimeError("falhou")
+    with ctx.font_config("modelo") as fresh:
+        assert fresh is not ok  # a da falha foi descartada
+
+
+def test_fallback_usa_configuracao_nova(fake_weasy):
+    options = ConvertOptions()
+    assert build_pdf_weasy("<p>a</p>", ".", options) == b"%PDF-falso"
+    pooled = _HTML.used[-1]
+
+    _HTML.fail = 1
+    assert build_pdf_weasy("<p>b</p>", ".", options) == b"%PDF-falso"
+    first, fallback = _HTML.used[-2:]
+    assert first is pooled and fallback is not pooled
+
+    # nem a da falha nem a do fallback voltaram: a próxima é nova
+    assert build_pdf_weasy("<p>c</p>", ".", options) == b"%PDF-falso"
+    assert _HTML.used[-1] not in (pooled, fallback)
@@ -0,0 +1,46 @@
+""".xlsx em blocos (xlsx_file_to_pdf) com blocos pequenos.
+
+Um bloco que cabe numa página só não tem página "completa" para guardar: o
+laço precisa ler mais linhas antes de renderizar de novo (antes repetia o mesmo
+bloco para sempre).
+"""
+import io
+import re
+
+import pytest
+
+from htmlpdf.excel import xlsx_file_to_pdf
+from htmlpdf.options import ConvertOptions
+
+openpyxl = pytest.importorskip("openpyxl")
+pypdf = pytest.importorskip("pypdf")
+pytest.importorskip("xhtml2pdf")
+
+
+def _xlsx(rows: int) -> io.BytesIO:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Dados"
+    ws.append(["codigo", "descricao"])
+    for i in range(rows):
+        ws.append([i, f"item-{i:04d}"])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
+
+
+def _items(pdf: bytes) -> list[str]:
+    reader = pypdf.PdfReader(io.BytesIO(pdf))
+    return re.findall(r"item-\d{4}", "".join(page.extract_text() for page in reader.pages))
+
+
+@pytest.mark.parametrize("rows, chunk", [(50, 10), (5, 1), (130, 40)])
+def test_blocos_pequenos_terminam_com_todas_as_linhas(rows, chunk):
+    pdf = xlsx_file_to_pdf(_xlsx(rows), ConvertOptions(engine="xhtml2pdf", excel_chunk_rows=chunk))
+    assert _items(pdf) == [f"item-{i:04d}" for i in range(rows)]
+
+
+def test_planilha_vazia():
+    pdf = xlsx_file_to_pdf(_xlsx(0), ConvertOptions(engine="xhtml2pdf", excel_chunk_rows=1))
+    assert len(pypdf.PdfReader(io.BytesIO(pdf)).pages) == 1
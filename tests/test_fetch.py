@@ -0,0 +1,106 @@
+"""Cache/espelho de recursos remotos (AssetCache) e o resolvedor por documento.
+
+Tudo offline: o espelho é montado em tmp_path e nenhuma URL vai para a rede.
+"""
+import importlib
+import io
+import os
+
+import pytest
+
+from htmlpdf.bundles import bundle_resolver
+from htmlpdf import fetch
+from htmlpdf.fetch import AssetCache, asset_version
+from htmlpdf.metrics import FileMetrics, note
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AssetCache(str(tmp_path / "assets"), offline=True)
+    mirrored = tmp_path / "assets" / "mirror" / "cdn.example.com" / "css" / "a.css"
+    mirrored.parent.mkdir(parents=True)
+    mirrored.write_text("p { color: red }")
+    cache.store("https://fonts.example.com/f.woff2", b"woff2", "font/woff2")
+    return cache
+
+
+def test_resolvedor_conta_por_documento_e_por_processo(cache):
+    doc = cache.resolver()
+    path, mime, url = doc("https://cdn.example.com/css/a.css")
+    assert path.read_text() == "p { color: red }"
+    assert (mime, url) == ("text/css", "https://cdn.example.com/css/a.css")
+    assert doc("https://fonts.example.com/f.woff2")[1] == "font/woff2"
+    with pytest.raises(ValueError, match="indisponível"):
+        doc("https://cdn.example.com/falta.png")
+    assert doc.missing == ["https://cdn.example.com/falta.png"]
+    assert doc.counts() == {"acertos": 1, "acertos_espelho": 1, "baixados": 0, "faltas": 1}
+
+    other = cache.resolver()
+    other("https://fonts.example.com/f.woff2")
+    assert other.counts() == {"acertos": 1, "acertos_espelho": 0, "baixados": 0, "faltas": 0}
+    stats = cache.stats()
+    assert (stats["acertos"], stats["acertos_espelho"], stats["faltas"], stats["offline"]) == (2, 1, 1, True)
+
+
+def test_url_nao_http_vai_para_o_fallback(cache, tmp_path):
+    assert cache.resolver()("file:///etc/passwd") is None  # sem fallback: fetcher padrão
+    root = tmp_path / "pacote"
+    (root / "img").mkdir(parents=True)
+    (root / "img" / "a.png").write_bytes(b"png")
+    doc = cache.resolver(fallback=bundle_resolver(str(root)))
+    assert doc("img/a.png")[1] == "image/png"
+    with pytest.raises(ValueError, match="fora do pacote"):
+        doc("file:///etc/passwd")
+    assert doc.counts() == {"acertos": 0, "acertos_espelho": 0, "baixados": 0, "faltas": 0}
+
+
+def test_versao_do_espelho_nao_rele_a_pasta_a_cada_chave(cache, tmp_path, monkeypatch):
+    walks = []
+    real_walk = fetch.os.walk
+    monkeypatch.setattr(fetch.os, "walk", lambda path: walks.append(path) or real_walk(path))
+    monkeypatch.setattr(fetch, "_mirror_versions", {})
+    root = str(cache.root)
+    first = asset_version(root)
+    assert asset_version(root) == first
+    assert len(walks) == 1
+
+    # Entrada nova no índice: a versão muda na hora (só um stat na pasta index/)
+    cache.store("https://fonts.example.com/g.woff2", b"outra", "font/woff2")
+    os.utime(cache.root / "index", ns=(first["assets_version"] + 10**9,) * 2)
+    second = asset_version(root)
+    assert second["assets_version"] > first["assets_version"] and len(walks) == 1
+
+    # Arquivo novo no espelho: entra depois do TTL
+    new = cache.root / "mirror" / "cdn.example.com" / "b.css"
+    new.write_text("b")
+    os.utime(new, ns=(second["assets_version"] + 10**9,) * 2)
+    assert asset_version(root) == second
+    monkeypatch.setattr(fetch, "MIRROR_VERSION_TTL_S", 0)
+    assert asset_version(root)["assets_version"] == second["assets_version"] + 10**9
+    assert len(walks) == 2
+
+
+def test_note_entra_no_registro_do_arquivo():
+    note("fora_de_registro", acertos=1)  # sem registro ativo: nada acontece
+    with FileMetrics("a.html") as rec:
+        with rec.stage("weasyprint"):
+            pass
+        note("recursos_remotos", acertos=2, faltas=1)
+    assert rec.to_dict()["etapas"][-1] == {"etapa": "recursos_remotos", "nivel": 0, "acertos": 2, "faltas": 1}
+
+
+def test_weasyprint_usa_o_cache(cache):
+    try:
+        importlib.import_module("weasyprint")
+    except Exception as e:
+        pytest.skip(f"WeasyPrint indisponível: {e}")
+    from htmlpdf.engines import convert_html_to_pdf
+    from htmlpdf.options import ConvertOptions
+    pypdf = pytest.importorskip("pypdf")
+    html = ("<html><head><link rel='stylesheet' href='https://cdn.example.com/css/a.css'></head>"
+            "<body><p>texto</p></body></html>")
+    with FileMetrics("a.html") as rec:
+        pdf = convert_html_to_pdf(html, ".", ConvertOptions(asset_dir=str(cache.root), offline=True))
+    assert len(pypdf.PdfReader(io.BytesIO(pdf)).pages) == 1
+    remote = [s for s in rec.stages if s["etapa"] == "recursos_remotos"]
+    assert remote and remote[0]["acertos_espelho"] == 1
@@ -0,0 +1,175 @@
+"""União em streaming (merge_pdfs_to_file / prepare_pdf + assemble_pdf) com PDFs reais.
+
+Os PDFs de entrada são gerados com o reportlab (texto, imagem sem perda e JPEG) e
+a saída é reaberta com o pypdf em modo estrito: xref, /Length e filtros têm que
+bater, não basta o leitor tolerante conseguir abrir.
+"""
+import io
+
+import pytest
+
+from htmlpdf.merge import assemble_pdf, merge_pdfs_to_file, prepare_pdf
+from htmlpdf.options import MergeOptions
+
+pypdf = pytest.importorskip("pypdf")
+pytest.importorskip("reportlab")
+Image = pytest.importorskip("PIL.Image")
+
+
+def _image(fmt: str, size: int = 900) -> io.BytesIO:
+    # Gradiente (sem blocos repetidos, para a compressão não esconder o tamanho)
+    im = Image.new("RGB", (size, size))
+    im.putdata([(x * 255 // size, y * 255 // size, (x + y) % 256) for y in range(size) for x in range(size)])
+    buf = io.BytesIO()
+    im.save(buf, fmt, quality=90) if fmt == "JPEG" else im.save(buf, fmt)
+    buf.seek(0)
+    return buf
+
+
+def _pdf(title: str, pages: int = 2, image: str = "", compress: bool = True) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, pageCompression=int(compress))
+    for i in range(pages):
+        c.setFont("Helvetica", 12)
+        for line in range(40):
+            c.drawString(72, 780 - line * 18, f"{title} página {i + 1} linha {line + 1}")
+        if image:
+            c.drawImage(ImageReader(_image(image)), 72, 72, width=300, height=300)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _merge(sources: list, options: MergeOptions = MergeOptions()) -> bytes:
+    out = io.BytesIO()
+    merge_pdfs_to_file(sources, out, options)
+    return out.getvalue()
+
+
+def _reopen(pdf: bytes):
+    return pypdf.PdfReader(io.BytesIO(pdf), strict=True)
+
+
+def _images(reader) -> list[tuple[int, int, object]]:
+    # (largura, altura, filtro) de cada imagem das páginas
+    out = []
+    for page in reader.pages:
+        for xobj in page["/Resources"].get("/XObject", {}).values():
+            xobj = xobj.get_object()
+            if xobj.get("/Subtype") == "/Image":
+                out.append((int(xobj["/Width"]), int(xobj["/Height"]), xobj.get("/Filter")))
+    return out
+
+
+def test_uniao_reabre_com_pypdf_estrito():
+    a, b = _pdf("Alfa"), _pdf("Beta", pages=3)
+    reader = _reopen(_merge([a, b]))
+    assert len(reader.pages) == 5
+    texts = [page.extract_text() for page in reader.pages]
+    assert "Alfa página 1 linha 1" in texts[0]
+    assert "Alfa página 2 linha 40" in texts[1]
+    assert "Beta página 3 linha 1" in texts[4]
+
+
+def test_montagem_em_outra_ordem_e_max_pages():
+    a, b = _pdf("Alfa", pages=3), _pdf("Beta")
+    docs = [prepare_pdf(b), prepare_pdf(a, max_pages=1)]
+    try:
+        out = io.BytesIO()
+        assert assemble_pdf(docs, out) == 3
+    finally:
+        for doc in docs:
+            doc.close()
+    reader = _reopen(out.getvalue())
+    assert ["Beta" in t for t in (p.extract_text() for p in reader.pages)] == [True, True, False]
+    assert "Alfa página 1" in reader.pages[2].extract_text()
+
+
+@pytest.mark.parametrize("image", ["PNG", "JPEG"])
+def test_dedupe_grava_fonte_e_imagem_uma_vez(image):
+    doc = _pdf("Igual", image=image)
+    single = _merge([doc])
+    with_dedupe = _merge([doc, doc])
+    without = _merge([doc, doc], MergeOptions(dedupe=False))
+    assert len(_reopen(with_dedupe).pages) == len(_reopen(without).pages) == 4
+    # a imagem (o grosso do arquivo) entra uma vez só; sem dedupe, duas
+    assert len(with_dedupe) < len(single) * 1.2
+    assert len(without) > len(single) * 1.8
+    assert "Igual página 2 linha 40" in _reopen(with_dedupe).pages[3].extract_text()
+
+
+def test_recompress_reduz_streams_sem_compressao():
+    doc = _pdf("Texto", pages=3, compress=False)
+    plain = _merge([doc])
+    packed = _merge([doc], MergeOptions(recompress=True))
+    assert len(packed) < len(plain) / 2
+    reader = _reopen(packed)
+    assert reader.pages[0]["/Contents"].get_object()["/Filter"] == "/FlateDecode"
+    assert [p.extract_text() for p in reader.pages] == [p.extract_text() for p in _reopen(plain).pages]
+
+
+@pytest.mark.parametrize("image, expected_filter", [("PNG", "/FlateDecode"), ("JPEG", "/DCTDecode")])
+def test_downsample_reduz_imagens_acima_do_dpi(image, expected_filter):
+    doc = _pdf("Imagem", pages=1, image=image)
+    # o reportlab grava ASCII85 antes do filtro da imagem; na união ele sai
+    assert _images(pypdf.PdfReader(io.BytesIO(doc))) == [(900, 900, ["/ASCII85Decode", expected_filter])]
+    assert _images(_reopen(_merge([doc]))) == [(900, 900, expected_filter)]
+
+    reduced = _merge([doc], MergeOptions(max_image_dpi=20))
+    (w, h, flt), = _images(_reopen(reduced))
+    # A4: lado maior 842 pt = 11,7 pol -> 233 px a 20 DPI
+    assert (w, h) == (233, 233)
+    assert flt == expected_filter
+    assert len(reduced) < len(doc) / 2
+    data = _reopen(reduced).pages[0].images[0].image
+    assert data.size == (233, 233)
+
+
+def test_dedupe_independe_da_reducao():
+    # Mesmo documento preparado com e sem redução: o hash vem do original, então
+    # os objetos iguais (fonte) ainda são compartilhados e a saída é válida
+    doc = _pdf("Misto", pages=1, image="PNG")
+    docs = [prepare_pdf(doc), prepare_pdf(doc, MergeOptions(max_image_dpi=20))]
+    try:
+        out = io.BytesIO()
+        assemble_pdf(docs, out)
+    finally:
+        for d in docs:
+            d.close()
+    reader = _reopen(out.getvalue())
+    assert len(reader.pages) == 2
+    fonts = [p["/Resources"]["/Font"]["/F1"].indirect_reference for p in reader.pages]
+    assert fonts[0] == fonts[1]
+
+
+def _raw_pdf(objects: list[bytes]) -> bytes:
+    # PDF mínimo escrito à mão (objeto 1 = catálogo), com a xref certa
+    out, offsets = bytearray(b"%PDF-1.7\n"), []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def test_filtro_sem_decodificacao_segue_como_esta():
+    # CCITT (fax): o get_data() do pypdf não devolve os bytes originais, então o
+    # stream é copiado sem mexer, com o mesmo /Filter
+    fax = b"\x00\x11fax\xff"
+    src = _raw_pdf([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] /Resources << /XObject << /Im0 4 0 R >> >> >>",
+        b"<< /Type /XObject /Subtype /Image /Width 8 /Height 8 /BitsPerComponent 1 /Filter /CCITTFaxDecode"
+        b" /Length %d >>\nstream\n%s\nendstream" % (len(fax), fax),
+    ])
+    merged = _merge([src], MergeOptions(recompress=True, max_image_dpi=20))
+    image = _reopen(merged).pages[0]["/Resources"]["/XObject"]["/Im0"].get_object()
+    assert image["/Filter"] == "/CCITTFaxDecode"
+    assert b"/Length 6 >>\nstream\n" + fax + b"\nendstream" in merged
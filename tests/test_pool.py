@@ -0,0 +1,61 @@
+"""iter_bounded com um pool que quebra (um worker morreu).
+
+Pools e futures falsos: as tarefas do primeiro pool falham juntas com
+BrokenProcessPool e as do pool novo terminam na hora, sem subir processos.
+"""
+import concurrent.futures as cf
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from htmlpdf import pool as pool_mod
+
+
+class _FakePool:
+    def __init__(self, broken: bool):
+        self.broken = broken
+        self.shutdowns = 0
+        self.submitted = []
+
+    def shutdown(self, wait=True):
+        self.shutdowns += 1
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    created = []
+
+    def get_pool(workers=0):
+        with pool_mod._pool_lock:
+            if pool_mod._pool is None:
+                pool_mod._pool = _FakePool(broken=not created)  # só o primeiro quebra
+                created.append(pool_mod._pool)
+            return pool_mod._pool
+
+    def submit(pool, fn, *args):
+        fut = cf.Future()
+        pool.submitted.append(args)
+        if pool.broken:
+            fut.set_exception(BrokenProcessPool("worker morreu"))
+        else:
+            fut.set_result(fn(*args))
+        return fut
+
+    monkeypatch.setattr(pool_mod, "_pool", None)
+    monkeypatch.setattr(pool_mod, "get_pool", get_pool)
+    monkeypatch.setattr(pool_mod, "_submit", submit)
+    return created
+
+
+def test_varias_tarefas_do_pool_quebrado_descartam_so_ele(pools):
+    calls = [(n, abs, (-n,)) for n in range(6)]
+    results = {}
+    for key, fut in pool_mod.iter_bounded(calls, workers=3):
+        results[key] = fut.exception() or fut.result()
+
+    first, second = pools  # um pool novo só, apesar das 3 falhas juntas
+    assert first.shutdowns == 1
+    assert second.shutdowns == 0 and pool_mod._pool is second
+    assert all(isinstance(results[n], BrokenProcessPool) for n in range(3))
+    assert [results[n] for n in range(3, 6)] == [3, 4, 5]
+    assert second.submitted == [(-3,), (-4,), (-5,)]
@@ -0,0 +1,74 @@
+"""Sanitizador de CSS por tokens (sanitize_css) x cadeia de regex antiga (sanitize_css_legacy).
+
+As duas devem concordar em tudo, menos nas diferenças pretendidas: as regras de
+seletor não mexem mais em declarações ("color:red" continua), as de propriedade
+respeitam o fim da declaração e calc()/url() com parênteses ou ":" ficam inteiros.
+"""
+import re
+
+import pytest
+
+from htmlpdf.sanitize import _sanitize_css_uncached, sanitize_css, sanitize_css_legacy
+
+
+def _norm(css: str) -> str:
+    # Só diferenças de espaço e de ";" antes de "}" (a cadeia antiga não remontava o texto)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+SAME = {
+    "declaracoes": "p { margin: 0; padding: 4px 8px; }\nh1 { font-size: 20px; }",
+    "media": "@media print { p { margin: 0; } } body { margin: 0; }",
+    "supports": "@supports (display: grid) { .g { display: grid; } } .a { margin: 0; }",
+    "keyframes": "@keyframes spin { from { opacity: 0; } to { opacity: 1; } } .x { margin: 0; }",
+    "at_rule_de_fornecedor": "@-webkit-keyframes s { 0% { opacity: 0; } } .x { margin: 0; }",
+    "font_face": "@font-face { font-family: X; src: url(x.woff); } h1 { font-family: X; }",
+    "pseudo_classes": "a:hover, li:nth-child(2n+1), p::before { margin: 0; }",
+    "combinadores": "ul > li + li ~ span { margin: 0; }",
+    "display": ".a { display: flex; } .b { display: inline-grid; } .c { display: contents; }",
+    "propriedades_removidas": ".a { box-shadow: 0 0 1px #000; transform: rotate(3deg); "
+                              "transition: all 1s; animation: x 1s; margin: 0; }",
+    "position": ".a { position: fixed; top: 0; } .b { position: relative; }",
+    "var": ".a { width: var(--w); }",
+    "calc": ".a { width: calc(100% - 10px); }",
+    "entidades": "p { font-family: &quot;Arial&quot;, sans-serif; }",
+    "page": "@page { size: A4; margin: 1cm; }",
+    "tabela": "table { border-collapse: collapse; } td, th { border: 1px solid #999; padding: 6px; }",
+}
+
+
+@pytest.mark.parametrize("css", SAME.values(), ids=SAME.keys())
+def test_concorda_com_a_cadeia_antiga(css):
+    assert _norm(sanitize_css(css)) == _norm(sanitize_css_legacy(css))
+
+
+# (css, saída esperada do sanitizador novo); a cadeia antiga dá outra coisa
+DIFFERENT = {
+    # ":red" era apagado como se fosse pseudo-classe
+    "color_sem_espaco": ("p{color:red}", "p{color:red}"),
+    "valor_colado": (".a{margin:auto}", ".a{margin:auto}"),
+    # o regex de display ia até o próximo ";", atravessando a regra seguinte
+    "display_sem_ponto_e_virgula": (".a { display: flex } .b { color: red; }",
+                                    ".a{display:block}.b{color:red}"),
+    # a última declaração (sem ";") não era removida
+    "position_sem_ponto_e_virgula": (".b { top: 0; position: absolute }", ".b{top:0}"),
+    # "transform:" casava dentro de "text-transform"
+    "text_transform": ("h1 { text-transform: uppercase; }", "h1{text-transform:uppercase}"),
+    # calc() aninhado deixava um ")" sobrando
+    "calc_aninhado": (".a { width: calc(100% - (2 * 10px)); }", ".a{width:1}"),
+    # ":b" dentro de url() também era tratado como pseudo-classe
+    "url_com_dois_pontos": ("a { background: url(a:b); }", "a{background:url(a:b)}"),
+}
+
+
+@pytest.mark.parametrize("css, expected", DIFFERENT.values(), ids=DIFFERENT.keys())
+def test_diferencas_pretendidas(css, expected):
+    assert _norm(sanitize_css(css)) == expected
+    assert _norm(sanitize_css_legacy(css)) != expected
+
+
+def test_cache_devolve_o_mesmo_resultado():
+    css = "p { margin: 0; } a:hover { color: blue; }"
+    assert sanitize_css(css) == sanitize_css(css) == _sanitize_css_uncached(css)